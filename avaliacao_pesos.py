@@ -0,0 +1,413 @@
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from base_colunar import ORDEM_ATRIBUTOS, acumular_soma, atributo_presente_na_consulta, concluir_soma, nova_compensacao
+from base_de_casos import CAMINHO_BASE_PADRAO, BaseDeCasos
+from paralelo import abrir_base_compartilhada, compartilhar_base
+from recuperacao import consultas_por_tile
+from retencao import caminho_log_retencao
+from similaridade import PESOS_PADRAO
+from snapshot import chave_arquivo
+
+# --- Ajuste de Pesos por Leave-One-Out ---
+# Avaliar um vetor de pesos por leave-one-out (cada filme vira a consulta e o resto da
+# base são os candidatos) custa N² similaridades globais, e uma busca de pesos repete
+# isso para cada vetor candidato. Aqui as similaridades LOCAIS de cada atributo entre
+# as consultas e a base inteira são calculadas uma única vez (BlocosSimilaridade), em
+# uma matriz consultas x casos por atributo: em memória ou, se não couberem
+# (LIMITE_BYTES_EM_MEMORIA) ou se uma pasta for informada, em arquivos .npy mapeados em
+# memória, que podem ser reabertos depois (`BlocosSimilaridade.abrir`; a linha de comando
+# só os reaproveita se o CSV, o log de retenção e os parâmetros que definem os blocos
+# forem os mesmos, e senão os recalcula). O cálculo é
+# feito em tiles de consultas, opcionalmente em vários processos: a base vai para a
+# memória compartilhada (como em paralelo.py) e cada processo grava seus tiles direto
+# nos arquivos.
+#
+# Cada vetor de pesos custa então só a recombinação ponderada das matrizes (com a
+# renormalização por pesos_efetivamente_usados de `calcular_similaridade_global`, na
+# mesma ordem de soma) e a seleção dos k vizinhos de cada consulta. Com blocos em
+# float64 as similaridades globais são idênticas às da busca; em float32 (o padrão,
+# metade do espaço) diferem só no arredondamento.
+#
+# Nota de um vetor de pesos: o atributo alvo (ex: avaliacao_critica) é tirado dos pesos,
+# e a nota é a similaridade local média, no alvo, entre cada consulta e seus k vizinhos
+# que têm o alvo (para um atributo numérico, 1 - erro absoluto médio / faixa do atributo).
+#
+# Uso: python avaliacao_pesos.py [--csv base.csv] [--consultas 1000] [--alvo avaliacao_critica]
+#                                [-k 10] [--candidatos 200] [--grade estrelas=0,0.1,0.2 ...]
+#                                [--pasta blocos/] [--processos 4] [--saida resultado.json]
+
+CONSULTAS_PADRAO = 1000
+CANDIDATOS_PADRAO = 200
+K_PADRAO = 10
+ALVO_PADRAO = "avaliacao_critica"
+SEMENTE_PADRAO = 42
+LIMITE_BYTES_EM_MEMORIA = 1 << 30  # Acima disso, os blocos vão para arquivos mapeados em memória
+VALORES_PESOS_ALEATORIOS = (0.0, 0.01, 0.02, 0.05, 0.1, 0.15, 0.2, 0.3)
+ARQUIVO_METADADOS = "blocos.json"
+
+# Estado dos processos do pool
+_base_trabalhador = None
+_memoria_trabalhador = None
+_blocos_trabalhador = None
+
+
+def _preencher_tile(base, matrizes, atributos, inicio, casos):
+    """Grava nas matrizes as similaridades locais das consultas `casos` (linhas a partir de `inicio`)."""
+    for atributo in atributos:
+        destino = matrizes[atributo][inicio:inicio + len(casos)]
+        linhas = [i for i, caso in enumerate(casos) if caso and atributo_presente_na_consulta(caso, atributo)]
+        if len(linhas) < len(casos):
+            destino[...] = 0.0  # Consultas sem o atributo: a linha não entra na recombinação
+        if linhas:
+            sims, _ = base.similaridade_local_bloco(atributo, [casos[i].get(atributo) for i in linhas])
+            destino[linhas] = sims
+
+
+def _inicializar_calculo(pasta, atributos, nome_memoria, layout, metadados):
+    global _base_trabalhador, _memoria_trabalhador, _blocos_trabalhador
+    _memoria_trabalhador, _base_trabalhador = abrir_base_compartilhada(nome_memoria, layout, metadados)
+    _blocos_trabalhador = {atributo: np.load(os.path.join(pasta, f"{atributo}.npy"), mmap_mode="r+")
+                           for atributo in atributos}
+
+
+def _calcular_tile(atributos, inicio, casos):
+    _preencher_tile(_base_trabalhador, _blocos_trabalhador, atributos, inicio, casos)
+
+
+def _inicializar_avaliacao(pasta):
+    global _blocos_trabalhador
+    _blocos_trabalhador = BlocosSimilaridade.abrir(pasta)
+
+
+def _avaliar_no_trabalhador(pesos, alvo, k):
+    return _blocos_trabalhador.avaliar(pesos, alvo, k)
+
+
+def _k_maiores_por_linha(sims, k):
+    """Posições dos k maiores de cada linha, desempatando pela posição (como `selecionar_top_k`).
+
+    As similaridades numéricas e da classificação têm poucos valores distintos, então
+    empates na fronteira dos k vizinhos são comuns: um argpartition escolheria entre os
+    empatados de forma arbitrária, e a nota não seria a dos vizinhos que a busca retorna.
+    """
+    corte = np.partition(sims, sims.shape[1] - k, axis=1)[:, sims.shape[1] - k, np.newaxis]
+    acima = sims > corte
+    empatados = sims == corte
+    # Dos empatados no corte, só os primeiros (pela posição) completam os k
+    faltam = k - acima.sum(axis=1, keepdims=True)
+    selecionados = acima | (empatados & (np.cumsum(empatados, axis=1) <= faltam))
+    return np.nonzero(selecionados)[1].reshape(len(sims), k)
+
+
+class BlocosSimilaridade:
+    """Similaridades locais (consultas x casos) de cada atributo, calculadas uma única vez.
+
+    `consultas` são as posições dos casos de consulta na base; as matrizes ficam em
+    `matrizes[atributo]` (arrays em memória ou .npy mapeados de `pasta`). `origem` é
+    gravada com os blocos e identifica de onde vieram (ex: CSV e parâmetros do sorteio).
+    """
+
+    def __init__(self, consultas, atributos, matrizes, presentes, consultas_presentes, validos,
+                 pasta=None, temporaria=None, origem=None):
+        self.consultas = consultas
+        self.atributos = atributos
+        self.matrizes = matrizes
+        self.presentes = presentes  # (atributos x casos): caso tem o atributo
+        self.consultas_presentes = consultas_presentes  # (atributos x consultas): consulta informa o atributo
+        self.validos = validos  # Casos que podem ser vizinhos (não vazios e não removidos)
+        self.n = len(validos)
+        self.pasta = pasta
+        self._temporaria = temporaria  # Pasta temporária removida junto com o objeto
+        self.origem = origem
+
+    @classmethod
+    def calcular(cls, base, consultas, atributos=None, pasta=None, processos=1, dtype=np.float32, origem=None):
+        """Calcula os blocos das consultas (posições na base) contra a base inteira."""
+        consultas = np.asarray(consultas, dtype=np.int64)
+        atributos = tuple(a for a in ORDEM_ATRIBUTOS if a in base.presente and (atributos is None or a in atributos))
+        dtype = np.dtype(dtype)
+        forma = (len(consultas), base.n)
+        temporaria = None
+        if pasta is None and (processos > 1 or forma[0] * forma[1] * len(atributos) * dtype.itemsize
+                              > LIMITE_BYTES_EM_MEMORIA):
+            temporaria = tempfile.TemporaryDirectory(prefix="blocos_similaridade_")
+            pasta = temporaria.name
+
+        casos = [base.casos[i] for i in consultas]
+        consultas_presentes = np.array([[bool(caso) and atributo_presente_na_consulta(caso, atributo)
+                                         for caso in casos] for atributo in atributos], dtype=bool)
+        presentes = np.array([base.presente[atributo] for atributo in atributos], dtype=bool)
+        validos = base.caso_valido & base.ativo
+        consultas_presentes = consultas_presentes.reshape(len(atributos), forma[0])
+        presentes = presentes.reshape(len(atributos), forma[1])
+        if pasta is None:
+            matrizes = {atributo: np.empty(forma, dtype=dtype) for atributo in atributos}
+        else:
+            os.makedirs(pasta, exist_ok=True)
+            matrizes = {atributo: np.lib.format.open_memmap(os.path.join(pasta, f"{atributo}.npy"), mode="w+",
+                                                            dtype=dtype, shape=forma)
+                        for atributo in atributos}
+        blocos = cls(consultas, atributos, matrizes, presentes, consultas_presentes, validos, pasta, temporaria,
+                     origem)
+        if pasta is not None:
+            blocos._salvar_metadados()
+
+        linhas_por_tile = consultas_por_tile(base.n)
+        tiles = [(inicio, casos[inicio:inicio + linhas_por_tile]) for inicio in range(0, len(casos), linhas_por_tile)]
+        if processos > 1 and len(tiles) > 1:
+            memoria, argumentos = compartilhar_base(base)
+            try:
+                with ProcessPoolExecutor(max_workers=processos, initializer=_inicializar_calculo,
+                                         initargs=(pasta, atributos) + argumentos) as executor:
+                    for futuro in [executor.submit(_calcular_tile, atributos, inicio, tile) for inicio, tile in tiles]:
+                        futuro.result()
+            finally:
+                memoria.close()
+                memoria.unlink()
+        else:
+            for inicio, tile in tiles:
+                _preencher_tile(base, matrizes, atributos, inicio, tile)
+        for matriz in matrizes.values():
+            if isinstance(matriz, np.memmap):
+                matriz.flush()
+        return blocos
+
+    def _salvar_metadados(self):
+        np.save(os.path.join(self.pasta, "consultas.npy"), self.consultas)
+        np.save(os.path.join(self.pasta, "presentes.npy"), self.presentes)
+        np.save(os.path.join(self.pasta, "consultas_presentes.npy"), self.consultas_presentes)
+        np.save(os.path.join(self.pasta, "validos.npy"), self.validos)
+        with open(os.path.join(self.pasta, ARQUIVO_METADADOS), "w", encoding="utf-8") as arquivo:
+            json.dump({"atributos": list(self.atributos), "n": self.n, "consultas": len(self.consultas),
+                       "origem": self.origem}, arquivo)
+
+    @classmethod
+    def abrir(cls, pasta):
+        """Reabre blocos gravados em `pasta` (as matrizes são mapeadas em memória, só leitura)."""
+        with open(os.path.join(pasta, ARQUIVO_METADADOS), encoding="utf-8") as arquivo:
+            metadados = json.load(arquivo)
+        atributos = tuple(metadados["atributos"])
+        return cls(np.load(os.path.join(pasta, "consultas.npy")), atributos,
+                   {atributo: np.load(os.path.join(pasta, f"{atributo}.npy"), mmap_mode="r") for atributo in atributos},
+                   np.load(os.path.join(pasta, "presentes.npy")), np.load(os.path.join(pasta, "consultas_presentes.npy")),
+                   np.load(os.path.join(pasta, "validos.npy")), pasta, origem=metadados.get("origem"))
+
+    def __len__(self):
+        return len(self.consultas)
+
+    def _preparar(self, pesos):
+        """Atributos usados [(linha, atributo, peso)], pesos efetivamente usados por padrão de
+        presença das consultas (padrões x casos) e o padrão de cada consulta.
+
+        O denominador da similaridade global só depende de quais atributos a consulta
+        informa, então é calculado uma vez por padrão, e não por consulta.
+        """
+        sem_blocos = [a for a in ORDEM_ATRIBUTOS if pesos.get(a, 0) > 0 and a not in self.atributos]
+        if sem_blocos:
+            raise ValueError(f"atributos com peso mas sem blocos calculados: {', '.join(sem_blocos)}")
+        usados = [(j, atributo, pesos[atributo]) for j, atributo in enumerate(self.atributos)
+                  if pesos.get(atributo, 0) > 0]
+        mascaras = self.consultas_presentes[[j for j, _, _ in usados]].T
+        padroes, padrao_da_consulta = np.unique(mascaras, axis=0, return_inverse=True)
+        pesos_por_padrao = np.zeros((len(padroes), self.n))
+        for linha, padrao in enumerate(padroes):
+            for (j, _, peso), presente in zip(usados, padrao):  # Mesma ordem de soma da busca
+                if presente:
+                    pesos_por_padrao[linha] += np.where(self.presentes[j], peso, 0.0)
+        return usados, pesos_por_padrao, padrao_da_consulta.reshape(-1)
+
+    def _recombinar(self, preparo, inicio, fim, soma_ponderada, temporario):
+        """Similaridades globais das consultas [inicio, fim) (em `soma_ponderada`, reaproveitada)."""
+        usados, pesos_por_padrao, padrao_da_consulta = preparo
+        soma_ponderada[...] = 0.0
+        compensacao = nova_compensacao(soma_ponderada.shape)
+        for _, atributo, peso in usados:
+            # Consultas sem o atributo têm linha de zeros no bloco: somar 0.0 não muda o valor
+            np.multiply(self.matrizes[atributo][inicio:fim], peso, out=temporario)
+            acumular_soma(soma_ponderada, compensacao, temporario)
+        concluir_soma(soma_ponderada, compensacao)
+        pesos_efetivamente_usados = pesos_por_padrao[padrao_da_consulta[inicio:fim]]
+        usados_validos = self.validos[np.newaxis, :] & (pesos_efetivamente_usados != 0)
+        np.divide(soma_ponderada, pesos_efetivamente_usados, out=soma_ponderada, where=usados_validos)
+        soma_ponderada[~usados_validos] = 0.0
+        return soma_ponderada
+
+    def similaridades(self, pesos, inicio=0, fim=None):
+        """Similaridades globais das consultas [inicio, fim) contra a base, para um vetor de pesos.
+
+        Mesmas regras (e ordem de soma) de `recuperacao._similaridades_do_tile`.
+        """
+        fim = len(self.consultas) if fim is None else fim
+        forma = (fim - inicio, self.n)
+        return self._recombinar(self._preparar(pesos), inicio, fim, np.empty(forma), np.empty(forma))
+
+    def avaliar(self, pesos, alvo=ALVO_PADRAO, k=K_PADRAO):
+        """Nota leave-one-out de um vetor de pesos: similaridade média, no alvo, com os k vizinhos.
+
+        A nota é None se nenhum atributo além do alvo tem peso positivo.
+        """
+        if alvo not in self.atributos:
+            raise ValueError(f"atributo alvo sem blocos calculados: {alvo}")
+        j_alvo = self.atributos.index(alvo)
+        k = min(k, self.n - 1)
+        if k <= 0:
+            return {"nota": None, "consultas": 0}
+        preparo = self._preparar({atributo: peso for atributo, peso in pesos.items() if atributo != alvo})
+        if not preparo[0]:
+            return {"nota": None, "consultas": 0}  # Sem atributos usados, todos os "vizinhos" empatam em 0
+        # Consultas que não informam nenhum atributo usado também só teriam empates em 0
+        informativas = self.consultas_presentes[[j for j, _, _ in preparo[0]]].any(axis=0)
+        linhas_por_tile = consultas_por_tile(self.n)
+        soma_ponderada = np.empty((linhas_por_tile, self.n))
+        temporario = np.empty((linhas_por_tile, self.n))
+        invalidos = ~self.validos
+        soma, consultas = 0.0, 0
+        for inicio in range(0, len(self.consultas), linhas_por_tile):
+            fim = min(len(self.consultas), inicio + linhas_por_tile)
+            linhas = fim - inicio
+            sims = self._recombinar(preparo, inicio, fim, soma_ponderada[:linhas], temporario[:linhas])
+            sims[:, invalidos] = -np.inf
+            sims[np.arange(linhas), self.consultas[inicio:fim]] = -np.inf  # A própria consulta fica de fora
+            vizinhos = _k_maiores_por_linha(sims, k)
+            considerados = (np.take_along_axis(sims, vizinhos, axis=1) > -np.inf) & self.presentes[j_alvo][vizinhos]
+            notas = np.take_along_axis(np.asarray(self.matrizes[alvo][inicio:fim]), vizinhos, axis=1)
+            quantidades = considerados.sum(axis=1)
+            com_alvo = self.consultas_presentes[j_alvo, inicio:fim] & informativas[inicio:fim] & (quantidades > 0)
+            soma += float((np.where(considerados, notas, 0.0).sum(axis=1)[com_alvo] / quantidades[com_alvo]).sum())
+            consultas += int(com_alvo.sum())
+        return {"nota": soma / consultas if consultas else None, "consultas": consultas}
+
+    def avaliar_varios(self, lista_pesos, alvo=ALVO_PADRAO, k=K_PADRAO, processos=1):
+        """Avalia vários vetores de pesos (em vários processos, se os blocos estiverem em disco)."""
+        if processos > 1 and self.pasta is not None and len(lista_pesos) > 1:
+            with ProcessPoolExecutor(max_workers=processos, initializer=_inicializar_avaliacao,
+                                     initargs=(self.pasta,)) as executor:
+                avaliacoes = list(executor.map(_avaliar_no_trabalhador, lista_pesos,
+                                               itertools.repeat(alvo), itertools.repeat(k)))
+        else:
+            avaliacoes = [self.avaliar(pesos, alvo, k) for pesos in lista_pesos]
+        return [dict(avaliacao, pesos=pesos) for pesos, avaliacao in zip(lista_pesos, avaliacoes)]
+
+
+# --- Vetores de Pesos Candidatos ---
+
+def pesos_aleatorios(quantidade, semente=SEMENTE_PADRAO, atributos=ORDEM_ATRIBUTOS,
+                     valores=VALORES_PESOS_ALEATORIOS):
+    """`quantidade` vetores de pesos sorteados (cada peso entre `valores`), reproduzíveis pela semente."""
+    rng = random.Random(semente)
+    return [{atributo: rng.choice(valores) for atributo in atributos} for _ in range(quantidade)]
+
+
+def grade_de_pesos(valores_por_atributo, pesos_base=PESOS_PADRAO):
+    """Todas as combinações dos valores de cada atributo ({atributo: [valores]}), completadas com `pesos_base`."""
+    nomes = list(valores_por_atributo)
+    return [dict(pesos_base, **dict(zip(nomes, combinacao)))
+            for combinacao in itertools.product(*(valores_por_atributo[nome] for nome in nomes))]
+
+
+def sortear_consultas(base, quantidade, alvo=ALVO_PADRAO, semente=SEMENTE_PADRAO):
+    """Posições (ordenadas) de até `quantidade` casos ativos com o alvo; 0 = todos (leave-one-out completo)."""
+    elegiveis = np.flatnonzero(base.caso_valido & base.ativo & base.presente[alvo])
+    if quantidade <= 0 or quantidade >= len(elegiveis):
+        return elegiveis
+    return np.sort(np.array(random.Random(semente).sample(elegiveis.tolist(), quantidade), dtype=np.int64))
+
+
+def _ler_grade(especificacoes):
+    grade = {}
+    for especificacao in especificacoes:
+        atributo, _, valores = especificacao.partition("=")
+        if atributo not in ORDEM_ATRIBUTOS or not valores:
+            raise SystemExit(f"--grade inválida: '{especificacao}' (use atributo=v1,v2,...)")
+        grade[atributo] = [float(valor) for valor in valores.split(",")]
+    return grade
+
+
+def _origem_dos_blocos(args):
+    """O que define os blocos da linha de comando: conteúdo do CSV e do log de retenção e parâmetros."""
+    caminho_log = caminho_log_retencao(args.csv)
+    return {"csv": chave_arquivo(args.csv),
+            "retencao": chave_arquivo(caminho_log) if os.path.exists(caminho_log) else None,
+            "consultas": args.consultas, "alvo": args.alvo, "semente": args.semente,
+            "dtype": np.dtype(np.float64 if args.float64 else np.float32).str}
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Ajuste de pesos por leave-one-out com blocos de similaridade.")
+    parser.add_argument("--csv", default=CAMINHO_BASE_PADRAO, help="Arquivo CSV da base de casos")
+    parser.add_argument("--consultas", type=int, default=CONSULTAS_PADRAO, help="Consultas sorteadas (0 = todos os casos)")
+    parser.add_argument("--alvo", default=ALVO_PADRAO, choices=ORDEM_ATRIBUTOS, help="Atributo previsto pelos vizinhos")
+    parser.add_argument("-k", type=int, default=K_PADRAO)
+    parser.add_argument("--candidatos", type=int, default=CANDIDATOS_PADRAO, help="Vetores de pesos aleatórios avaliados")
+    parser.add_argument("--grade", nargs="+", default=(), help="Busca em grade: atributo=v1,v2,... (em vez da aleatória)")
+    parser.add_argument("--semente", type=int, default=SEMENTE_PADRAO)
+    parser.add_argument("--pasta", help="Pasta dos blocos em disco (reaproveitada se já existir)")
+    parser.add_argument("--float64", action="store_true", help="Blocos em float64 (similaridades exatas)")
+    parser.add_argument("--processos", type=int, default=1, help="Processos para calcular e avaliar (0 = todos os núcleos)")
+    parser.add_argument("--saida", help="Arquivo JSON do resultado (padrão: saída padrão)")
+    args = parser.parse_args(argumentos)
+    processos = args.processos or os.cpu_count() or 1
+
+    inicio = time.perf_counter()
+    origem = _origem_dos_blocos(args)
+    blocos = None
+    if args.pasta and os.path.exists(os.path.join(args.pasta, ARQUIVO_METADADOS)):
+        blocos = BlocosSimilaridade.abrir(args.pasta)
+        if blocos.origem == origem:
+            print(f"Blocos reabertos de '{args.pasta}' ({len(blocos)} consultas x {blocos.n} casos).",
+                  file=sys.stderr)
+        else:
+            print(f"Blocos de '{args.pasta}' calculados com outro CSV ou outros parâmetros; recalculando.",
+                  file=sys.stderr)
+            blocos = None  # Fecha os arquivos mapeados antes de regravá-los
+    if blocos is None:
+        base = BaseDeCasos(args.csv, processos=processos)
+        with contextlib.redirect_stdout(sys.stderr):
+            colunar = base.colunar
+        consultas = sortear_consultas(colunar, args.consultas, args.alvo, args.semente)
+        blocos = BlocosSimilaridade.calcular(colunar, consultas, pasta=args.pasta, processos=processos,
+                                             dtype=np.float64 if args.float64 else np.float32, origem=origem)
+        print(f"Blocos calculados em {time.perf_counter() - inicio:.2f}s "
+              f"({len(blocos)} consultas x {blocos.n} casos).", file=sys.stderr)
+    tempo_blocos = time.perf_counter() - inicio
+
+    candidatos = [dict(PESOS_PADRAO)]
+    candidatos += grade_de_pesos(_ler_grade(args.grade)) if args.grade else pesos_aleatorios(args.candidatos, args.semente)
+    inicio = time.perf_counter()
+    avaliacoes = blocos.avaliar_varios(candidatos, args.alvo, args.k, processos)
+    tempo_avaliacao = time.perf_counter() - inicio
+    padrao = avaliacoes[0]
+    ordenadas = sorted(avaliacoes, key=lambda a: -1.0 if a["nota"] is None else a["nota"], reverse=True)
+    print(f"{len(candidatos)} vetores de pesos avaliados em {tempo_avaliacao:.2f}s. Nota de PESOS_PADRAO: "
+          f"{padrao['nota']}; melhor: {ordenadas[0]['nota']}.", file=sys.stderr)
+
+    relatorio = {
+        "parametros": {"csv": args.csv, "consultas": len(blocos), "casos": blocos.n, "alvo": args.alvo, "k": args.k,
+                       "candidatos": len(candidatos), "semente": args.semente},
+        "tempo_blocos_s": tempo_blocos,
+        "tempo_avaliacao_s": tempo_avaliacao,
+        "pesos_padrao": padrao,
+        "resultados": ordenadas,
+    }
+    texto = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(texto + "\n")
+        print(f"Resultado gravado em '{args.saida}'.", file=sys.stderr)
+    else:
+        print(texto)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,704 @@
+import sys
+import time
+
+import numpy as np
+
+from indices import CodificacaoBitmask, IndiceInvertido, ListasCSR, Vocabulario, contar_bits
+from instrumentacao import INSTRUMENTACAO
+from similaridade import (
+    METRICA_DO_ATRIBUTO,
+    ATRIBUTOS_JACCARD, GENEROS_POSSIVEIS_EXEMPLO, POSICAO_CANONICA, TABELA_SIMILARIDADE_MPAA,
+    classificacao_canonica, conjunto_jaccard, forma_canonica,
+    MIN_ANO, MAX_ANO, MIN_DURACAO, MAX_DURACAO,
+    MIN_AVALIACAO_IMDB, MAX_AVALIACAO_IMDB, MIN_VOTOS, MAX_VOTOS,
+    MIN_ORCAMENTO, MAX_ORCAMENTO, MIN_BILHETERIA_MUNDIAL, MAX_BILHETERIA_MUNDIAL,
+    MIN_VITORIAS, MAX_VITORIAS, MIN_INDICACOES, MAX_INDICACOES,
+    MIN_OSCARS_INDICADOS, MAX_OSCARS_INDICADOS,
+)
+
+# --- Base de Casos Colunar ---
+# Representação da base de casos em colunas NumPy, construída uma única vez a partir
+# da lista de casos retornada por `carregar_base_de_casos_csv`. Permite calcular a
+# similaridade do caso de entrada contra TODA a base em uma única passada vetorizada,
+# em vez de chamar `calcular_similaridade_global` filme a filme.
+#
+# Os resultados são idênticos aos da função par a par: cada atributo segue as mesmas
+# regras de valores ausentes e a soma ponderada é acumulada na mesma ordem de
+# atributos, com a mesma renormalização por `pesos_efetivamente_usados` por filme.
+
+# Atributos numéricos e seus ranges de normalização (Min, Max)
+ATRIBUTOS_NUMERICOS = {
+    "ano_lancamento": (MIN_ANO, MAX_ANO),
+    "duracao_minutos": (MIN_DURACAO, MAX_DURACAO),
+    "avaliacao_critica": (MIN_AVALIACAO_IMDB, MAX_AVALIACAO_IMDB),
+    "votos": (MIN_VOTOS, MAX_VOTOS),
+    "orcamento": (MIN_ORCAMENTO, MAX_ORCAMENTO),
+    "bilheteria_mundial": (MIN_BILHETERIA_MUNDIAL, MAX_BILHETERIA_MUNDIAL),
+    "vitorias": (MIN_VITORIAS, MAX_VITORIAS),
+    "indicacoes": (MIN_INDICACOES, MAX_INDICACOES),
+    "oscars_indicados": (MIN_OSCARS_INDICADOS, MAX_OSCARS_INDICADOS),
+}
+
+# Atributos de pessoas: os nomes viram ids do vocabulário da base e cada atributo é
+# guardado em listas CSR (ver indices.ListasCSR). Quase todos os filmes têm Jaccard 0
+# contra a consulta, então, para a base inteira, a interseção é calculada por índice
+# invertido apenas para os filmes que compartilham nomes; para poucos casos (candidatos
+# da poda, faixas dos processos paralelos), pela interseção com as listas ordenadas.
+ATRIBUTOS_INDICE_INVERTIDO = ("diretores", "roteiristas", "estrelas")
+
+# Atributos de vocabulário pequeno, codificados em bitmasks (Jaccard por popcount).
+# A classificação etária já é um código inteiro único por caso (ordinal), sem bitmask.
+ATRIBUTOS_BITMASK = ("generos", "pais_origem", "idioma")
+VOCABULARIOS_CONHECIDOS = {"generos": GENEROS_POSSIVEIS_EXEMPLO}
+
+ATRIBUTO_ORDINAL = "classificacao_etaria"
+
+# TABELA_SIMILARIDADE_MPAA com uma linha e uma coluna extras de zeros: o índice -1
+# (classificação não mapeada) sempre tem similaridade ordinal 0
+_TABELA_MPAA = np.zeros((len(TABELA_SIMILARIDADE_MPAA) + 1,) * 2)
+_TABELA_MPAA[:-1, :-1] = TABELA_SIMILARIDADE_MPAA
+
+# Mesma ordem usada em `calcular_similaridade_global` (a ordem da soma importa para
+# obter exatamente os mesmos valores em ponto flutuante).
+ORDEM_ATRIBUTOS = (
+    "generos", "ano_lancamento", "classificacao_etaria", "duracao_minutos",
+    "avaliacao_critica", "votos", "orcamento", "bilheteria_mundial",
+    "diretores", "roteiristas", "estrelas", "pais_origem", "idioma",
+    "vitorias", "indicacoes", "oscars_indicados",
+)
+
+# `calcular_similaridade_global` soma as similaridades ponderadas com `sum()`, que a partir
+# do Python 3.12 usa soma compensada (Neumaier) e arredonda diferente de uma soma termo a
+# termo. Os caminhos vetorizados acumulam com a mesma regra do interpretador em uso.
+SOMA_COMPENSADA = sys.version_info >= (3, 12)
+
+# Fração de casos removidos (lápides) a partir da qual a base é compactada
+FRACAO_MAXIMA_REMOVIDOS = 0.5
+# Fração de casos alterados (retenção) a partir da qual um índice invertido incorpora as
+# alterações ao seu CSR (cada consulta filtra as postings pelos casos alterados)
+FRACAO_MAXIMA_ALTERADOS_INDICE = 0.05
+
+
+def _valor_numerico(valor):
+    """Converte um valor de atributo numérico para float (NaN se não for comparável)."""
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    return np.nan  # Presente mas não numérico: similaridade 0, como na versão par a par
+
+
+def atributo_presente_na_consulta(caso_novo, atributo):
+    """Indica se o caso de entrada informa o atributo (mesmo critério de `calcular_similaridade_global`)."""
+    if atributo in ATRIBUTOS_NUMERICOS:
+        return caso_novo.get(atributo) is not None
+    return atributo in caso_novo
+
+
+class BaseColunar:
+    """Base de casos armazenada em colunas (arrays NumPy) para cálculo vetorizado de similaridade."""
+
+    def __init__(self, casos, atributos=None, vocabulario=None):
+        self.casos = casos
+        self.n = len(casos)
+        self.versao = 0  # Incrementada a cada alteração dos casos (invalida caches)
+        # Atributos com colunas construídas (projeção); None = todos
+        self.atributos = tuple(a for a in ORDEM_ATRIBUTOS if atributos is None or a in atributos)
+        # Casos vazios ({}) sempre têm similaridade 0
+        self.caso_valido = np.fromiter((bool(c) for c in casos), dtype=bool, count=self.n)
+        # Casos removidos (lápides) continuam na posição, mas ficam fora das buscas
+        self.ativo = np.ones(self.n, dtype=bool)
+        self.removidos = 0
+        self._capacidade = self.n
+        self._reservas = {}
+        # Vocabulário dos nomes (ids das listas CSR); só é compartilhado se informado
+        self.vocabulario = Vocabulario() if vocabulario is None else vocabulario
+
+        # Colunas numéricas: valores (float64) e máscara de valores presentes
+        self.valores = {}
+        self.presente = {}
+        for atributo in self._atributos_do_tipo(ATRIBUTOS_NUMERICOS):
+            brutos = [caso.get(atributo) for caso in casos]
+            self.presente[atributo] = np.fromiter(
+                (v is not None for v in brutos), dtype=bool, count=self.n)
+            self.valores[atributo] = np.fromiter(
+                (_valor_numerico(v) if v is not None else np.nan for v in brutos),
+                dtype=np.float64, count=self.n)
+
+        # Formas canônicas (calculadas no carregamento; ver similaridade.forma_canonica)
+        canonicos = [forma_canonica(caso) for caso in casos]
+
+        # Atributos multivalorados: conjuntos já limpos (tuplas sem repetição) e suas
+        # cardinalidades; os de pessoas ficam só como listas CSR de ids do vocabulário
+        self.conjuntos = {}
+        self.listas = {}
+        self.cardinalidades = {}
+        for atributo in self._atributos_do_tipo(ATRIBUTOS_JACCARD):
+            posicao = POSICAO_CANONICA[atributo]
+            self.presente[atributo] = np.fromiter(
+                (c[posicao] is not None for c in canonicos), dtype=bool, count=self.n)
+            conjuntos = [c[posicao] or () for c in canonicos]
+            if atributo in ATRIBUTOS_INDICE_INVERTIDO:
+                self.listas[atributo] = ListasCSR.de_conjuntos(conjuntos, self.vocabulario)
+            else:
+                self.conjuntos[atributo] = conjuntos
+            self.cardinalidades[atributo] = np.fromiter(
+                (len(c) for c in conjuntos), dtype=np.int64, count=self.n)
+
+        # Classificação etária: ordinal (-1 se não mapeada) e código da classificação canônica
+        self.tabela_classificacoes = {}
+        if ATRIBUTO_ORDINAL in self.atributos:
+            posicao = POSICAO_CANONICA[ATRIBUTO_ORDINAL]
+            self.presente[ATRIBUTO_ORDINAL] = np.fromiter(
+                (c[posicao] is not None for c in canonicos), dtype=bool, count=self.n)
+            ordinais = np.full(self.n, -1, dtype=np.int64)
+            codigos = np.empty(self.n, dtype=np.int64)
+            for i, c in enumerate(canonicos):
+                classificacao = c[posicao]
+                codigos[i] = self.tabela_classificacoes.setdefault(classificacao, len(self.tabela_classificacoes))
+                if type(classificacao) is int:
+                    ordinais[i] = classificacao
+            self.ordinais_classificacao = ordinais
+            self.codigos_classificacao = codigos
+
+        self._construir_indices()
+
+    def _atributos_do_tipo(self, tipo):
+        return [atributo for atributo in self.atributos if atributo in tipo]
+
+    def _construir_indices(self):
+        """(Re)constrói os índices invertidos (a partir das listas CSR) e as bitmasks (dos conjuntos)."""
+        self._construir_indices_invertidos()
+        self.bitmasks = {atributo: CodificacaoBitmask(self.conjuntos[atributo],
+                                                      VOCABULARIOS_CONHECIDOS.get(atributo, ()))
+                         for atributo in self._atributos_do_tipo(ATRIBUTOS_BITMASK)}
+
+    def _construir_indices_invertidos(self):
+        self.indices_invertidos = {atributo: IndiceInvertido(listas)
+                                   for atributo, listas in self.listas.items()}
+
+    @classmethod
+    def concatenar(cls, blocos):
+        """Junta várias bases colunares (ex: blocos lidos em sequência) em uma só, na mesma ordem.
+
+        `blocos` pode ser um gerador: cada bloco é incorporado e descartado antes do
+        próximo, e as partes de cada coluna são liberadas assim que a coluna é montada, então
+        o pico de memória é a base final mais um bloco (e as partes de uma coluna).
+        """
+        base = cls.__new__(cls)
+        base.casos = []
+        base.versao = 0
+        base.atributos = None
+        base.removidos = 0
+        base._reservas = {}
+        base.vocabulario = Vocabulario()
+        base.tabela_classificacoes = {}
+        base.presente, base.valores, base.cardinalidades, base.conjuntos = {}, {}, {}, {}
+        partes, partes_listas = {}, {}
+        for bloco in blocos:
+            if base.atributos is None:
+                base.atributos = bloco.atributos
+                base.conjuntos = {atributo: [] for atributo in bloco.conjuntos}
+            base.casos.extend(bloco.casos)
+            base.removidos += bloco.removidos
+            for atributo, conjuntos in bloco.conjuntos.items():
+                base.conjuntos[atributo].extend(conjuntos)
+            for atributo in bloco.listas:
+                partes_listas.setdefault(atributo, []).append(base._listas_no_vocabulario(bloco, atributo))
+            # Bitmasks e listas CSR são remontadas no fim (dos conjuntos e das partes recodificadas)
+            colunas = {nome: array for nome, array in bloco._arrays_por_caso().items()
+                       if nome.partition(".")[0] not in ("bitmask", "listas")}
+            if ATRIBUTO_ORDINAL in base.atributos:
+                # Recodifica as strings do bloco na tabela unificada
+                mapa = np.array([base.tabela_classificacoes.setdefault(s_val, len(base.tabela_classificacoes))
+                                 for s_val in bloco.tabela_classificacoes], dtype=np.int64)
+                if len(mapa):
+                    colunas["codigos_classificacao"] = mapa[bloco.codigos_classificacao]
+            for nome, array in colunas.items():
+                partes.setdefault(nome, []).append(array)
+            del bloco, colunas
+        if base.atributos is None:
+            return cls([])
+        base.n = len(base.casos)
+        base._capacidade = base.n
+        for nome in list(partes):
+            base._definir_array_por_caso(nome, np.concatenate(partes.pop(nome)))
+        base.listas = {atributo: ListasCSR.concatenar(partes_listas.pop(atributo)) for atributo in list(partes_listas)}
+        base._construir_indices()
+        return base
+
+    def _listas_no_vocabulario(self, bloco, atributo):
+        """Listas CSR do atributo de outra base, com os ids do vocabulário desta."""
+        listas = bloco.listas[atributo]
+        if bloco.vocabulario is self.vocabulario:
+            return listas
+        mapa = self.vocabulario.codificar(bloco.vocabulario.valores)
+        if np.array_equal(mapa, np.arange(len(mapa))):  # Vocabulário do bloco é prefixo deste
+            return listas
+        return listas.recodificar(mapa)
+
+    def __len__(self):
+        return self.n
+
+    def exportar(self):
+        """Separa a base em (metadados, arrays) para compartilhar com outros processos.
+
+        `arrays` contém apenas arrays NumPy (podem ir para memória compartilhada) e
+        `metadados` os dicionários pequenos (vocabulários, tabela de classificações).
+        Os casos e os conjuntos Python não são exportados: a similaridade usa apenas as
+        listas CSR, os índices invertidos e as bitmasks.
+        """
+        if any(indice.alterados for indice in self.indices_invertidos.values()):
+            self._construir_indices_invertidos()  # Incorpora as alterações incrementais ao CSR
+        arrays = self._arrays_por_caso()
+        metadados = {"n": self.n, "atributos": self.atributos, "removidos": self.removidos,
+                     "tabela_classificacoes": self.tabela_classificacoes,
+                     "vocabulario": self.vocabulario.exportar(), "bitmasks": {}}
+        for atributo, listas in self.listas.items():
+            arrays[f"listas.{atributo}.ids"] = listas.exportar()["ids"]
+        for atributo, indice in self.indices_invertidos.items():
+            for nome, array in indice.exportar().items():
+                arrays[f"indice.{atributo}.{nome}"] = array
+        for atributo, codificacao in self.bitmasks.items():
+            metadados_bitmask, _ = codificacao.exportar()
+            metadados["bitmasks"][atributo] = metadados_bitmask
+        return metadados, arrays
+
+    def _arrays_por_caso(self):
+        """Arrays com uma linha por caso, por nome (os mesmos nomes de `exportar`)."""
+        arrays = {"caso_valido": self.caso_valido, "ativo": self.ativo}
+        for atributo, presentes in self.presente.items():
+            arrays["presente." + atributo] = presentes
+        for atributo, valores in self.valores.items():
+            arrays["valores." + atributo] = valores
+        for atributo, cardinalidades in self.cardinalidades.items():
+            arrays["cardinalidades." + atributo] = cardinalidades
+        if ATRIBUTO_ORDINAL in self.atributos:
+            arrays["ordinais_classificacao"] = self.ordinais_classificacao
+            arrays["codigos_classificacao"] = self.codigos_classificacao
+        for atributo, codificacao in self.bitmasks.items():
+            arrays[f"bitmask.{atributo}.mascaras"] = codificacao.mascaras
+        for atributo, listas in self.listas.items():
+            arrays[f"listas.{atributo}.inicio"] = listas.inicio
+            arrays[f"listas.{atributo}.fim"] = listas.fim
+        return arrays
+
+    def _definir_array_por_caso(self, nome, array):
+        tipo, _, atributo = nome.partition(".")
+        if tipo in ("presente", "valores", "cardinalidades"):
+            getattr(self, tipo)[atributo] = array
+        elif tipo == "bitmask":
+            self.bitmasks[atributo.partition(".")[0]].mascaras = array
+        elif tipo == "listas":
+            atributo, _, campo = atributo.partition(".")
+            setattr(self.listas[atributo], campo, array)
+        else:
+            setattr(self, nome, array)
+
+    @classmethod
+    def importar(cls, metadados, arrays, casos=None):
+        """Recria uma base a partir de `exportar()`, usando os arrays sem copiá-los."""
+        base = cls.__new__(cls)
+        base.casos = casos
+        base.n = metadados["n"]
+        base.versao = 0
+        base.atributos = metadados["atributos"]
+        base.caso_valido = arrays["caso_valido"]
+        base.ativo = arrays["ativo"]
+        base.removidos = metadados["removidos"]
+        base._capacidade = base.n
+        base._reservas = {}
+        base.tabela_classificacoes = metadados["tabela_classificacoes"]
+        base.presente, base.valores, base.cardinalidades = {}, {}, {}
+        base.conjuntos = {}
+        base.vocabulario = Vocabulario.importar(metadados["vocabulario"])
+        for nome, array in arrays.items():
+            tipo, _, atributo = nome.partition(".")
+            if tipo == "presente":
+                base.presente[atributo] = array
+            elif tipo == "valores":
+                base.valores[atributo] = array
+            elif tipo == "cardinalidades":
+                base.cardinalidades[atributo] = array
+        if ATRIBUTO_ORDINAL in base.atributos:
+            base.ordinais_classificacao = arrays["ordinais_classificacao"]
+            base.codigos_classificacao = arrays["codigos_classificacao"]
+        atributos_listas = base._atributos_do_tipo(ATRIBUTOS_INDICE_INVERTIDO)
+        base.listas = {atributo: ListasCSR.importar({campo: arrays[f"listas.{atributo}.{campo}"]
+                                                     for campo in ("ids", "inicio", "fim")})
+                       for atributo in atributos_listas}
+        base.indices_invertidos = {
+            atributo: IndiceInvertido.importar({campo: arrays[f"indice.{atributo}.{campo}"]
+                                                for campo in ("offsets", "casos")})
+            for atributo in atributos_listas}
+        base.bitmasks = {
+            atributo: CodificacaoBitmask.importar(metadados_bitmask, {
+                "mascaras": arrays[f"bitmask.{atributo}.mascaras"]})
+            for atributo, metadados_bitmask in metadados["bitmasks"].items()}
+        return base
+
+    def indices_ativos(self):
+        """Índices dos casos que participam das buscas (todos, exceto os removidos)."""
+        if not self.removidos:
+            return np.arange(self.n)
+        return np.flatnonzero(self.ativo)
+
+    # --- Alterações Incrementais (Retenção) ---
+    # Adicionar um caso grava uma nova linha em cada coluna: os arrays têm capacidade
+    # reservada que dobra quando acaba (custo amortizado O(1)) e as colunas expostas são
+    # views do trecho ocupado. Os índices invertidos e as bitmasks são atualizados só
+    # para os valores do caso (o índice invertido guarda as alterações à parte do CSR e é
+    # reconstruído quando os casos alterados passam de FRACAO_MAXIMA_ALTERADOS_INDICE da
+    # base, ou em `exportar`); nas listas CSR, uma linha que cresce vai para
+    # o fim do array de ids. Atualizar reescreve a linha no lugar (a posição, usada no
+    # desempate, não muda). Remover deixa uma lápide (casos[i] = None, ativo[i] = False);
+    # quando as lápides passam de FRACAO_MAXIMA_REMOVIDOS da base, `compactar` reconstrói
+    # as colunas só com os casos ativos (O(N), amortizado pelas remoções anteriores).
+    # Cada alteração incrementa `versao`, o que invalida os caches de resultados.
+    # Os intervalos de normalização numérica são fixos (MIN_*/MAX_* de similaridade), então não
+    # há estatísticas da base para recalcular.
+
+    def _reservar(self, n_necessario):
+        """Garante capacidade para `n_necessario` casos, dobrando os arrays quando preciso."""
+        if n_necessario <= self._capacidade:
+            return
+        capacidade = max(n_necessario, 2 * self._capacidade, 16)
+        for nome, array in self._arrays_por_caso().items():
+            reserva = np.zeros((capacidade,) + array.shape[1:], dtype=array.dtype)
+            reserva[:self.n] = array
+            self._reservas[nome] = reserva
+        self._capacidade = capacidade
+
+    def _verificar_alteravel(self, indice=None):
+        if self.casos is None:
+            raise ValueError("base colunar importada sem os casos não pode ser alterada")
+        if indice is not None and not (0 <= indice < self.n and self.ativo[indice]):
+            raise IndexError(f"não há caso ativo na posição {indice}")
+
+    def _escrever_linha(self, i, caso):
+        """Grava o caso na linha i de todas as colunas (mesmas regras de __init__)."""
+        self.casos[i] = caso
+        self.caso_valido[i] = bool(caso)
+        self.ativo[i] = True
+        for atributo, valores in self.valores.items():
+            valor = caso.get(atributo)
+            self.presente[atributo][i] = valor is not None
+            valores[i] = _valor_numerico(valor) if valor is not None else np.nan
+        canonico = forma_canonica(caso)
+        for atributo, conjuntos in self.conjuntos.items():
+            conjunto = canonico[POSICAO_CANONICA[atributo]]
+            self.presente[atributo][i] = conjunto is not None
+            conjunto = conjunto or ()
+            conjuntos[i] = conjunto
+            self.cardinalidades[atributo][i] = len(conjunto)
+            if atributo in self.bitmasks:
+                self.bitmasks[atributo].definir(i, conjunto)
+        for atributo, listas in self.listas.items():
+            conjunto = canonico[POSICAO_CANONICA[atributo]]
+            self.presente[atributo][i] = conjunto is not None
+            ids = self.vocabulario.codificar(conjunto or ())
+            listas.definir(i, ids)
+            self.cardinalidades[atributo][i] = len(ids)
+            self.indices_invertidos[atributo].adicionar(i, ids)
+        if ATRIBUTO_ORDINAL in self.atributos:
+            classificacao = canonico[POSICAO_CANONICA[ATRIBUTO_ORDINAL]]
+            self.presente[ATRIBUTO_ORDINAL][i] = classificacao is not None
+            self.codigos_classificacao[i] = self.tabela_classificacoes.setdefault(
+                classificacao, len(self.tabela_classificacoes))
+            self.ordinais_classificacao[i] = classificacao if type(classificacao) is int else -1
+
+    def _incorporar_alteracoes_dos_indices(self):
+        """Reconstrói os índices invertidos com alterações acima de FRACAO_MAXIMA_ALTERADOS_INDICE da base.
+
+        Custo O(entradas do atributo), amortizado pelas alterações anteriores.
+        """
+        for atributo, indice in self.indices_invertidos.items():
+            if len(indice.alterados) > FRACAO_MAXIMA_ALTERADOS_INDICE * self.n:
+                self.indices_invertidos[atributo] = IndiceInvertido(self.listas[atributo])
+
+    def _apagar_dos_indices(self, i):
+        """Retira o caso da linha i dos índices invertidos e das bitmasks."""
+        for atributo, indice in self.indices_invertidos.items():
+            indice.remover(i, self.listas[atributo].linha(i))
+            self.listas[atributo].definir(i, ())
+        for codificacao in self.bitmasks.values():
+            codificacao.definir(i, ())
+
+    def adicionar(self, caso):
+        """Acrescenta um caso ao fim da base e retorna sua posição (custo amortizado O(1))."""
+        self._verificar_alteravel()
+        self._reservar(self.n + 1)
+        i = self.n
+        self.n += 1
+        for nome, reserva in self._reservas.items():
+            self._definir_array_por_caso(nome, reserva[:self.n])
+        self.casos.append(None)
+        for conjuntos in self.conjuntos.values():
+            conjuntos.append(())
+        self._escrever_linha(i, caso)
+        self._incorporar_alteracoes_dos_indices()
+        self.versao += 1
+        return i
+
+    def atualizar(self, indice, caso):
+        """Substitui o caso da posição `indice`, mantendo a posição."""
+        self._verificar_alteravel(indice)
+        self._apagar_dos_indices(indice)
+        self._escrever_linha(indice, caso)
+        self._incorporar_alteracoes_dos_indices()
+        self.versao += 1
+
+    def remover(self, indice):
+        """Remove o caso da posição `indice` (lápide); as demais posições não mudam."""
+        self._verificar_alteravel(indice)
+        self._apagar_dos_indices(indice)
+        self.casos[indice] = None
+        self.caso_valido[indice] = False
+        self.ativo[indice] = False
+        self.removidos += 1
+        self._incorporar_alteracoes_dos_indices()
+        self.versao += 1
+
+    @property
+    def precisa_compactar(self):
+        return self.removidos > FRACAO_MAXIMA_REMOVIDOS * self.n
+
+    def compactar(self):
+        """Reconstrói a base só com os casos ativos (na mesma ordem), com um vocabulário novo. As posições mudam."""
+        self._verificar_alteravel()
+        versao = self.versao
+        self.__init__([caso for caso in self.casos if caso is not None], self.atributos)
+        self.versao = versao + 1
+
+    def similaridade_local(self, atributo, valor_novo, indices=None):
+        """Similaridade local do valor de entrada contra a coluna inteira (ou só contra `indices`).
+
+        Retorna (similaridades, presentes): linhas sem o atributo têm similaridade 0 e
+        presente False, e não devem entrar na renormalização dos pesos.
+        """
+        if not INSTRUMENTACAO.ativa:
+            return self._similaridade_local(atributo, valor_novo, indices)
+        inicio = time.perf_counter()
+        resultado = self._similaridade_local(atributo, valor_novo, indices)
+        INSTRUMENTACAO.registrar_atributo(atributo, METRICA_DO_ATRIBUTO[atributo],
+                                          self.n if indices is None else len(indices), time.perf_counter() - inicio)
+        return resultado
+
+    def _similaridade_local(self, atributo, valor_novo, indices):
+        presentes = self.presente[atributo]
+        if indices is not None:
+            presentes = presentes[indices]
+
+        if atributo in ATRIBUTOS_NUMERICOS:
+            valores = self.valores[atributo]
+            if indices is not None:
+                valores = valores[indices]
+            if not isinstance(valor_novo, (int, float)):
+                return np.zeros(len(valores)), presentes
+            min_val, max_val = ATRIBUTOS_NUMERICOS[atributo]
+            max_diff = max_val - min_val
+            if max_diff == 0:
+                sims = (valores == valor_novo).astype(np.float64)
+            else:
+                # fmax descarta NaN (valores não comparáveis), assim como max(0.0, nan) == 0.0
+                sims = np.fmax(1.0 - np.abs(valores - valor_novo) / max_diff, 0.0)
+            return np.where(presentes, sims, 0.0), presentes
+
+        if atributo == ATRIBUTO_ORDINAL:
+            ordinais = self.ordinais_classificacao
+            codigos = self.codigos_classificacao
+            if indices is not None:
+                ordinais = ordinais[indices]
+                codigos = codigos[indices]
+            classificacao = classificacao_canonica(valor_novo)
+            if type(classificacao) is int:
+                # Consulta à tabela; classificações não mapeadas (-1) caem na coluna de zeros
+                sims = _TABELA_MPAA[classificacao][ordinais]
+            else:
+                codigo = self.tabela_classificacoes.get(classificacao, -1)
+                sims = (codigos == codigo).astype(np.float64)
+            return np.where(presentes, sims, 0.0), presentes
+
+        # Jaccard
+        conjunto_novo = conjunto_jaccard(valor_novo)
+        cardinalidades = self.cardinalidades[atributo]
+        if indices is not None:
+            cardinalidades = cardinalidades[indices]
+        if not conjunto_novo:
+            sims = (cardinalidades == 0).astype(np.float64)
+            return np.where(presentes, sims, 0.0), presentes
+        if atributo in self.listas:
+            sims = self._jaccard_por_indice(atributo, conjunto_novo, cardinalidades, indices)
+            return np.where(presentes, sims, 0.0), presentes
+        if atributo in self.bitmasks:
+            if INSTRUMENTACAO.ativa:
+                INSTRUMENTACAO.contar("jaccard.bitmask")
+            intersecoes = self.bitmasks[atributo].contar_intersecoes(conjunto_novo, indices)
+        else:
+            if INSTRUMENTACAO.ativa:
+                INSTRUMENTACAO.contar("jaccard.varredura")
+            conjuntos = self.conjuntos[atributo]
+            if indices is None:
+                linhas = conjuntos
+            else:
+                linhas = [conjuntos[i] for i in indices]
+            intersecoes = np.fromiter((len(conjunto_novo.intersection(c)) for c in linhas),
+                                      dtype=np.int64, count=len(linhas))
+        unioes = cardinalidades + len(conjunto_novo) - intersecoes
+        sims = intersecoes / unioes
+        return np.where(presentes, sims, 0.0), presentes
+
+    def _jaccard_por_indice(self, atributo, conjunto_novo, cardinalidades, indices):
+        """Jaccard via índice invertido (só os casos que compartilham valores com a consulta são
+        tocados) ou, para poucos casos, pela interseção com as listas CSR desses casos."""
+        consulta = self.vocabulario.consultar(conjunto_novo)
+        indice = self.indices_invertidos[atributo]
+        if indices is not None:
+            listas = self.listas[atributo]
+            media = listas.usados / max(1, self.n)
+            if len(indices) * media <= indice.tamanho_postings(consulta):
+                if INSTRUMENTACAO.ativa:
+                    INSTRUMENTACAO.contar("jaccard.listas_ordenadas")
+                intersecoes = listas.contar_intersecoes(consulta, indices)
+                return intersecoes / (cardinalidades + len(conjunto_novo) - intersecoes)
+        ids, intersecoes = indice.contar_intersecoes(consulta)
+        if INSTRUMENTACAO.ativa:
+            INSTRUMENTACAO.contar("jaccard.indice_invertido")
+            INSTRUMENTACAO.contar("indice_invertido.casos_tocados", len(ids))
+            INSTRUMENTACAO.contar("indice_invertido.casos_consultados", self.n)
+        if indices is None:
+            sims = np.zeros(self.n)
+            sims[ids] = intersecoes / (cardinalidades[ids] + len(conjunto_novo) - intersecoes)
+            return sims
+        # Subconjunto de casos: localiza cada índice pedido entre os ids com interseção
+        intersecoes_indices = np.zeros(len(indices), dtype=np.int64)
+        if len(ids):
+            posicoes = np.minimum(np.searchsorted(ids, indices), len(ids) - 1)
+            encontrados = ids[posicoes] == indices
+            intersecoes_indices[encontrados] = intersecoes[posicoes[encontrados]]
+        return intersecoes_indices / (cardinalidades + len(conjunto_novo) - intersecoes_indices)
+
+    def similaridade_local_bloco(self, atributo, valores_novos):
+        """Similaridade local de vários valores de entrada contra a base: matriz (consultas x casos).
+
+        Retorna (similaridades, presentes), com `presentes` por caso (igual para todas as linhas).
+        """
+        if not INSTRUMENTACAO.ativa:
+            return self._similaridade_local_bloco(atributo, valores_novos)
+        inicio = time.perf_counter()
+        resultado = self._similaridade_local_bloco(atributo, valores_novos)
+        INSTRUMENTACAO.registrar_atributo(atributo, METRICA_DO_ATRIBUTO[atributo],
+                                          self.n * len(valores_novos), time.perf_counter() - inicio)
+        return resultado
+
+    def _similaridade_local_bloco(self, atributo, valores_novos):
+        presentes = self.presente[atributo]
+        if atributo in ATRIBUTOS_NUMERICOS:
+            min_val, max_val = ATRIBUTOS_NUMERICOS[atributo]
+            numericos = np.array([isinstance(v, (int, float)) for v in valores_novos], dtype=bool)
+            consultas = np.array([float(v) if c else np.nan for v, c in zip(valores_novos, numericos)])
+            max_diff = max_val - min_val
+            valores = self.valores[atributo][np.newaxis, :]
+            if max_diff == 0:
+                sims = (valores == consultas[:, np.newaxis]).astype(np.float64)
+            else:
+                # Mesmas operações de similaridade_local, feitas no lugar para não criar temporários
+                sims = np.subtract(valores, consultas[:, np.newaxis])
+                np.abs(sims, out=sims)
+                sims /= max_diff
+                np.subtract(1.0, sims, out=sims)
+                np.fmax(sims, 0.0, out=sims)
+            sims[:, ~presentes] = 0.0
+            sims[~numericos] = 0.0
+            return sims, presentes
+
+        if atributo == ATRIBUTO_ORDINAL:
+            canonicas = [classificacao_canonica(v) for v in valores_novos]
+            ordinais = np.array([c if type(c) is int else -1 for c in canonicas], dtype=np.int64)
+            codigos = np.array([self.tabela_classificacoes.get(c, -1) if type(c) is not int else -1
+                                for c in canonicas], dtype=np.int64)
+            por_ordinal = _TABELA_MPAA[np.ix_(ordinais, self.ordinais_classificacao)]
+            por_codigo = (self.codigos_classificacao[np.newaxis, :] == codigos[:, np.newaxis]).astype(np.float64)
+            sims = np.where((ordinais >= 0)[:, np.newaxis], por_ordinal, por_codigo)
+            return np.where(presentes, sims, 0.0), presentes
+
+        if atributo in self.bitmasks:
+            codificacao = self.bitmasks[atributo]
+            conjuntos = [conjunto_jaccard(v) for v in valores_novos]
+            mascaras = np.zeros((len(conjuntos), codificacao.palavras), dtype=np.uint64)
+            com_excedentes = []
+            for linha, conjunto in enumerate(conjuntos):
+                mascaras[linha], fora = codificacao.mascara(conjunto)
+                if fora:
+                    com_excedentes.append(linha)
+            # popcount(a & b) da base inteira contra todas as consultas de uma vez
+            e_bit_a_bit = codificacao.mascaras[np.newaxis, :, :] & mascaras[:, np.newaxis, :]
+            intersecoes = contar_bits(e_bit_a_bit.reshape(-1, codificacao.palavras)).reshape(len(conjuntos), self.n)
+            for linha in com_excedentes:
+                intersecoes[linha] = codificacao.contar_intersecoes(conjuntos[linha])
+            tamanhos = np.array([len(c) for c in conjuntos], dtype=np.int64)[:, np.newaxis]
+            cardinalidades = self.cardinalidades[atributo][np.newaxis, :]
+            unioes = cardinalidades + tamanhos - intersecoes
+            sims = np.zeros(intersecoes.shape)
+            np.divide(intersecoes, unioes, out=sims, where=tamanhos > 0)
+            sims = np.where(tamanhos > 0, sims, (cardinalidades == 0).astype(np.float64))
+            return np.where(presentes, sims, 0.0), presentes
+
+        # Demais atributos (ex: índice invertido, já esparso): uma linha por consulta
+        sims = np.empty((len(valores_novos), self.n))
+        for linha, valor in enumerate(valores_novos):
+            sims[linha], _ = self.similaridade_local(atributo, valor)
+        return sims, presentes
+
+
+def nova_compensacao(forma):
+    """Compensação de uma soma feita com `acumular_soma` (None se a soma é termo a termo)."""
+    return np.zeros(forma) if SOMA_COMPENSADA else None
+
+
+def acumular_soma(soma, compensacao, termos):
+    """`soma += termos` (no lugar), com o mesmo arredondamento do `sum()` do interpretador.
+
+    Um termo 0.0 (caso sem o atributo) não muda a soma nem a compensação, como um termo
+    que não entra na lista somada pela função par a par.
+    """
+    if compensacao is None:
+        soma += termos
+        return
+    total = soma + termos
+    compensacao += np.where(np.abs(soma) >= np.abs(termos), (soma - total) + termos, (termos - total) + soma)
+    soma[...] = total
+
+
+def concluir_soma(soma, compensacao):
+    """Aplica a compensação à soma (no lugar), como o `sum()` faz ao terminar, e a retorna."""
+    if compensacao is not None:
+        np.add(soma, compensacao, out=soma, where=np.isfinite(compensacao))
+    return soma
+
+
+def calcular_similaridade_vetorizada(caso_novo, base, pesos, indices=None):
+    """Calcula a similaridade global do caso de entrada contra todos os casos da base de uma vez.
+
+    Equivalente a `[calcular_similaridade_global(caso_novo, c, pesos) for c in base.casos]`.
+    Se `indices` for informado, calcula apenas para esses casos.
+    """
+    n = base.n if indices is None else len(indices)
+    if not caso_novo:
+        return np.zeros(n)
+
+    soma_ponderada = np.zeros(n)
+    compensacao = nova_compensacao(n)
+    pesos_efetivamente_usados = np.zeros(n)
+    for atributo in ORDEM_ATRIBUTOS:
+        peso = pesos.get(atributo, 0)
+        if peso > 0 and atributo_presente_na_consulta(caso_novo, atributo):
+            sims, presentes = base.similaridade_local(atributo, caso_novo.get(atributo), indices)
+            acumular_soma(soma_ponderada, compensacao, np.where(presentes, sims * peso, 0.0))
+            pesos_efetivamente_usados += np.where(presentes, peso, 0.0)
+    concluir_soma(soma_ponderada, compensacao)
+
+    validos = base.caso_valido if indices is None else base.caso_valido[indices]
+    usados = validos & (pesos_efetivamente_usados != 0)
+    resultado = np.zeros(n)
+    np.divide(soma_ponderada, pesos_efetivamente_usados, out=resultado, where=usados)
+    return resultado
+
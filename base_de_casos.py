@@ -0,0 +1,318 @@
+import contextlib
+import copy
+import os
+import threading
+
+from base_colunar import BaseColunar
+from filme import como_registro
+from ingestao import carregar_base_de_casos_csv
+from instrumentacao import INSTRUMENTACAO
+from recuperacao import CacheRecuperacao, CacheSimilaridadesLocais
+from retencao import (
+    TAMANHO_MINIMO_COMPACTACAO, caminho_log_retencao, carregar_snapshot_retencao, linha_log,
+    reaplicar_log_retencao, registrar_no_log, salvar_snapshot_retencao,
+)
+
+# --- Base de Casos Sob Demanda ---
+# A base de casos não é mais carregada ao importar `main`: um objeto BaseDeCasos só lê
+# o CSV (ou o snapshot) no primeiro acesso a `casos`, e a representação colunar só é
+# construída no primeiro acesso a `colunar`. Ferramentas que só precisam das funções
+# de similaridade ou de PESOS_PADRAO não pagam o carregamento.
+#
+# Uma mesma instância pode ser compartilhada entre vários chamadores; a instância
+# padrão (usada por `main.main()` e por `main.BASE_DE_CASOS`) é obtida com
+# `obter_base_de_casos()` e pode ser trocada com `definir_base_de_casos_padrao()`.
+#
+# Retenção: `adicionar_caso`, `atualizar_caso` e `remover_caso` registram a operação no
+# log de retenção, reaplicado no próximo carregamento, e só depois alteram a base em
+# memória de forma incremental (ver "Alterações Incrementais" em base_colunar): se a
+# gravação do log falhar, a base em memória fica como estava. As alterações mexem nos
+# arrays da base colunar no lugar, então as buscas de `recuperar_top_k` (que podem rodar
+# em várias threads ao mesmo tempo) e as alterações se excluem por uma TravaLeituraEscrita.
+# `compactar_retencao` grava a base atual no snapshot da retenção, para que a próxima
+# carga só reaplique as operações posteriores (ver retencao.py).
+
+# Arquivo CSV carregado pela base de casos padrão
+CAMINHO_BASE_PADRAO = "filmes_base_novo.csv"
+
+# Exemplos usados quando a base de casos estiver vazia após a tentativa de carregamento
+CASOS_DE_EXEMPLO = [
+    {"id": "tt0133093", "titulo": "The Matrix (Exemplo)", "link": "link1", "ano_lancamento": 1999, "duracao_minutos": 136,
+     "classificacao_etaria": "R", "avaliacao_critica": 8.7, "votos": 1800000, "orcamento": 63000000,
+     "bilheteria_mundial": 463517383, "diretores": ["Lana Wachowski", "Lilly Wachowski"], "roteiristas": ["Lana Wachowski", "Lilly Wachowski"],
+     "estrelas": ["Keanu Reeves", "Laurence Fishburne", "Carrie-Anne Moss"], "generos": ["Action", "Sci-Fi"],
+     "pais_origem": ["USA"], "idioma": ["English"], "vitorias": 40, "indicacoes": 50, "oscars_indicados": 4},
+    {"id": "tt0068646", "titulo": "The Godfather (Exemplo)", "link": "link2", "ano_lancamento": 1972, "duracao_minutos": 175,
+     "classificacao_etaria": "R", "avaliacao_critica": 9.2, "votos": 1700000, "orcamento": 6000000,
+     "bilheteria_mundial": 246120974, "diretores": ["Francis Ford Coppola"], "roteiristas": ["Mario Puzo", "Francis Ford Coppola"],
+     "estrelas": ["Marlon Brando", "Al Pacino", "James Caan"], "generos": ["Crime", "Drama"],
+     "pais_origem": ["USA"], "idioma": ["English", "Italian"], "vitorias": 30, "indicacoes": 40, "oscars_indicados": 3},
+    {"id": "tt0114709", "titulo": "Toy Story (Exemplo)", "link": "link3", "ano_lancamento": 1995, "duracao_minutos": 81,
+     "classificacao_etaria": "G", "avaliacao_critica": 8.3, "votos": 950000, "orcamento": 30000000,
+     "bilheteria_mundial": 373554033, "diretores": ["John Lasseter"], "roteiristas": ["John Lasseter", "Pete Docter"],
+     "estrelas": ["Tom Hanks", "Tim Allen"], "generos": ["Animation", "Adventure", "Comedy"],
+     "pais_origem": ["USA"], "idioma": ["English"], "vitorias": 25, "indicacoes": 30, "oscars_indicados": 1}
+]
+
+
+class TravaLeituraEscrita:
+    """Várias leituras simultâneas ou uma escrita exclusiva (escritas esperando têm preferência)."""
+
+    def __init__(self):
+        self._condicao = threading.Condition(threading.Lock())
+        self._leitores = 0
+        self._escrevendo = False
+        self._escritores_esperando = 0
+
+    @contextlib.contextmanager
+    def leitura(self):
+        with self._condicao:
+            while self._escrevendo or self._escritores_esperando:
+                self._condicao.wait()
+            self._leitores += 1
+        try:
+            yield
+        finally:
+            with self._condicao:
+                self._leitores -= 1
+                if not self._leitores:
+                    self._condicao.notify_all()
+
+    @contextlib.contextmanager
+    def escrita(self):
+        with self._condicao:
+            self._escritores_esperando += 1
+            while self._escrevendo or self._leitores:
+                self._condicao.wait()
+            self._escritores_esperando -= 1
+            self._escrevendo = True
+        try:
+            yield
+        finally:
+            with self._condicao:
+                self._escrevendo = False
+                self._condicao.notify_all()
+
+
+class BaseDeCasos:
+    """Base de casos carregada sob demanda a partir de um arquivo CSV."""
+
+    def __init__(self, caminho_arquivo=CAMINHO_BASE_PADRAO, usar_snapshot=True, usar_exemplos=True, processos=1):
+        self.caminho_arquivo = caminho_arquivo
+        self.usar_snapshot = usar_snapshot
+        self.processos = processos  # Processos para converter o CSV (None = todos os núcleos)
+        self.usar_exemplos = usar_exemplos  # Usa CASOS_DE_EXEMPLO se o CSV não trouxer nenhum filme
+        self._casos = None
+        self._colunar = None
+        self._trava = threading.RLock()
+        self._trava_alteracoes = TravaLeituraEscrita()  # Buscas (leitura) x retenção (escrita)
+        self._cache = None
+        self._similaridades_locais = None
+        # Log de retenção (None = alterações ficam só em memória)
+        self.caminho_log = caminho_log_retencao(caminho_arquivo) if caminho_arquivo else None
+        self._posicoes = None  # id do filme -> posição na base colunar
+        self._casos_ativos = None  # (versão, lista sem os removidos)
+
+    @classmethod
+    def a_partir_de_casos(cls, casos):
+        """Cria uma base já carregada a partir de uma lista de casos em memória."""
+        base = cls(caminho_arquivo=None, usar_snapshot=False, usar_exemplos=False)
+        base._casos = casos
+        return base
+
+    @property
+    def carregada(self):
+        return self._casos is not None
+
+    @property
+    def casos(self):
+        """Lista de casos (dicionários); carrega o CSV no primeiro acesso."""
+        if self._casos is None:
+            with self._trava:
+                if self._casos is None:
+                    with INSTRUMENTACAO.fase("carga"):
+                        self._casos = self._carregar()
+        colunar = self._colunar
+        if colunar is not None and colunar.removidos:
+            # Há lápides na base colunar: devolve (e guarda) a lista só com os casos ativos
+            ativos = self._casos_ativos
+            if ativos is None or ativos[0] != colunar.versao:
+                ativos = self._casos_ativos = (colunar.versao, [c for c in colunar.casos if c is not None])
+            return ativos[1]
+        return self._casos
+
+    @property
+    def colunar(self):
+        """Representação colunar (BaseColunar) dos casos, construída no primeiro acesso."""
+        if self._colunar is None:
+            with self._trava:
+                if self._colunar is None:
+                    casos = self.casos
+                    with INSTRUMENTACAO.fase("construcao_colunar"):
+                        self._colunar = BaseColunar(casos)
+        return self._colunar
+
+    @property
+    def cache(self):
+        """Cache LRU de resultados de busca desta base (invalidado quando a base muda)."""
+        if self._cache is None:
+            with self._trava:
+                if self._cache is None:
+                    self._cache = CacheRecuperacao()
+        return self._cache
+
+    @property
+    def similaridades_locais(self):
+        """Similaridades locais das últimas consultas (ver recuperacao.CacheSimilaridadesLocais)."""
+        if self._similaridades_locais is None:
+            with self._trava:
+                if self._similaridades_locais is None:
+                    self._similaridades_locais = CacheSimilaridadesLocais()
+        return self._similaridades_locais
+
+    def recuperar_top_k(self, caso, pesos, k, min_sim=None, reordenar=False):
+        """Recupera os k casos mais similares (ver recuperacao.recuperar_top_k), usando o cache.
+
+        Com `reordenar`, guarda as similaridades locais da consulta, para que a mesma consulta
+        com outros pesos seja só uma recombinação (uso interativo; ver `similaridades_locais`).
+        """
+        with self._trava_alteracoes.leitura():
+            return self.cache.recuperar_top_k(caso, pesos, k, min_sim, base=self.colunar,
+                                              similaridades_locais=self.similaridades_locais if reordenar else None)
+
+    # --- Retenção ---
+
+    def _posicao(self, id_caso):
+        """Posição do filme na base colunar (KeyError se não existir)."""
+        if self._posicoes is None:
+            self._posicoes = {caso.get("id"): i for i, caso in enumerate(self.colunar.casos)
+                              if caso is not None}
+        return self._posicoes[id_caso]
+
+    def adicionar_caso(self, caso):
+        """Adiciona um filme (dicionário no formato de `converter_linha_csv`) à base."""
+        caso = dict(caso)
+        id_caso = caso.get("id")
+        if not id_caso:
+            raise ValueError("o caso precisa de um 'id' para ser retido")
+        linha = linha_log("adicionar", id_caso, caso)
+        registro = como_registro(caso)
+        with self._trava_alteracoes.escrita():
+            try:
+                self._posicao(id_caso)
+            except KeyError:
+                pass
+            else:
+                raise ValueError(f"já existe um filme com id '{id_caso}'")
+            self._registrar(linha)
+            self._posicoes[id_caso] = self.colunar.adicionar(registro)
+
+    def atualizar_caso(self, id_caso, caso):
+        """Substitui os dados do filme `id_caso` (a posição na base é mantida)."""
+        caso = dict(caso, id=id_caso)
+        linha = linha_log("atualizar", id_caso, caso)
+        registro = como_registro(caso)
+        with self._trava_alteracoes.escrita():
+            posicao = self._posicao(id_caso)
+            self._registrar(linha)
+            self.colunar.atualizar(posicao, registro)
+
+    def remover_caso(self, id_caso):
+        """Remove o filme `id_caso` da base."""
+        linha = linha_log("remover", id_caso)
+        with self._trava_alteracoes.escrita():
+            posicao = self._posicao(id_caso)
+            self._registrar(linha)
+            colunar = self.colunar
+            colunar.remover(posicao)
+            del self._posicoes[id_caso]
+            if colunar.precisa_compactar:
+                colunar.compactar()
+                self._casos = colunar.casos
+                self._posicoes = None
+
+    def compactar_retencao(self):
+        """Grava a base atual no snapshot da retenção; retorna True se gravou.
+
+        A próxima carga parte desse snapshot e só reaplica as operações registradas depois.
+        Requer o CSV e o log de retenção em disco (e `usar_snapshot`).
+        """
+        with self._trava_alteracoes.escrita():
+            if not self._pode_compactar():
+                return False
+            casos = self.colunar.casos
+            return self._salvar_retencao([caso for caso in casos if caso is not None])
+
+    def _pode_compactar(self):
+        return (self.usar_snapshot and self.caminho_log is not None
+                and os.path.exists(self.caminho_arquivo) and os.path.exists(self.caminho_log))
+
+    def _salvar_retencao(self, casos):
+        try:
+            with INSTRUMENTACAO.fase("gravacao_snapshot"):
+                salvar_snapshot_retencao(self.caminho_arquivo, self.caminho_log, casos)
+        except (OSError, TypeError, ValueError, OverflowError) as e:
+            print(f"Aviso: não foi possível compactar o log de retenção '{self.caminho_log}': {e}")
+            return False
+        return True
+
+    def _registrar(self, linha):
+        if self.caminho_log is not None:
+            registrar_no_log(self.caminho_log, linha)
+
+    def _carregar(self):
+        compactado = None
+        if self._pode_compactar():
+            with INSTRUMENTACAO.fase("carga_snapshot"):
+                compactado = carregar_snapshot_retencao(self.caminho_arquivo, self.caminho_log)
+        if compactado is not None:
+            casos, inicio_log = compactado
+            print(f"{len(casos)} filmes carregados de '{self.caminho_arquivo}' (snapshot da retenção).")
+        else:
+            inicio_log = 0
+            casos = carregar_base_de_casos_csv(self.caminho_arquivo, usar_snapshot=self.usar_snapshot,
+                                               processos=self.processos)
+            if not casos and self.usar_exemplos:
+                print("Base de casos está vazia. Adicionando alguns exemplos para demonstração (com o novo schema).")
+                casos.extend(como_registro(caso) for caso in copy.deepcopy(CASOS_DE_EXEMPLO))
+        if self.caminho_log is not None and os.path.exists(self.caminho_log):
+            try:
+                tamanho_log = os.path.getsize(self.caminho_log)
+                casos = reaplicar_log_retencao(casos, self.caminho_log, inicio_log)
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"Aviso: não foi possível ler o log de retenção '{self.caminho_log}': {e}")
+            else:
+                # Muitas operações reaplicadas: grava o snapshot para a próxima carga
+                if tamanho_log - inicio_log >= TAMANHO_MINIMO_COMPACTACAO and self._pode_compactar():
+                    self._salvar_retencao(casos)
+        return casos
+
+    def __len__(self):
+        return len(self.casos)
+
+    def __iter__(self):
+        return iter(self.casos)
+
+    def __getitem__(self, indice):
+        return self.casos[indice]
+
+
+_base_padrao = None
+_trava_padrao = threading.Lock()
+
+
+def obter_base_de_casos():
+    """Retorna a base de casos padrão (compartilhada), criando-a sem carregá-la."""
+    global _base_padrao
+    if _base_padrao is None:
+        with _trava_padrao:
+            if _base_padrao is None:
+                _base_padrao = BaseDeCasos()
+    return _base_padrao
+
+
+def definir_base_de_casos_padrao(base):
+    """Troca a base de casos padrão (ex: para um script usar outro dataset)."""
+    global _base_padrao
+    with _trava_padrao:
+        _base_padrao = base
@@ -0,0 +1,231 @@
+import argparse
+import contextlib
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from catalogo_sintetico import SEMENTE_PADRAO, gerar_catalogo_csv
+from instrumentacao import percentis_ms
+
+# --- Benchmarks de Carga e Recuperação ---
+# Mede, para catálogos sintéticos de vários tamanhos (ver catalogo_sintetico.py):
+#   - carga: leitura do CSV, gravação e leitura do snapshot e construção da base colunar;
+#   - latência de uma consulta (top-k sem cache): percentis em milissegundos;
+#   - vazão da recuperação em lote (consultas por segundo);
+#   - pico de memória (RSS máximo do processo);
+#   - com --recall-lsh, o recall do top-k aproximado por LSH contra o exato, para
+#     buscas por elenco (PESOS_ELENCO; ver recuperacao.relatorio_recall_lsh).
+# Cada tamanho é medido em um processo novo, para que o pico de memória e os caches de
+# um tamanho não contaminem o seguinte. As consultas são filmes sorteados do próprio
+# catálogo (com a mesma semente), com PESOS_PADRAO.
+#
+# O resultado é um JSON (ambiente + parâmetros + uma entrada por tamanho); duas
+# execuções podem ser comparadas com `--comparar anterior.json`.
+#
+# Uso: python benchmark.py [--tamanhos 10000 100000 1000000] [--saida resultado.json]
+#                          [--comparar anterior.json] [--recall-lsh]
+
+TAMANHOS_PADRAO = (10_000, 100_000, 1_000_000)
+CONSULTAS_PADRAO = 200
+CONSULTAS_LOTE_PADRAO = 200
+CONSULTAS_AQUECIMENTO = 5
+K_PADRAO = 10
+PASTA_PADRAO = "benchmarks"
+# Pesos de uma busca "filmes com elenco parecido" (usados no relatório de recall de LSH)
+PESOS_ELENCO = {"estrelas": 0.6, "diretores": 0.2, "roteiristas": 0.2}
+
+# Métricas mostradas por `--comparar` (caminho no resultado de cada tamanho, maior é melhor?)
+METRICAS_COMPARADAS = (
+    (("carga_csv_s",), False),
+    (("gravacao_snapshot_s",), False),
+    (("carga_snapshot_s",), False),
+    (("construcao_colunar_s",), False),
+    (("latencia_ms", "p50"), False),
+    (("latencia_ms", "p99"), False),
+    (("lote_consultas_por_s",), True),
+    (("pico_memoria_mb",), False),
+    (("lsh", "recall_medio"), True),
+    (("lsh", "tempo_lsh_ms_medio"), False),
+)
+
+
+def _cronometrar(funcao, *args, **kwargs):
+    """Executa a função e retorna (resultado, segundos)."""
+    inicio = time.perf_counter()
+    resultado = funcao(*args, **kwargs)
+    return resultado, time.perf_counter() - inicio
+
+
+def pico_memoria_mb():
+    """RSS máximo do processo atual em MB (None se o sistema não informar)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss é em KB no Linux e em bytes no macOS
+    return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def caminho_catalogo(pasta, n, semente):
+    return os.path.join(pasta, f"catalogo_{n}_{semente}.csv")
+
+
+def medir_tamanho(n, semente=SEMENTE_PADRAO, pasta=PASTA_PADRAO, consultas=CONSULTAS_PADRAO,
+                  consultas_lote=CONSULTAS_LOTE_PADRAO, k=K_PADRAO, recall_lsh=False):
+    """Mede carga, latência, vazão em lote e memória para um catálogo de N filmes."""
+    from base_colunar import BaseColunar
+    from ingestao import carregar_base_de_casos_csv
+    from recuperacao import RecuperacaoLSH, recuperar_em_lote, recuperar_indices_top_k, relatorio_recall_lsh
+    from similaridade import PESOS_PADRAO
+    from snapshot import caminho_snapshot, salvar_snapshot
+
+    resultado = {"n": n}
+    caminho = caminho_catalogo(pasta, n, semente)
+    resultado["geracao_s"] = None
+    if not os.path.exists(caminho):
+        os.makedirs(pasta, exist_ok=True)
+        _, resultado["geracao_s"] = _cronometrar(gerar_catalogo_csv, caminho, n, semente)
+
+    # Mensagens da carga (avisos, "N filmes carregados") não fazem parte do resultado
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        casos, resultado["carga_csv_s"] = _cronometrar(carregar_base_de_casos_csv, caminho, usar_snapshot=False)
+        _, resultado["gravacao_snapshot_s"] = _cronometrar(salvar_snapshot, caminho, casos)
+        del casos
+        casos, resultado["carga_snapshot_s"] = _cronometrar(carregar_base_de_casos_csv, caminho, usar_snapshot=True)
+    try:
+        os.remove(caminho_snapshot(caminho))
+    except OSError:
+        pass
+    resultado["n"] = len(casos)
+    base, resultado["construcao_colunar_s"] = _cronometrar(BaseColunar, casos)
+
+    rng = random.Random(semente)
+    selecionadas = [casos[i] for i in rng.sample(range(len(casos)), min(len(casos), consultas + CONSULTAS_AQUECIMENTO))]
+    for caso in selecionadas[:CONSULTAS_AQUECIMENTO]:
+        recuperar_indices_top_k(caso, PESOS_PADRAO, k, base=base)
+    tempos = [_cronometrar(recuperar_indices_top_k, caso, PESOS_PADRAO, k, base=base)[1]
+              for caso in selecionadas[CONSULTAS_AQUECIMENTO:]]
+    resultado["latencia_ms"] = percentis_ms(tempos) if tempos else None
+
+    lote = [casos[i] for i in rng.sample(range(len(casos)), min(len(casos), consultas_lote))]
+    _, segundos = _cronometrar(recuperar_em_lote, lote, PESOS_PADRAO, k, base=base)
+    resultado["lote_consultas"] = len(lote)
+    resultado["lote_s"] = segundos
+    resultado["lote_consultas_por_s"] = round(len(lote) / segundos, 2) if segundos > 0 else None
+
+    if recall_lsh:
+        recuperacao_lsh, construcao = _cronometrar(RecuperacaoLSH, base)
+        resultado["lsh"] = relatorio_recall_lsh(recuperacao_lsh, selecionadas[CONSULTAS_AQUECIMENTO:], PESOS_ELENCO, k)
+        resultado["lsh"]["construcao_s"] = construcao
+
+    resultado["pico_memoria_mb"] = pico_memoria_mb()
+    return resultado
+
+
+def _versao_codigo():
+    """Commit atual do repositório (None fora de um repositório git)."""
+    try:
+        saida = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                               cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return saida.stdout.strip() or None
+
+
+def ambiente():
+    """Informações da máquina e das versões, para comparar execuções."""
+    return {
+        "data": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": _versao_codigo(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "plataforma": platform.platform(),
+        "processador": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def executar_benchmarks(tamanhos=TAMANHOS_PADRAO, semente=SEMENTE_PADRAO, pasta=PASTA_PADRAO,
+                        consultas=CONSULTAS_PADRAO, consultas_lote=CONSULTAS_LOTE_PADRAO, k=K_PADRAO,
+                        recall_lsh=False):
+    """Mede cada tamanho em um processo novo e retorna o relatório completo (dicionário)."""
+    parametros = {"tamanhos": list(tamanhos), "semente": semente, "consultas": consultas,
+                  "consultas_lote": consultas_lote, "k": k, "recall_lsh": recall_lsh}
+    resultados = []
+    contexto = multiprocessing.get_context("spawn")  # Processo limpo: não herda a memória deste
+    for n in tamanhos:
+        print(f"Medindo {n} filmes...", file=sys.stderr)
+        with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as executor:
+            resultados.append(executor.submit(medir_tamanho, n, semente, pasta, consultas, consultas_lote, k,
+                                              recall_lsh).result())
+    return {"ambiente": ambiente(), "parametros": parametros, "resultados": resultados}
+
+
+def _valor_metrica(resultado, caminho):
+    for chave in caminho:
+        if not isinstance(resultado, dict):
+            return None
+        resultado = resultado.get(chave)
+    return resultado
+
+
+def comparar_resultados(anterior, atual):
+    """Linhas de texto com a variação de cada métrica entre dois relatórios (por tamanho)."""
+    anteriores = {r["n"]: r for r in anterior.get("resultados", [])}
+    linhas = []
+    for resultado in atual.get("resultados", []):
+        base = anteriores.get(resultado["n"])
+        if base is None:
+            continue
+        linhas.append(f"{resultado['n']} filmes:")
+        for caminho, maior_melhor in METRICAS_COMPARADAS:
+            antes, depois = _valor_metrica(base, caminho), _valor_metrica(resultado, caminho)
+            if not antes or depois is None:
+                continue
+            variacao = (depois - antes) / antes * 100
+            melhorou = variacao > 0 if maior_melhor else variacao < 0
+            linhas.append(f"  {'.'.join(caminho):<24} {antes:>12.4g} -> {depois:>12.4g}  "
+                          f"({variacao:+.1f}%{', melhor' if melhorou and abs(variacao) >= 1 else ''})")
+    return linhas
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de carga e recuperação com catálogos sintéticos.")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=list(TAMANHOS_PADRAO))
+    parser.add_argument("--semente", type=int, default=SEMENTE_PADRAO)
+    parser.add_argument("--pasta", default=PASTA_PADRAO, help="Pasta dos catálogos gerados (reaproveitados entre execuções)")
+    parser.add_argument("--consultas", type=int, default=CONSULTAS_PADRAO, help="Consultas medidas individualmente")
+    parser.add_argument("--consultas-lote", type=int, default=CONSULTAS_LOTE_PADRAO)
+    parser.add_argument("-k", type=int, default=K_PADRAO)
+    parser.add_argument("--saida", help="Arquivo JSON do resultado (padrão: saída padrão)")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--recall-lsh", action="store_true", help="Mede o recall da busca aproximada por LSH")
+    args = parser.parse_args(argumentos)
+
+    relatorio = executar_benchmarks(args.tamanhos, args.semente, args.pasta, args.consultas,
+                                    args.consultas_lote, args.k, args.recall_lsh)
+    texto = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(texto + "\n")
+        print(f"Resultado gravado em '{args.saida}'.", file=sys.stderr)
+    else:
+        print(texto)
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            anterior = json.load(arquivo)
+        print("\n".join(comparar_resultados(anterior, relatorio)), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
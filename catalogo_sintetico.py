@@ -0,0 +1,180 @@
+import csv
+import math
+import random
+import sys
+from itertools import accumulate
+
+from similaridade import CLASSIFICACOES_MPAA_POSSIVEIS, GENEROS_POSSIVEIS_EXEMPLO, MAX_ANO, MIN_ANO
+
+# --- Catálogo Sintético de Filmes ---
+# Gera um CSV no schema de `filmes_base_novo.csv` (as colunas lidas por
+# `converter_linha_csv`) com N filmes, de forma reproduzível: a mesma semente e o mesmo
+# N produzem o mesmo arquivo. Usado pelos benchmarks (ver benchmark.py) para medir a
+# base em tamanhos que o dataset real não tem.
+#
+# As distribuições imitam as do dataset real:
+#   - Diretores, roteiristas e estrelas seguem uma distribuição de Zipf(-Mandelbrot):
+#     poucos nomes aparecem em milhares de filmes e a maioria em um ou dois (listas de
+#     postings desbalanceadas, como no real). Muitos diretores também roteirizam seus filmes.
+#   - Gêneros, países, idiomas e classificações são enviesados para os valores comuns.
+#   - Orçamento, bilheteria e votos têm cauda longa (log-normal); todos os campos
+#     numéricos podem faltar, com taxas diferentes por coluna.
+#   - A duração aparece em vários formatos ("120 min", "2h 0m", "PT2H0M", "120").
+#   - Algumas classificações vêm como variantes ("PG 13", "nan", vazio).
+#
+# Uso: python catalogo_sintetico.py N arquivo.csv [semente]
+
+COLUNAS_CSV = (
+    "id", "title", "link", "year", "duration", "rating_mpa", "rating_imdb", "vote", "budget",
+    "gross_world_wide", "gross_us_canada", "gross_opening_weekend", "director", "writer", "star",
+    "genre", "country_origin", "language", "win", "nomination", "oscar", "filming_location",
+    "production_company",
+)
+SEMENTE_PADRAO = 42
+# Zipf-Mandelbrot: peso 1 / (posição + DESLOCAMENTO_ZIPF) ** EXPOENTE_ZIPF. O deslocamento
+# evita que o primeiro nome apareça em uma fração irreal da base.
+EXPOENTE_ZIPF = 1.0
+DESLOCAMENTO_ZIPF = 20
+
+# Fração de valores ausentes por coluna
+FRACAO_AUSENTES = {
+    "year": 0.01, "duration": 0.03, "rating_mpa": 0.10, "rating_imdb": 0.05, "vote": 0.05,
+    "budget": 0.40, "gross_world_wide": 0.30, "gross_us_canada": 0.45, "gross_opening_weekend": 0.55,
+    "director": 0.01, "writer": 0.05, "star": 0.02, "genre": 0.01, "country_origin": 0.02,
+    "language": 0.03, "win": 0.20, "nomination": 0.20, "oscar": 0.60,
+    "filming_location": 0.30, "production_company": 0.15,
+}
+
+# Classificações mais comuns (o restante de CLASSIFICACOES_MPAA_POSSIVEIS aparece raramente)
+CLASSIFICACOES_FREQUENTES = {"R": 30, "PG-13": 20, "Not Rated": 12, "PG": 10, "Unrated": 6, "TV-MA": 4,
+                             "G": 3, "Approved": 3, "TV-14": 2, "Passed": 2}
+VARIANTES_CLASSIFICACAO = ("PG 13", "pg-13", "nan", "N/A", "")
+FRACAO_VARIANTES_CLASSIFICACAO = 0.02
+
+PAISES = ("United States", "United Kingdom", "France", "India", "Japan", "Germany", "Canada", "Italy",
+          "Spain", "South Korea", "Brazil", "Australia", "Mexico", "China", "Sweden", "Denmark")
+IDIOMAS = ("English", "French", "Hindi", "Japanese", "Spanish", "German", "Italian", "Korean",
+           "Portuguese", "Mandarin", "Russian", "Swedish", "Arabic", "Danish")
+PRENOMES = ("Ana", "John", "Maria", "David", "Akira", "Chen", "Sofia", "Peter", "Lucas", "Emma",
+            "Omar", "Ingrid", "Raj", "Julia", "Pedro", "Kim", "Laura", "Michael", "Yuki", "Hans")
+SOBRENOMES = ("Smith", "Silva", "Tanaka", "Müller", "Rossi", "Kumar", "Dubois", "Park", "Johnson",
+              "García", "Nielsen", "Costa", "Ivanova", "Brown", "Sato", "Khan", "Lopez", "Wang")
+
+
+class _Amostrador:
+    """Sorteia valores de uma lista com pesos (distribuição acumulada pré-calculada)."""
+
+    def __init__(self, valores, pesos):
+        self.valores = list(valores)
+        self.acumulados = list(accumulate(pesos))
+
+    def sortear(self, rng, quantidade=1):
+        """Retorna até `quantidade` valores distintos (a ordem do sorteio é mantida)."""
+        sorteados = rng.choices(self.valores, cum_weights=self.acumulados, k=quantidade)
+        return list(dict.fromkeys(sorteados))
+
+
+def _amostrador_zipf(valores, expoente=EXPOENTE_ZIPF, deslocamento=DESLOCAMENTO_ZIPF):
+    return _Amostrador(valores, (1.0 / ((posicao + deslocamento) ** expoente)
+                                 for posicao in range(1, len(valores) + 1)))
+
+
+def _nomes_de_pessoas(rng, quantidade, papel):
+    """Nomes únicos e legíveis (ex: "Maria Tanaka S137"), embaralhados para não seguir a ordem de criação."""
+    nomes = [f"{rng.choice(PRENOMES)} {rng.choice(SOBRENOMES)} {papel}{i}" for i in range(quantidade)]
+    rng.shuffle(nomes)
+    return nomes
+
+
+def _formatar_duracao(rng, minutos):
+    horas, resto = divmod(minutos, 60)
+    formato = rng.random()
+    if formato < 0.55:
+        return f"{minutos} min"
+    if formato < 0.80:
+        return f"{horas}h {resto}m" if resto else f"{horas}h"
+    if formato < 0.90:
+        return f"PT{horas}H{resto}M"
+    return str(minutos)
+
+
+def _sortear_classificacao(rng, amostrador):
+    if rng.random() < FRACAO_VARIANTES_CLASSIFICACAO:
+        return rng.choice(VARIANTES_CLASSIFICACAO)
+    return amostrador.sortear(rng)[0]
+
+
+def gerar_linhas(n, semente=SEMENTE_PADRAO):
+    """Gera as N linhas do catálogo (dicionários com as chaves de COLUNAS_CSV)."""
+    rng = random.Random(semente)
+    diretores = _amostrador_zipf(_nomes_de_pessoas(rng, max(20, n // 4), "D"))
+    roteiristas = _amostrador_zipf(_nomes_de_pessoas(rng, max(20, n // 3), "W"))
+    estrelas = _amostrador_zipf(_nomes_de_pessoas(rng, max(50, n), "S"))
+    empresas = _amostrador_zipf([f"Studio {i}" for i in range(max(10, n // 50))])
+    locais = _amostrador_zipf([f"Location {i}" for i in range(max(10, n // 20))])
+    generos = _amostrador_zipf(GENEROS_POSSIVEIS_EXEMPLO, expoente=0.8, deslocamento=0)
+    paises = _amostrador_zipf(PAISES, expoente=1.5, deslocamento=0)
+    idiomas = _amostrador_zipf(IDIOMAS, expoente=1.5, deslocamento=0)
+    classificacoes = _Amostrador(CLASSIFICACOES_MPAA_POSSIVEIS,
+                                 [CLASSIFICACOES_FREQUENTES.get(c, 0.2) for c in CLASSIFICACOES_MPAA_POSSIVEIS])
+
+    def ausente(coluna):
+        return rng.random() < FRACAO_AUSENTES[coluna]
+
+    def lista(coluna, amostrador, minimo, maximo):
+        if ausente(coluna):
+            return ""
+        return ", ".join(amostrador.sortear(rng, rng.randint(minimo, maximo)))
+
+    for i in range(n):
+        # Anos recentes são mais frequentes
+        ano = MAX_ANO - int((MAX_ANO - MIN_ANO) * rng.random() ** 2)
+        duracao = max(40, min(280, int(rng.gauss(108, 22))))
+        orcamento = min(5e8, math.exp(rng.gauss(16.5, 1.6)))
+        diretores_filme = diretores.sortear(rng, 1 if rng.random() < 0.9 else 2)
+        roteiristas_filme = roteiristas.sortear(rng, rng.randint(1, 3))
+        if rng.random() < 0.3:
+            roteiristas_filme = list(dict.fromkeys(diretores_filme + roteiristas_filme))
+        yield {
+            "id": f"tt{i:08d}",
+            "title": f"Synthetic Movie {i}" if rng.random() < 0.95 else f"Synthetic Movie, Part {i}",
+            "link": f"https://www.imdb.com/title/tt{i:08d}/",
+            "year": "" if ausente("year") else (f"{ano}.0" if rng.random() < 0.05 else str(ano)),
+            "duration": "" if ausente("duration") else _formatar_duracao(rng, duracao),
+            "rating_mpa": "" if ausente("rating_mpa") else _sortear_classificacao(rng, classificacoes),
+            "rating_imdb": "" if ausente("rating_imdb") else f"{max(1.0, min(10.0, rng.gauss(6.4, 1.1))):.1f}",
+            "vote": "" if ausente("vote") else str(min(3000000, int(math.exp(rng.gauss(8.5, 2.2))))),
+            "budget": "" if ausente("budget") else str(int(orcamento)),
+            "gross_world_wide": "" if ausente("gross_world_wide") else str(int(min(3e9, orcamento * math.exp(rng.gauss(0.3, 1.2))))),
+            "gross_us_canada": "" if ausente("gross_us_canada") else str(int(orcamento * math.exp(rng.gauss(-0.4, 1.2)))),
+            "gross_opening_weekend": "" if ausente("gross_opening_weekend") else str(int(orcamento * math.exp(rng.gauss(-1.8, 1.0)))),
+            "director": "" if ausente("director") else ", ".join(diretores_filme),
+            "writer": "" if ausente("writer") else ", ".join(roteiristas_filme),
+            "star": lista("star", estrelas, 1, 4),
+            "genre": lista("genre", generos, 1, 3),
+            "country_origin": lista("country_origin", paises, 1, 2),
+            "language": lista("language", idiomas, 1, 2),
+            "win": "" if ausente("win") else str(min(200, int(rng.expovariate(0.3)))),
+            "nomination": "" if ausente("nomination") else str(min(300, int(rng.expovariate(0.15)))),
+            "oscar": "" if ausente("oscar") else str(min(50, int(rng.expovariate(1.2)))),
+            "filming_location": lista("filming_location", locais, 1, 2),
+            "production_company": lista("production_company", empresas, 1, 3),
+        }
+
+
+def gerar_catalogo_csv(caminho_arquivo, n, semente=SEMENTE_PADRAO):
+    """Grava um catálogo sintético de N filmes em `caminho_arquivo`; retorna o caminho."""
+    with open(caminho_arquivo, mode="w", encoding="utf-8", newline="") as arquivo_csv:
+        escritor = csv.DictWriter(arquivo_csv, fieldnames=COLUNAS_CSV)
+        escritor.writeheader()
+        escritor.writerows(gerar_linhas(n, semente))
+    return caminho_arquivo
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4):
+        print("Uso: python catalogo_sintetico.py N arquivo.csv [semente]")
+        sys.exit(1)
+    quantidade = int(sys.argv[1])
+    gerar_catalogo_csv(sys.argv[2], quantidade, int(sys.argv[3]) if len(sys.argv) == 4 else SEMENTE_PADRAO)
+    print(f"{quantidade} filmes sintéticos gravados em '{sys.argv[2]}'.")
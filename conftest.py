@@ -0,0 +1,35 @@
+import pytest
+
+from catalogo_sintetico import gerar_linhas
+from ingestao import converter_linha_csv
+from similaridade import canonizar_casos
+
+# --- Utilidades Comuns dos Testes ---
+# Catálogo sintético convertido e canonizado como na carga do CSV (tamanho e semente
+# padrão, ou os de cada teste pela fábrica `catalogo_sintetico`) e o formato
+# (id, similaridade) usado para comparar resultados de recuperação.
+
+TAMANHO_CATALOGO = 300
+SEMENTE = 17
+K = 10
+
+
+def top_k(resultado):
+    """[(id, similaridade)] de um resultado de `recuperar_top_k` ({'caso', 'similaridade'})."""
+    return [(item["caso"]["id"], item["similaridade"]) for item in resultado]
+
+
+@pytest.fixture(scope="session")
+def catalogo_sintetico():
+    """Fábrica `catalogo_sintetico(tamanho, semente)`: uma lista nova de casos a cada chamada."""
+    def gerar(tamanho=TAMANHO_CATALOGO, semente=SEMENTE):
+        casos = [converter_linha_csv(linha) for linha in gerar_linhas(tamanho, semente)]
+        canonizar_casos(casos)
+        return casos
+    return gerar
+
+
+@pytest.fixture(scope="module")
+def casos(catalogo_sintetico):
+    """Catálogo padrão do módulo (não alterar a lista: usar `list(casos)` ao montar uma base alterável)."""
+    return catalogo_sintetico()
@@ -0,0 +1,145 @@
+import argparse
+import collections
+import contextlib
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from base_de_casos import CAMINHO_BASE_PADRAO, BaseDeCasos
+from pedidos import K_PADRAO, PedidoInvalido, decodificar_pedido, validar_pedido
+
+# --- Consultas em Lote pela Linha de Comando ---
+# Modo não interativo: lê consultas em JSONL (de um arquivo ou da entrada padrão) e
+# escreve um resultado JSONL por consulta na saída padrão, na ordem de entrada, assim
+# que cada consulta termina. A base é carregada uma única vez (as mensagens de carga
+# vão para a saída de erro, para não misturar com o JSONL).
+#
+# Cada linha de entrada é {"caso": {...}, "pesos": {...}, "k": 10, "min_sim": 0.5,
+# "id": ...} (um pedido como os de pedidos.py; "id" identifica a consulta na saída) ou,
+# mais simples, o próprio caso ({"generos": [...], "ano_lancamento": ...}).
+# Saída: {"linha": n, "id": ..., "resultados": [{"id", "titulo", "similaridade"}]} ou
+# {"linha": n, "id": ..., "erro": "..."} para consultas inválidas ou que falharam; uma
+# linha com erro nunca interrompe o lote.
+#
+# Com --paralelo N, até JANELA_POR_TRABALHADOR * N consultas ficam em andamento em N
+# threads; os resultados continuam saindo na ordem de entrada. A saída é acumulada e
+# escrita em blocos (até LINHAS_POR_ESCRITA linhas), mas nunca fica retida enquanto o
+# programa espera uma consulta terminar.
+#
+# Uso: python consultas_em_lote.py [consultas.jsonl | -] [--csv base.csv] [-k 10] [--paralelo 4]
+
+LINHAS_POR_ESCRITA = 256
+JANELA_POR_TRABALHADOR = 4
+
+
+def _ler_consultas(arquivo):
+    """Gera (número da linha, linha) das linhas não vazias."""
+    for numero, linha in enumerate(arquivo, 1):
+        if linha.strip():
+            yield numero, linha
+
+
+def _pedido_da_linha(linha, k_padrao):
+    dados = decodificar_pedido(linha)
+    if isinstance(dados, dict) and "caso" not in dados:
+        dados = {"caso": dados}
+    if isinstance(dados, dict):
+        dados.setdefault("k", k_padrao)
+    return dados
+
+
+def responder_consulta(base, numero, linha, k_padrao=K_PADRAO):
+    """Executa a consulta de uma linha JSONL e retorna a linha de resultado (já serializada)."""
+    resposta = {"linha": numero}
+    try:
+        dados = _pedido_da_linha(linha, k_padrao)
+        if isinstance(dados, dict) and "id" in dados:
+            resposta["id"] = dados["id"]
+        caso, pesos, k, min_sim = validar_pedido(dados)
+        resultados = base.recuperar_top_k(caso, pesos, k, min_sim)
+        resposta["resultados"] = [{"id": item["caso"].get("id"), "titulo": item["caso"].get("titulo"),
+                                   "similaridade": item["similaridade"]} for item in resultados]
+    except PedidoInvalido as e:
+        resposta["erro"] = str(e)
+    except Exception as e:  # Erro inesperado em uma consulta: vira registro de erro e o lote continua
+        resposta["erro"] = f"erro interno: {type(e).__name__}: {e}"
+    return json.dumps(resposta, ensure_ascii=False) + "\n"
+
+
+class _SaidaEmBlocos:
+    """Acumula linhas e as escreve de uma vez (em blocos ou quando `descarregar` é chamado)."""
+
+    def __init__(self, arquivo):
+        self.arquivo = arquivo
+        self.linhas = []
+
+    def escrever(self, linha):
+        self.linhas.append(linha)
+        if len(self.linhas) >= LINHAS_POR_ESCRITA:
+            self.descarregar()
+
+    def descarregar(self):
+        if self.linhas:
+            self.arquivo.write("".join(self.linhas))
+            self.linhas.clear()
+        self.arquivo.flush()
+
+
+def executar_consultas(base, entrada, saida, k_padrao=K_PADRAO, paralelo=1):
+    """Responde todas as consultas de `entrada` (arquivo de texto) em `saida`; retorna quantas foram."""
+    saida = _SaidaEmBlocos(saida)
+    total = 0
+    if paralelo <= 1:
+        for numero, linha in _ler_consultas(entrada):
+            saida.escrever(responder_consulta(base, numero, linha, k_padrao))
+            total += 1
+        saida.descarregar()
+        return total
+
+    pendentes = collections.deque()
+    janela = paralelo * JANELA_POR_TRABALHADOR
+
+    def escrever_primeira():
+        futuro = pendentes[0]
+        if not futuro.done():
+            saida.descarregar()  # Não segura resultados prontos enquanto espera
+        saida.escrever(futuro.result())
+        pendentes.popleft()
+
+    with ThreadPoolExecutor(max_workers=paralelo) as executor:
+        for numero, linha in _ler_consultas(entrada):
+            pendentes.append(executor.submit(responder_consulta, base, numero, linha, k_padrao))
+            total += 1
+            while len(pendentes) >= janela or (pendentes and pendentes[0].done()):
+                escrever_primeira()
+        while pendentes:
+            escrever_primeira()
+    saida.descarregar()
+    return total
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Consultas de recomendação em lote (JSONL -> JSONL).")
+    parser.add_argument("entrada", nargs="?", default="-", help="Arquivo JSONL de consultas ('-' = entrada padrão)")
+    parser.add_argument("--csv", default=CAMINHO_BASE_PADRAO, help="Arquivo CSV da base de casos")
+    parser.add_argument("-k", type=int, default=K_PADRAO, help="k padrão das consultas que não informam 'k'")
+    parser.add_argument("--paralelo", type=int, default=1, help="Consultas executadas ao mesmo tempo (threads)")
+    parser.add_argument("--processos", type=int, default=1, help="Processos para converter o CSV (0 = todos os núcleos)")
+    args = parser.parse_args(argumentos)
+
+    base = BaseDeCasos(args.csv, processos=args.processos or None)
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stderr):
+        base.colunar  # Carrega a base (mensagens vão para a saída de erro)
+    print(f"Base pronta em {time.perf_counter() - inicio:.2f}s.", file=sys.stderr)
+
+    inicio = time.perf_counter()
+    with contextlib.ExitStack() as pilha:
+        entrada = sys.stdin if args.entrada == "-" else pilha.enter_context(open(args.entrada, encoding="utf-8"))
+        total = executar_consultas(base, entrada, sys.stdout, args.k, args.paralelo)
+    print(f"{total} consultas respondidas em {time.perf_counter() - inicio:.2f}s.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import sys
+
+# --- Registro Compacto de Filme ---
+# Cada filme da base era um dicionário com 23 chaves e várias listas pequenas. `Filme`
+# guarda os mesmos campos em __slots__ (sem dicionário por instância), as listas viram
+# tuplas e os nomes (pessoas, gêneros, países, idiomas, empresas, locais) e as
+# classificações são internados: o mesmo nome presente em milhares de filmes é
+# armazenado uma única vez.
+#
+# Para o restante do código, um Filme se comporta como o dicionário de leitura que
+# substitui: `get`, `filme[chave]`, `chave in filme`, `keys`/`items`, iteração, `len`,
+# `bool` e `dict(filme)`. Um campo que não foi informado (ex: filmes de exemplo sem
+# 'gross_us_canada', ou casos projetados em ingestao) fica sem valor e se comporta como
+# uma chave ausente, inclusive em `in`.
+
+# Campos de um filme, na ordem de `converter_linha_csv`
+CAMPOS_FILME = (
+    "id", "titulo", "link", "ano_lancamento", "duracao_minutos", "classificacao_etaria",
+    "avaliacao_critica", "votos", "orcamento", "bilheteria_mundial",
+    "diretores", "roteiristas", "estrelas", "generos", "pais_origem", "idioma",
+    "vitorias", "indicacoes", "oscars_indicados",
+    "gross_us_canada", "gross_opening_weekend", "filming_location", "production_company",
+)
+_CONJUNTO_CAMPOS = frozenset(CAMPOS_FILME)
+
+
+def internar_lista(valores):
+    """Converte uma lista de valores em tupla, internando as strings."""
+    return tuple(sys.intern(v) if type(v) is str else v for v in valores)
+
+
+class Filme:
+    """Registro compacto (com __slots__) de um filme da base, lido como um dicionário."""
+
+    # "_canonico" guarda as formas canônicas usadas na similaridade (ver similaridade.forma_canonica)
+    __slots__ = CAMPOS_FILME + ("_canonico",)
+
+    def __init__(self, *valores, **campos):
+        for nome, valor in zip(CAMPOS_FILME, valores):
+            setattr(self, nome, valor)
+        for nome, valor in campos.items():
+            setattr(self, nome, valor)
+
+    def get(self, chave, padrao=None):
+        if chave in _CONJUNTO_CAMPOS:
+            return getattr(self, chave, padrao)
+        return padrao
+
+    def __getitem__(self, chave):
+        if chave not in _CONJUNTO_CAMPOS:
+            raise KeyError(chave)
+        try:
+            return getattr(self, chave)
+        except AttributeError:
+            raise KeyError(chave) from None
+
+    def __contains__(self, chave):
+        return chave in _CONJUNTO_CAMPOS and hasattr(self, chave)
+
+    def keys(self):
+        return [nome for nome in CAMPOS_FILME if hasattr(self, nome)]
+
+    def values(self):
+        return [getattr(self, nome) for nome in self.keys()]
+
+    def items(self):
+        return [(nome, getattr(self, nome)) for nome in self.keys()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __bool__(self):
+        # Mesmo resultado de len(self) > 0 (como um dicionário), mas para no primeiro campo
+        # informado: `not caso_base` roda uma vez por caso nas buscas
+        for nome in CAMPOS_FILME:
+            if hasattr(self, nome):
+                return True
+        return False
+
+    def __eq__(self, outro):
+        # Compara o conteúdo, como dicionários (tuplas e listas com os mesmos itens são iguais)
+        if isinstance(outro, Filme):
+            return self.items() == outro.items()
+        if isinstance(outro, dict):
+            return self.como_dicionario() == {nome: list(valor) if isinstance(valor, tuple) else valor
+                                              for nome, valor in outro.items()}
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Filme({dict(self.items())!r})"
+
+    def como_dicionario(self):
+        """Dicionário equivalente (com listas), como os casos eram representados antes."""
+        return {nome: list(valor) if isinstance(valor, tuple) else valor for nome, valor in self.items()}
+
+
+def como_registro(caso):
+    """Converte um caso (dicionário) em Filme, com listas em tuplas e nomes internados.
+
+    Casos com campos fora de CAMPOS_FILME continuam como dicionários.
+    """
+    if isinstance(caso, Filme) or not _CONJUNTO_CAMPOS.issuperset(caso):
+        return caso
+    filme = Filme()
+    for nome, valor in caso.items():
+        if isinstance(valor, (list, tuple)):
+            valor = internar_lista(valor)
+        elif nome == "classificacao_etaria" and type(valor) is str:
+            valor = sys.intern(valor)
+        setattr(filme, nome, valor)
+    return filme
@@ -0,0 +1,523 @@
+import hashlib
+import threading
+from collections import Counter
+
+import numpy as np
+
+# --- Índices Auxiliares da Base de Casos ---
+
+# Número máximo de bits por atributo codificado em bitmask (4 palavras de 64 bits).
+# Valores fora do vocabulário vão para o caminho de excedentes.
+MAX_BITS_BITMASK = 256
+
+# Tabela de contagem de bits por byte (fallback para NumPy < 2.0, sem np.bitwise_count)
+_BITS_POR_BYTE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def contar_bits(mascaras):
+    """Popcount por linha de um array (n, palavras) de uint64."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(mascaras).sum(axis=1, dtype=np.int64)
+    bytes_ = mascaras.view(np.uint8).reshape(len(mascaras), -1)
+    return _BITS_POR_BYTE[bytes_].sum(axis=1, dtype=np.int64)
+
+
+# --- Vocabulário e Listas CSR (atributos de pessoas) ---
+# Cada nome recebe um id inteiro (int32) no vocabulário da base (cada BaseColunar tem o
+# seu, exportado junto com ela e descartado com ela); cada atributo de pessoas vira um par de arrays por caso (início e fim) sobre
+# um único array de ids, com os ids de cada caso ordenados. A interseção de dois
+# conjuntos é a de dois arrays ordenados de inteiros: sem hash de strings por par, com
+# poucos bytes por nome e com arrays que podem ir direto para a memória compartilhada
+# ou para o disco.
+
+
+class Vocabulario:
+    """Mapeamento valor (ex: nome) -> id inteiro, com ids atribuídos na ordem de chegada."""
+
+    def __init__(self, valores=()):
+        self.valores = list(valores)
+        self.ids = {valor: i for i, valor in enumerate(self.valores)}
+        self._trava = threading.Lock()
+
+    def __len__(self):
+        return len(self.valores)
+
+    def _id_novo(self, valor):
+        i = self.ids.get(valor)
+        if i is None:
+            i = self.ids[valor] = len(self.valores)
+            self.valores.append(valor)
+        return i
+
+    def codificar(self, valores):
+        """Ids (int32, na ordem dada) dos valores, incluindo no vocabulário os que ainda não existem."""
+        with self._trava:
+            ids = self.ids
+            return np.fromiter((ids[v] if v in ids else self._id_novo(v) for v in valores), dtype=np.int32)
+
+    def consultar(self, valores):
+        """Ids (int32, ordenados e sem repetição) dos valores conhecidos; os desconhecidos são ignorados."""
+        ids = self.ids
+        return np.unique(np.fromiter((ids[v] for v in valores if v in ids), dtype=np.int32))
+
+    def exportar(self):
+        return self.valores
+
+    @classmethod
+    def importar(cls, valores):
+        return cls(valores)
+
+
+class ListasCSR:
+    """Listas de ids (int32) por caso: os ids do caso i são `ids[inicio[i]:fim[i]]`, ordenados.
+
+    Construídas de uma vez, `inicio` e `fim` são views dos mesmos offsets (linhas
+    contíguas). Uma linha reescrita que não cabe no lugar antigo vai para o fim de `ids`
+    (com capacidade reservada), e o trecho antigo fica sem uso até a próxima reconstrução.
+    """
+
+    def __init__(self, ids, inicio, fim, usados=None):
+        self.ids = ids
+        self.inicio = inicio
+        self.fim = fim
+        self.usados = len(ids) if usados is None else usados  # Trecho ocupado de `ids`
+
+    @classmethod
+    def de_conjuntos(cls, conjuntos, vocabulario):
+        """Codifica uma lista de conjuntos (um por caso) com o vocabulário."""
+        tamanhos = np.fromiter((len(c) for c in conjuntos), dtype=np.int64, count=len(conjuntos))
+        return cls.de_elementos(vocabulario.codificar(v for c in conjuntos for v in c), tamanhos)
+
+    @classmethod
+    def de_elementos(cls, ids, tamanhos):
+        """Listas contíguas a partir dos ids de cada caso em sequência (ordena os ids dentro de cada caso)."""
+        offsets = np.zeros(len(tamanhos) + 1, dtype=np.int64)
+        np.cumsum(tamanhos, out=offsets[1:])
+        casos = np.repeat(np.arange(len(tamanhos)), tamanhos)
+        ids = np.asarray(ids, dtype=np.int32)
+        return cls(ids[np.lexsort((ids, casos))], offsets[:-1], offsets[1:])
+
+    @classmethod
+    def concatenar(cls, listas):
+        """Junta as listas de várias bases (mesmo vocabulário), na ordem."""
+        partes, offsets = [], [np.zeros(1, dtype=np.int64)]
+        deslocamento = 0
+        for l in listas:
+            elementos, tamanhos = l.elementos()
+            partes.append(elementos)
+            offsets.append(deslocamento + np.cumsum(tamanhos))
+            deslocamento += len(elementos)
+        offsets = np.concatenate(offsets)
+        ids = np.concatenate(partes) if partes else np.empty(0, dtype=np.int32)
+        return cls(ids, offsets[:-1], offsets[1:])
+
+    def recodificar(self, mapa):
+        """Listas com cada id trocado por `mapa[id]` (ex: para o vocabulário de outra base)."""
+        elementos, tamanhos = self.elementos()
+        return ListasCSR.de_elementos(mapa[elementos], tamanhos)
+
+    def __len__(self):
+        return len(self.inicio)
+
+    def tamanhos(self):
+        return self.fim - self.inicio
+
+    def elementos(self, indices=None):
+        """(ids, tamanhos): os ids de todos os casos (ou dos casos em `indices`) em sequência."""
+        inicio, fim = (self.inicio, self.fim) if indices is None else (self.inicio[indices], self.fim[indices])
+        tamanhos = fim - inicio
+        total = int(tamanhos.sum())
+        if len(inicio) and np.array_equal(inicio[1:], fim[:-1]):  # Linhas contíguas: um único trecho
+            return self.ids[inicio[0]:fim[-1]], tamanhos
+        saltos = np.zeros(len(inicio), dtype=np.int64)
+        np.cumsum(tamanhos[:-1], out=saltos[1:])
+        posicoes = np.repeat(inicio - saltos, tamanhos) + np.arange(total)
+        return self.ids[posicoes], tamanhos
+
+    def linha(self, i):
+        return self.ids[self.inicio[i]:self.fim[i]]
+
+    def definir(self, i, ids):
+        """Grava os ids (já sem repetição) da linha i, no lugar se couberem."""
+        if np.may_share_memory(self.inicio, self.fim):
+            self.inicio = self.inicio.copy()  # Linhas deixam de ser contíguas: fim[i] != inicio[i + 1]
+        ids = np.sort(np.asarray(ids, dtype=np.int32))
+        inicio = int(self.inicio[i])
+        if len(ids) > self.fim[i] - inicio:
+            if self.usados + len(ids) > len(self.ids):
+                buffer = np.empty(max(self.usados + len(ids), 2 * len(self.ids), 16), dtype=np.int32)
+                buffer[:self.usados] = self.ids[:self.usados]
+                self.ids = buffer
+            inicio = self.inicio[i] = self.usados
+            self.usados += len(ids)
+        self.ids[inicio:inicio + len(ids)] = ids
+        self.fim[i] = inicio + len(ids)
+
+    def contar_intersecoes(self, consulta, indices):
+        """Tamanho da interseção da consulta (ids ordenados) com cada caso em `indices`.
+
+        Cada id das linhas pedidas é procurado (busca binária) no array ordenado da consulta.
+        """
+        elementos, tamanhos = self.elementos(indices)
+        if not len(elementos) or not len(consulta):
+            return np.zeros(len(tamanhos), dtype=np.int64)
+        posicoes = np.searchsorted(consulta, elementos)
+        np.minimum(posicoes, len(consulta) - 1, out=posicoes)
+        encontrados = consulta[posicoes] == elementos
+        linhas = np.repeat(np.arange(len(tamanhos)), tamanhos)
+        return np.bincount(linhas[encontrados], minlength=len(tamanhos)).astype(np.int64)
+
+    def exportar(self):
+        """Arrays da representação: `ids` (só o trecho ocupado), `inicio` e `fim`."""
+        return {"ids": self.ids[:self.usados], "inicio": self.inicio, "fim": self.fim}
+
+    @classmethod
+    def importar(cls, arrays):
+        return cls(arrays["ids"], arrays["inicio"], arrays["fim"])
+
+
+class IndiceInvertido:
+    """Índice invertido de um atributo de pessoas: id do valor (vocabulário) -> ids dos casos.
+
+    Construído a partir das listas CSR do atributo; as postings ficam também em CSR
+    (`offsets` por id do valor + `casos`), ordenadas e sem repetição. Casos alterados
+    depois da construção (retenção) têm suas entradas no CSR ignoradas e passam a
+    constar em `extras` (id do valor -> casos), até a próxima reconstrução.
+    """
+
+    def __init__(self, listas):
+        elementos, tamanhos = listas.elementos()
+        casos = np.repeat(np.arange(len(listas), dtype=np.int32), tamanhos)
+        # Ordenação estável por valor: os casos de cada valor continuam em ordem crescente
+        ordem = np.argsort(elementos, kind="stable")
+        self.casos = casos[ordem]
+        # Offsets só até o maior id usado (o vocabulário é compartilhado entre atributos)
+        contagens = np.bincount(elementos) if len(elementos) else np.zeros(0, dtype=np.int64)
+        self.offsets = np.zeros(len(contagens) + 1, dtype=np.int64)
+        np.cumsum(contagens, out=self.offsets[1:])
+        self._iniciar_alteracoes()
+
+    def _iniciar_alteracoes(self):
+        self.alterados = set()  # Casos cujas entradas no CSR não valem mais
+        self.extras = {}  # id do valor -> casos alterados que o possuem
+        self._alterados_ordenados = None
+
+    def __len__(self):
+        return int(np.count_nonzero(np.diff(self.offsets)))
+
+    def exportar(self):
+        """Arrays do índice (`offsets` e `casos`); só vale para um índice sem alterações."""
+        if self.alterados:
+            raise ValueError("índice invertido com alterações não pode ser exportado")
+        return {"offsets": self.offsets, "casos": self.casos}
+
+    @classmethod
+    def importar(cls, arrays):
+        """Recria o índice a partir de `exportar()`, usando os arrays sem copiá-los."""
+        indice = cls.__new__(cls)
+        indice.offsets = arrays["offsets"]
+        indice.casos = arrays["casos"]
+        indice._iniciar_alteracoes()
+        return indice
+
+    def adicionar(self, id_caso, ids_valores):
+        """Inclui o caso nas postings dos valores (ids do vocabulário)."""
+        self._marcar_alterado(id_caso)
+        for valor in ids_valores.tolist():
+            self.extras.setdefault(valor, set()).add(id_caso)
+
+    def remover(self, id_caso, ids_valores):
+        """Retira o caso das postings dos valores (ids do vocabulário)."""
+        self._marcar_alterado(id_caso)
+        for valor in ids_valores.tolist():
+            casos = self.extras.get(valor)
+            if casos is not None:
+                casos.discard(id_caso)
+                if not casos:
+                    del self.extras[valor]
+
+    def _marcar_alterado(self, id_caso):
+        if id_caso not in self.alterados:
+            self.alterados.add(id_caso)
+            self._alterados_ordenados = None
+
+    def _postings(self, valor):
+        if valor + 1 < len(self.offsets):
+            return self.casos[self.offsets[valor]:self.offsets[valor + 1]]
+        return self.casos[:0]
+
+    def tamanho_postings(self, consulta):
+        """Total de entradas no CSR dos valores da consulta (custo de `contar_intersecoes`)."""
+        consulta = consulta[consulta + 1 < len(self.offsets)]
+        return int((self.offsets[consulta + 1] - self.offsets[consulta]).sum())
+
+    def contar_intersecoes(self, consulta):
+        """Retorna (ids, contagens): casos que compartilham ao menos um valor com a consulta
+        (ids do vocabulário) e o tamanho da interseção de cada um. Os demais têm interseção 0."""
+        listas = [self._postings(valor) for valor in consulta.tolist()]
+        if self.alterados:
+            if self._alterados_ordenados is None:
+                self._alterados_ordenados = np.array(sorted(self.alterados), dtype=np.int32)
+            listas = [ids[~np.isin(ids, self._alterados_ordenados)] for ids in listas]
+            listas += [np.array(sorted(self.extras[valor]), dtype=np.int32)
+                       for valor in consulta.tolist() if valor in self.extras]
+        listas = [ids for ids in listas if len(ids)]
+        if not listas:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int64)
+        if len(listas) == 1:
+            return listas[0], np.ones(len(listas[0]), dtype=np.int64)
+        return np.unique(np.concatenate(listas), return_counts=True)
+
+
+class CodificacaoBitmask:
+    """Codificação de um atributo multivalorado de vocabulário pequeno (ex: gêneros) em bitmasks.
+
+    Cada valor do vocabulário ocupa um bit; cada caso vira uma linha de `palavras` uint64.
+    A interseção com a consulta é popcount(a & b), calculada para a base inteira de uma vez.
+    Valores fora do vocabulário (além de `max_bits`) ficam em conjuntos de excedentes por
+    caso, somados à interseção separadamente, para que o resultado não mude.
+    """
+
+    def __init__(self, conjuntos, vocabulario_inicial=(), max_bits=MAX_BITS_BITMASK):
+        frequencias = Counter(valor for conjunto in conjuntos for valor in conjunto)
+        # Vocabulário: valores conhecidos primeiro, depois os mais frequentes
+        vocabulario = [v for v in vocabulario_inicial if v in frequencias]
+        conhecidos = set(vocabulario)
+        vocabulario += [v for v, _ in frequencias.most_common() if v not in conhecidos]
+        self.max_bits = max_bits
+        self.bits = {valor: bit for bit, valor in enumerate(vocabulario[:max_bits])}
+        self.palavras = max(1, (len(self.bits) + 63) // 64)
+
+        linhas, colunas, valores_bits = [], [], []
+        self.excedentes = {}  # id do caso -> valores fora do vocabulário
+        for id_caso, conjunto in enumerate(conjuntos):
+            fora = []
+            for valor in conjunto:
+                bit = self.bits.get(valor)
+                if bit is None:
+                    fora.append(valor)
+                else:
+                    linhas.append(id_caso)
+                    colunas.append(bit >> 6)
+                    valores_bits.append(1 << (bit & 63))
+            if fora:
+                self.excedentes[id_caso] = frozenset(fora)
+        self.mascaras = np.zeros((len(conjuntos), self.palavras), dtype=np.uint64)
+        np.bitwise_or.at(self.mascaras, (np.array(linhas, dtype=np.int64), np.array(colunas, dtype=np.int64)),
+                         np.array(valores_bits, dtype=np.uint64))
+
+    def exportar(self):
+        """Retorna (metadados, arrays) da codificação; as bitmasks ficam em `arrays`."""
+        return {"bits": self.bits, "palavras": self.palavras, "excedentes": self.excedentes,
+                "max_bits": self.max_bits}, {"mascaras": self.mascaras}
+
+    @classmethod
+    def importar(cls, metadados, arrays):
+        """Recria a codificação a partir de `exportar()` (as bitmasks não são copiadas)."""
+        codificacao = cls.__new__(cls)
+        codificacao.max_bits = metadados.get("max_bits", MAX_BITS_BITMASK)
+        codificacao.bits = metadados["bits"]
+        codificacao.palavras = metadados["palavras"]
+        codificacao.excedentes = metadados["excedentes"]
+        codificacao.mascaras = arrays["mascaras"]
+        return codificacao
+
+    def mascara(self, conjunto):
+        """Retorna (bitmask, excedentes) de um conjunto de valores."""
+        mascara = np.zeros(self.palavras, dtype=np.uint64)
+        fora = []
+        for valor in conjunto:
+            bit = self.bits.get(valor)
+            if bit is None:
+                fora.append(valor)
+            else:
+                mascara[bit >> 6] |= np.uint64(1 << (bit & 63))
+        return mascara, frozenset(fora)
+
+    def definir(self, id_caso, conjunto):
+        """Grava a bitmask de um caso já existente (linha `id_caso`).
+
+        Valores novos ganham um bit enquanto houver espaço nas palavras atuais (a largura
+        das bitmasks não muda); os demais vão para os excedentes do caso.
+        """
+        limite = min(self.palavras * 64, self.max_bits)
+        for valor in conjunto:
+            if valor not in self.bits and len(self.bits) < limite:
+                self.bits[valor] = len(self.bits)
+        self.mascaras[id_caso], fora = self.mascara(conjunto)
+        if fora:
+            self.excedentes[id_caso] = fora
+        else:
+            self.excedentes.pop(id_caso, None)
+
+    def contar_intersecoes(self, conjunto_novo, indices=None):
+        """Tamanho da interseção do conjunto com cada caso (ou só com os casos em `indices`)."""
+        mascara, fora = self.mascara(conjunto_novo)
+        mascaras = self.mascaras if indices is None else self.mascaras[indices]
+        intersecoes = contar_bits(mascaras & mascara)
+        if fora and self.excedentes:
+            extras = np.zeros(len(self.mascaras), dtype=np.int64)
+            for id_caso, valores in self.excedentes.items():
+                extras[id_caso] = len(fora & valores)
+            intersecoes += extras if indices is None else extras[indices]
+        return intersecoes
+
+
+# --- MinHash / LSH (candidatos aproximados para Jaccard) ---
+
+PERMUTACOES_MINHASH = 64
+BANDAS_LSH = 16  # 16 bandas de 4 linhas: limiar de Jaccard aproximado (1/16) ** (1/4) = 0.5
+SEMENTE_MINHASH = 1
+LIMITE_ELEMENTOS_MINHASH = 1 << 22  # Valores x permutações calculados de uma vez na construção
+_SEM_VALORES = np.iinfo(np.uint32).max
+
+
+def hash_estavel(valor):
+    """Hash de 64 bits de um valor, igual em qualquer processo (ao contrário de `hash()`)."""
+    return int.from_bytes(hashlib.blake2b(str(valor).encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class IndiceLSH:
+    """Índice LSH (MinHash em bandas) de um atributo multivalorado: candidatos de Jaccard alto.
+
+    Cada caso recebe uma assinatura com o mínimo de `permutacoes` funções de hash sobre
+    os seus valores; a probabilidade de duas assinaturas coincidirem em uma posição é o
+    Jaccard dos conjuntos. A assinatura é dividida em `bandas` bandas de r linhas, e um
+    caso é candidato se coincide com a consulta em pelo menos uma banda inteira: um par
+    com Jaccard s é encontrado com probabilidade 1 - (1 - s^r)^bandas. Mais bandas (ou
+    menos linhas por banda) aumentam o recall e o número de candidatos.
+
+    Cada banda guarda as chaves dos casos ordenadas, e a busca é uma busca binária por
+    banda: o custo depende do número de candidatos, não do tamanho da base. Casos sem
+    valores não entram no índice. Construído a partir das listas CSR do atributo: cada
+    valor do vocabulário usado é hasheado uma única vez.
+    """
+
+    def __init__(self, listas, vocabulario, permutacoes=PERMUTACOES_MINHASH, bandas=BANDAS_LSH,
+                 semente=SEMENTE_MINHASH):
+        if permutacoes % bandas:
+            raise ValueError(f"permutacoes ({permutacoes}) deve ser múltiplo de bandas ({bandas})")
+        self.permutacoes = permutacoes
+        self.bandas = bandas
+        self.linhas_por_banda = permutacoes // bandas
+        rng = np.random.default_rng(semente)
+        # h_i(x) = (a_i * x + b_i) mod 2^64, usando os 32 bits mais altos (a_i ímpar)
+        self._a = rng.integers(1, 1 << 63, size=permutacoes, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 1 << 63, size=permutacoes, dtype=np.uint64)
+        self._mistura = rng.integers(1, 1 << 63, size=self.linhas_por_banda, dtype=np.uint64) | np.uint64(1)
+        elementos, tamanhos = listas.elementos()
+        usados = np.unique(elementos)
+        hashes = np.zeros(len(vocabulario), dtype=np.uint64)
+        hashes[usados] = np.fromiter((hash_estavel(vocabulario.valores[i]) for i in usados.tolist()),
+                                     dtype=np.uint64, count=len(usados))
+        self.assinaturas = self._assinaturas(hashes[elementos], tamanhos)
+        self._indexar()
+
+    def _permutar(self, hashes):
+        """Matriz (valores x permutações) dos hashes permutados, em uint32."""
+        return ((hashes[:, np.newaxis] * self._a + self._b) >> np.uint64(32)).astype(np.uint32)
+
+    def _assinaturas(self, hashes, tamanhos):
+        """Assinaturas dos casos a partir dos hashes dos seus valores, em sequência."""
+        n = len(tamanhos)
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(tamanhos, out=offsets[1:])
+        assinaturas = np.full((n, self.permutacoes), _SEM_VALORES, dtype=np.uint32)
+        media = int(tamanhos.mean()) if n else 1
+        casos_por_bloco = max(1, LIMITE_ELEMENTOS_MINHASH // (self.permutacoes * max(1, media)))
+        for inicio in range(0, n, casos_por_bloco):
+            fim = min(n, inicio + casos_por_bloco)
+            com_valores = inicio + np.flatnonzero(tamanhos[inicio:fim])
+            if not len(com_valores):
+                continue
+            permutados = self._permutar(hashes[offsets[inicio]:offsets[fim]])
+            # Os casos vazios não ocupam linhas, então cada segmento vai até o início do próximo caso com valores
+            assinaturas[com_valores] = np.minimum.reduceat(permutados, offsets[com_valores] - offsets[inicio], axis=0)
+        return assinaturas
+
+    def _chaves_das_bandas(self, assinaturas):
+        """Chave (uint64) de cada banda de cada assinatura: matriz (casos x bandas)."""
+        bandas = assinaturas.reshape(len(assinaturas), self.bandas, self.linhas_por_banda).astype(np.uint64)
+        return (bandas * self._mistura).sum(axis=2, dtype=np.uint64)
+
+    def _indexar(self):
+        indexados = np.flatnonzero(self.assinaturas[:, 0] != _SEM_VALORES).astype(np.int32)
+        chaves = self._chaves_das_bandas(self.assinaturas[indexados])
+        self.chaves = []  # Por banda: chaves ordenadas
+        self.ids = []  # Por banda: id do caso de cada chave ordenada
+        for banda in range(self.bandas):
+            ordem = np.argsort(chaves[:, banda], kind="stable")
+            self.chaves.append(chaves[ordem, banda])
+            self.ids.append(indexados[ordem])
+
+    def assinatura(self, conjunto):
+        """Assinatura MinHash de um conjunto de valores (None se vazio)."""
+        if not conjunto:
+            return None
+        hashes = np.array([hash_estavel(v) for v in conjunto], dtype=np.uint64)
+        return self._permutar(hashes).min(axis=0)
+
+    def candidatos(self, conjunto):
+        """Ids (ordenados, sem repetição) dos casos que coincidem com o conjunto em alguma banda."""
+        assinatura = self.assinatura(conjunto)
+        if assinatura is None:
+            return np.empty(0, dtype=np.int64)
+        chaves = self._chaves_das_bandas(assinatura[np.newaxis, :])[0]
+        encontrados = []
+        for banda, chave in enumerate(chaves):
+            inicio = np.searchsorted(self.chaves[banda], chave, "left")
+            fim = np.searchsorted(self.chaves[banda], chave, "right")
+            if fim > inicio:
+                encontrados.append(self.ids[banda][inicio:fim])
+        if not encontrados:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(encontrados)).astype(np.int64)
+
+
+# --- Índice Ordenado (faixas de atributos numéricos) ---
+
+
+class IndiceOrdenado:
+    """Índice ordenado de um atributo numérico: posições dos casos ordenadas pelo valor.
+
+    Só os casos com valor comparável (presente e não NaN) entram em `valores`/`posicoes`;
+    os demais ficam em `fora` e precisam ser considerados à parte. A partir de um valor
+    de consulta, a busca expande uma janela contígua [inicio, fim) para os dois lados:
+    todo caso fora da janela está a uma distância >= `distancia_fronteira`.
+    """
+
+    def __init__(self, valores, presentes):
+        comparaveis = presentes & ~np.isnan(valores)
+        posicoes = np.flatnonzero(comparaveis)
+        ordem = np.argsort(valores[posicoes], kind="stable")
+        self.posicoes = posicoes[ordem]
+        self.valores = valores[self.posicoes]
+        self.fora = np.flatnonzero(~comparaveis)
+
+    def __len__(self):
+        return len(self.posicoes)
+
+    def posicao(self, valor):
+        """Onde o valor entraria na ordem (início de toda janela em torno dele)."""
+        return int(np.searchsorted(self.valores, valor, "left"))
+
+    def janela(self, valor, quantidade, inicio, fim):
+        """Menor janela que contém a janela atual e os `quantidade` valores mais próximos de `valor`."""
+        posicao = self.posicao(valor)
+        esquerda = max(0, posicao - quantidade)
+        direita = min(len(self.valores), posicao + quantidade)
+        distancias = np.abs(self.valores[esquerda:direita] - valor)
+        if len(distancias) > quantidade:
+            raio = np.partition(distancias, quantidade - 1)[quantidade - 1]
+            esquerda = int(np.searchsorted(self.valores, valor - raio, "left"))
+            direita = int(np.searchsorted(self.valores, valor + raio, "right"))
+        return min(inicio, esquerda, posicao), max(fim, direita, posicao)
+
+    def distancia_fronteira(self, valor, inicio, fim):
+        """Menor distância entre `valor` e um caso fora da janela (inf se não resta nenhum)."""
+        distancia = np.inf
+        if inicio > 0:
+            distancia = valor - self.valores[inicio - 1]
+        if fim < len(self.valores):
+            distancia = min(distancia, self.valores[fim] - valor)
+        return float(distancia)
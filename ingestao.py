@@ -0,0 +1,542 @@
+import csv
+import heapq
+import io
+import mmap
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from base_colunar import BaseColunar, ORDEM_ATRIBUTOS, atributo_presente_na_consulta
+from filme import Filme, internar_lista
+from instrumentacao import INSTRUMENTACAO
+from similaridade import CLASSIFICACOES_MPAA_POSSIVEIS, canonizar_casos
+from snapshot import carregar_snapshot, casos_dos_arrays, colunas_para_arrays, salvar_snapshot
+
+# --- Conversão das Linhas do CSV ---
+# Os padrões de duração são compilados uma vez, e as conversões de duração e de
+# classificação MPAA são memorizadas por string bruta (os mesmos poucos valores se
+# repetem em quase todas as linhas), até LIMITE_MEMORIZACAO_CONVERSAO valores distintos.
+#
+# Falhas de conversão (duração em formato desconhecido, classificação fora da lista,
+# número inválido, linha pulada) não são impressas linha a linha: `converter_linha_csv`
+# as registra em um AvisosConversao (contador por coluna + até AMOSTRAS_AVISOS_POR_COLUNA
+# exemplos), relatado uma única vez ao final da carga.
+
+_PADRAO_MINUTOS = re.compile(r"(\d+)\s*(min)?s?")
+_PADRAO_HORAS = re.compile(r"(\d+)h")
+_PADRAO_SUFIXO_MINUTOS = re.compile(r"(\d+)m")
+
+LIMITE_MEMORIZACAO_CONVERSAO = 1 << 16
+_DURACOES_CONVERTIDAS = {}  # string bruta -> minutos (ou None)
+_CLASSIFICACOES_CONVERTIDAS = {}  # string bruta -> (classificação final, mapeada?)
+
+AMOSTRAS_AVISOS_POR_COLUNA = 5
+LINHA_IGNORADA = "linha"  # "Coluna" dos avisos de linhas puladas
+DESCRICOES_AVISOS = {
+    "duration": "formato de duração desconhecido (ignorado)",
+    "rating_mpa": "classificação fora da lista padrão CLASSIFICACOES_MPAA_POSSIVEIS (usada como está)",
+    LINHA_IGNORADA: "erro de conversão (filme pulado)",
+}
+
+
+class AvisosConversao:
+    """Falhas de conversão do CSV agregadas por coluna: contagem e alguns exemplos."""
+
+    def __init__(self, amostras_por_coluna=AMOSTRAS_AVISOS_POR_COLUNA):
+        self.amostras_por_coluna = amostras_por_coluna
+        self.contadores = {}  # coluna -> falhas
+        self.amostras = {}  # coluna -> [(valor, título)]
+
+    def __bool__(self):
+        return bool(self.contadores)
+
+    def registrar(self, coluna, valor, titulo):
+        self.contadores[coluna] = self.contadores.get(coluna, 0) + 1
+        amostras = self.amostras.setdefault(coluna, [])
+        if len(amostras) < self.amostras_por_coluna:
+            amostras.append((valor, titulo))
+
+    def juntar(self, outros):
+        """Acrescenta os avisos de outro AvisosConversao (ex: de um processo do pool)."""
+        for coluna, quantidade in outros.contadores.items():
+            self.contadores[coluna] = self.contadores.get(coluna, 0) + quantidade
+            amostras = self.amostras.setdefault(coluna, [])
+            amostras.extend(outros.amostras.get(coluna, [])[:self.amostras_por_coluna - len(amostras)])
+
+    def resumo(self, origem=None):
+        """Texto com uma linha por coluna (quantidade, descrição e exemplos)."""
+        total = sum(self.contadores.values())
+        linhas = [f"Aviso: {total} valores não convertidos" + (f" em '{origem}'" if origem else "") + ":"]
+        for coluna, quantidade in sorted(self.contadores.items(), key=lambda item: -item[1]):
+            exemplos = ", ".join(f"{valor!r} ({titulo})" for valor, titulo in self.amostras[coluna])
+            descricao = DESCRICOES_AVISOS.get(coluna, "valor inválido (ignorado)")
+            linhas.append(f"  {coluna}: {quantidade} - {descricao}. Ex: {exemplos}")
+        return "\n".join(linhas)
+
+    def relatar(self, origem=None):
+        """Imprime o resumo, se houver algum aviso."""
+        if self:
+            print(self.resumo(origem))
+
+
+def _memorizar(memoria, chave, valor):
+    if len(memoria) < LIMITE_MEMORIZACAO_CONVERSAO:
+        memoria[chave] = valor
+    return valor
+
+
+def parse_duration_to_minutes(duration_str):
+    """Converte string de duração (ex: "120 min", "PT2H30M", "2h 30m", "150") para minutos.
+
+    Retorna None se vazia ou em formato desconhecido.
+    """
+    if not duration_str or not isinstance(duration_str, str):
+        return None
+    try:
+        return _DURACOES_CONVERTIDAS[duration_str]
+    except KeyError:
+        return _memorizar(_DURACOES_CONVERTIDAS, duration_str, _converter_duracao(duration_str))
+
+
+def _converter_duracao(duration_str):
+    duration_str_lower = duration_str.lower()
+
+    # Tenta encontrar um número seguido opcionalmente por "min" ou "mins"
+    match = _PADRAO_MINUTOS.match(duration_str_lower)
+    if match:
+        return int(match.group(1))
+
+    # Tenta encontrar padrões como "Xh Ym" ou "Xh" ou "Ym"
+    hours = 0
+    minutes = 0
+    h_match = _PADRAO_HORAS.search(duration_str_lower)
+    if h_match:
+        hours = int(h_match.group(1))
+    m_match = _PADRAO_SUFIXO_MINUTOS.search(duration_str_lower)
+    if m_match:
+        minutes = int(m_match.group(1))
+
+    if hours > 0 or minutes > 0:
+        return hours * 60 + minutes
+
+    # Tenta interpretar o formato ISO 8601 PTxHxMxS (parcialmente)
+    if duration_str_lower.startswith("pt"):
+        duration_str_iso = duration_str_lower[2:] # Remove "pt"
+        h_val = 0
+        m_val = 0
+        if 'h' in duration_str_iso:
+            parts = duration_str_iso.split('h')
+            try:
+                h_val = int(parts[0])
+            except ValueError:
+                pass # Ignora se a parte antes de 'h' não for um número
+            if len(parts) > 1 and parts[1]: # Se houver algo depois de 'h'
+                m_match_iso = _PADRAO_SUFIXO_MINUTOS.search(parts[1])
+                if m_match_iso:
+                    try:
+                        m_val = int(m_match_iso.group(1))
+                    except ValueError:
+                        pass # Ignora se a parte antes de 'm' não for um número
+        elif 'm' in duration_str_iso: # Caso não tenha 'h', mas tenha 'm'
+            m_match_iso = _PADRAO_SUFIXO_MINUTOS.search(duration_str_iso)
+            if m_match_iso:
+                try:
+                    m_val = int(m_match_iso.group(1))
+                except ValueError:
+                    pass # Ignora se a parte antes de 'm' não for um número
+        
+        if h_val > 0 or m_val > 0:
+            return h_val * 60 + m_val
+
+    # Última tentativa: converter diretamente para int, assumindo que já são minutos
+    try:
+        return int(duration_str)
+    except ValueError:
+        return None  # Formato desconhecido (registrado em AvisosConversao por converter_linha_csv)
+
+
+def classificacao_do_csv(classificacao_etaria_raw):
+    """Classificação etária final de um valor bruto do CSV: (classificação, mapeada?).
+
+    Valores vazios ou nulos viram "Unrated"; variantes (ex: "PG 13") são normalizadas;
+    valores fora de CLASSIFICACOES_MPAA_POSSIVEIS são mantidos como estão (mapeada=False).
+    """
+    try:
+        return _CLASSIFICACOES_CONVERTIDAS[classificacao_etaria_raw]
+    except KeyError:
+        pass
+    classificacao = classificacao_etaria_raw.strip()
+    resultado = (sys.intern("Unrated"), True)  # Padrão se vazio ou nulo
+    if classificacao and classificacao.lower() not in ["none", "na", "n/a", "", "nan"]:
+        if classificacao in CLASSIFICACOES_MPAA_POSSIVEIS:
+            resultado = (sys.intern(classificacao), True)
+        else:
+            # Tenta normalizar (ex: "PG 13" -> "PG-13")
+            normalized_rating = classificacao.upper().replace(" ", "-")
+            if normalized_rating in CLASSIFICACOES_MPAA_POSSIVEIS:
+                resultado = (sys.intern(normalized_rating), True)
+            else:
+                resultado = (sys.intern(classificacao), False)  # Mantém o original se não mapeado
+    return _memorizar(_CLASSIFICACOES_CONVERTIDAS, classificacao_etaria_raw, resultado)
+
+
+def parse_comma_separated_string(value_str):
+    """Converte uma string separada por vírgulas em uma lista de strings limpas."""
+    if not value_str or not isinstance(value_str, str):
+        return []
+    return [item.strip() for item in value_str.split(',') if item.strip()]
+
+
+def to_int(val_str):
+    """Converte string para int (None se vazia ou inválida)."""
+    if val_str is None or val_str == '':
+        return None
+    try:
+        # Remove ".0" se for um float formatado como string (ex: "1999.0")
+        if isinstance(val_str, str) and val_str.endswith(".0"):
+            val_str = val_str[:-2]
+        return int(val_str)
+    except ValueError:
+        return None
+
+
+def to_float(val_str):
+    """Converte string para float, aceitando vírgula decimal (None se vazia ou inválida)."""
+    if val_str is None or val_str == '':
+        return None
+    try:
+        return float(str(val_str).replace(',', '.'))
+    except ValueError:
+        return None
+
+
+def _converter_numero(linha, coluna, conversor, avisos):
+    bruto = linha.get(coluna)
+    valor = conversor(bruto)
+    if valor is None and bruto and avisos is not None and str(bruto).strip():
+        avisos.registrar(coluna, bruto, linha.get("title", "DESCONHECIDO"))
+    return valor
+
+
+def converter_linha_csv(linha, avisos=None):
+    """Converte uma linha do CSV (dicionário do csv.DictReader) em um caso da base (Filme).
+
+    Falhas de conversão são registradas em `avisos` (AvisosConversao), se informado.
+    """
+    duracao_bruta = linha.get("duration")
+    duracao_min = parse_duration_to_minutes(duracao_bruta)
+    if duracao_min is None and avisos is not None and isinstance(duracao_bruta, str) and duracao_bruta:
+        avisos.registrar("duration", duracao_bruta, linha.get("title", "DESCONHECIDO"))
+
+    ano_lancamento = _converter_numero(linha, "year", to_int, avisos)
+    avaliacao_critica = _converter_numero(linha, "rating_imdb", to_float, avisos)
+    votos = _converter_numero(linha, "vote", to_int, avisos)
+    orcamento = _converter_numero(linha, "budget", to_float, avisos) # Pode ser float devido a valores grandes
+    bilheteria_mundial = _converter_numero(linha, "gross_world_wide", to_float, avisos) # Pode ser float
+    vitorias = _converter_numero(linha, "win", to_int, avisos)
+    indicacoes = _converter_numero(linha, "nomination", to_int, avisos)
+    oscars_indicados = _converter_numero(linha, "oscar", to_int, avisos)
+
+    classificacao_etaria_raw = linha.get("rating_mpa", "")
+    classificacao_etaria_final, mapeada = classificacao_do_csv(classificacao_etaria_raw)
+    if not mapeada and avisos is not None:
+        avisos.registrar("rating_mpa", classificacao_etaria_raw, linha.get("title", "DESCONHECIDO"))
+
+    return Filme(
+        id=linha.get("id"),
+        titulo=linha.get("title", "Título Desconhecido"),
+        link=linha.get("link"),
+        ano_lancamento=ano_lancamento,
+        duracao_minutos=duracao_min,
+        classificacao_etaria=classificacao_etaria_final,
+        avaliacao_critica=avaliacao_critica,
+        votos=votos,
+        orcamento=orcamento,
+        bilheteria_mundial=bilheteria_mundial,
+        diretores=internar_lista(parse_comma_separated_string(linha.get("director"))),
+        roteiristas=internar_lista(parse_comma_separated_string(linha.get("writer"))),
+        estrelas=internar_lista(parse_comma_separated_string(linha.get("star"))),
+        generos=internar_lista(parse_comma_separated_string(linha.get("genre"))),
+        pais_origem=internar_lista(parse_comma_separated_string(linha.get("country_origin"))),
+        idioma=internar_lista(parse_comma_separated_string(linha.get("language"))),
+        vitorias=vitorias,
+        indicacoes=indicacoes,
+        oscars_indicados=oscars_indicados,
+        # Campos adicionais (não usados no cálculo de similaridade padrão, mas carregados)
+        gross_us_canada=linha.get("gross_us_canada"),
+        gross_opening_weekend=linha.get("gross_opening_weekend"),
+        filming_location=internar_lista(parse_comma_separated_string(linha.get("filming_location"))),
+        production_company=internar_lista(parse_comma_separated_string(linha.get("production_company")))
+    )
+
+
+# --- Carga da Base de Casos ---
+
+def carregar_base_de_casos_csv(caminho_arquivo="filmes_base_novo.csv", usar_snapshot=True, processos=1):
+    """Carrega a base de casos de um arquivo CSV com o novo schema.
+
+    Se `usar_snapshot` for True, usa o snapshot binário do CSV quando ele estiver
+    atualizado e grava um novo snapshot após ler o CSV (ver snapshot.py).
+    Com `processos` diferente de 1 (None = todos os núcleos), o CSV é convertido em
+    paralelo (ver `carregar_base_de_casos_csv_paralelo`), com o mesmo resultado da leitura sequencial.
+    """
+    if usar_snapshot and os.path.exists(caminho_arquivo):
+        with INSTRUMENTACAO.fase("carga_snapshot"):
+            base = carregar_snapshot(caminho_arquivo)
+        if base:
+            print(f"{len(base)} filmes carregados de '{caminho_arquivo}' (snapshot).")
+            with INSTRUMENTACAO.fase("canonizacao"):
+                canonizar_casos(base)
+            return base
+
+    base = []
+    avisos = AvisosConversao()
+    try:
+        if processos != 1:
+            with INSTRUMENTACAO.fase("conversao_csv"):
+                base = carregar_base_de_casos_csv_paralelo(caminho_arquivo, processos, avisos)
+        else:
+            with INSTRUMENTACAO.fase("conversao_csv"), open(caminho_arquivo, mode='r', encoding='utf-8') as arquivo_csv:
+                leitor_csv = csv.DictReader(arquivo_csv)
+                for linha in leitor_csv:
+                    try:
+                        base.append(converter_linha_csv(linha, avisos))
+                    except ValueError as e:
+                        avisos.registrar(LINHA_IGNORADA, str(e), linha.get('title', 'DESCONHECIDO'))
+                    except KeyError as e:
+                        avisos.registrar(LINHA_IGNORADA, f"coluna ausente {e}", linha.get('title', 'DESCONHECIDO'))
+        avisos.relatar(caminho_arquivo)
+
+        if not base:
+            print(
+                f"Aviso: NENHUM filme carregado de '{caminho_arquivo}'. Verifique o arquivo e seu conteúdo.")
+        else:
+            print(f"{len(base)} filmes carregados de '{caminho_arquivo}'.")
+
+        if usar_snapshot and base:
+            try:
+                with INSTRUMENTACAO.fase("gravacao_snapshot"):
+                    salvar_snapshot(caminho_arquivo, base)
+            except (OSError, TypeError, ValueError, OverflowError) as e:
+                print(f"Aviso: não foi possível gravar o snapshot da base de casos: {e}")
+
+    except FileNotFoundError:
+        print(
+            f"Erro: Arquivo CSV '{caminho_arquivo}' não encontrado. Crie o arquivo ou verifique o caminho.")
+    except Exception as e:
+        print(f"Erro inesperado ao carregar o arquivo CSV: {e}.")
+    with INSTRUMENTACAO.fase("canonizacao"):
+        canonizar_casos(base)
+    return base
+
+
+# --- Ingestão do CSV em Blocos (Streaming) ---
+# Para catálogos que não cabem em memória como lista de dicionários, o CSV é lido em
+# blocos de tamanho fixo. Cada bloco é convertido (mesma conversão de
+# `carregar_base_de_casos_csv`) e logo transformado em forma colunar; os dicionários
+# do bloco são descartados antes de ler o próximo.
+#
+# Com projeção (`atributos`), cada caso guarda apenas os campos de identificação e os
+# atributos pedidos (ex: só os atributos com peso > 0), e só as colunas desses
+# atributos são construídas. Campos como 'gross_us_canada' e 'filming_location' não
+# ficam em memória.
+#
+# `carregar_base_colunar_em_blocos` monta a base inteira: a memória de pico é a da base
+# final (projetada) mais a de um bloco, já que `BaseColunar.concatenar` consome os
+# blocos um a um. `recuperar_top_k_em_fluxo` não junta os blocos: cada bloco é pontuado
+# e só os k melhores são mantidos, então a memória de pico depende do tamanho do bloco
+# e não do tamanho do arquivo.
+
+TAMANHO_BLOCO_PADRAO = 50000
+CAMPOS_IDENTIFICACAO = ("id", "titulo", "link")
+
+
+def atributos_com_peso(pesos, caso=None):
+    """Atributos de similaridade com peso > 0 (e presentes no caso de entrada, se informado)."""
+    return tuple(atributo for atributo in ORDEM_ATRIBUTOS
+                 if pesos.get(atributo, 0) > 0
+                 and (caso is None or atributo_presente_na_consulta(caso, atributo)))
+
+
+def ler_linhas_em_blocos(caminho_arquivo, tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+    """Gera listas de até `tamanho_bloco` linhas brutas (dicionários do csv.DictReader)."""
+    with open(caminho_arquivo, mode='r', encoding='utf-8') as arquivo_csv:
+        leitor_csv = csv.DictReader(arquivo_csv)
+        while True:
+            linhas = list(islice(leitor_csv, tamanho_bloco))
+            if not linhas:
+                return
+            yield linhas
+
+
+def converter_bloco(linhas, atributos=None, avisos=None):
+    """Converte um bloco de linhas em casos, projetando os campos se `atributos` for informado.
+
+    Falhas de conversão e linhas puladas são registradas em `avisos` (AvisosConversao).
+    """
+    campos = None if atributos is None else CAMPOS_IDENTIFICACAO + tuple(atributos)
+    avisos = AvisosConversao() if avisos is None else avisos
+    casos = []
+    for linha in linhas:
+        try:
+            caso = converter_linha_csv(linha, avisos)
+        except ValueError as e:
+            avisos.registrar(LINHA_IGNORADA, str(e), linha.get('title', 'DESCONHECIDO'))
+            continue
+        except KeyError as e:
+            avisos.registrar(LINHA_IGNORADA, f"coluna ausente {e}", linha.get('title', 'DESCONHECIDO'))
+            continue
+        if campos is not None:
+            caso = Filme(**{campo: caso[campo] for campo in campos if campo in caso})
+        casos.append(caso)
+    return casos
+
+
+def iterar_blocos_colunares(caminho_arquivo, atributos=None, tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+    """Gera uma BaseColunar por bloco do CSV (apenas com as colunas de `atributos`, se informado).
+
+    Os avisos de conversão de todos os blocos são impressos uma vez, ao final.
+    """
+    avisos = AvisosConversao()
+    for linhas in ler_linhas_em_blocos(caminho_arquivo, tamanho_bloco):
+        yield BaseColunar(converter_bloco(linhas, atributos, avisos), atributos)
+    avisos.relatar(caminho_arquivo)
+
+
+def carregar_base_colunar_em_blocos(caminho_arquivo, atributos=None, tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+    """Carrega o CSV inteiro em uma BaseColunar, bloco a bloco, sem montar a lista completa de linhas.
+
+    Cada bloco é incorporado à base e descartado antes da leitura do próximo.
+    """
+    return BaseColunar.concatenar(iterar_blocos_colunares(caminho_arquivo, atributos, tamanho_bloco))
+
+
+def recuperar_top_k_em_fluxo(caso, pesos, k, caminho_arquivo, min_sim=None,
+                             tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+    """Recupera os k casos mais similares lendo o CSV em blocos, sem carregar a base inteira.
+
+    Cada bloco é projetado nos atributos usados pela consulta. O resultado é o mesmo de
+    `recuperar_top_k` sobre a base completa (empates resolvidos pela posição no arquivo).
+    """
+    from recuperacao import recuperar_top_k
+
+    atributos = atributos_com_peso(pesos, caso)
+    melhores = []  # (similaridade, -posição global, caso)
+    inicio_bloco = 0
+    for bloco in iterar_blocos_colunares(caminho_arquivo, atributos, tamanho_bloco):
+        posicoes = {id(c): inicio_bloco + i for i, c in enumerate(bloco.casos)}
+        for item in recuperar_top_k(caso, pesos, k, min_sim, base=bloco):
+            melhores.append((item['similaridade'], -posicoes[id(item['caso'])], item['caso']))
+        melhores = heapq.nlargest(k, melhores, key=lambda m: (m[0], m[1]))
+        inicio_bloco += bloco.n
+    return [{'caso': c, 'similaridade': s} for s, _, c in melhores]
+
+
+# --- Leitura Paralela do CSV (Múltiplos Processos) ---
+# A conversão das linhas é limitada pela CPU (regexes de duração, divisão de listas,
+# normalização da classificação). O arquivo é dividido em faixas de bytes que começam e
+# terminam em fronteiras de registro; cada faixa é convertida em um processo separado e
+# devolvida em forma colunar (o mesmo formato do snapshot, barato de serializar). O
+# processo principal reconstrói os casos e junta as partes na ordem original das linhas.
+#
+# Fronteiras: uma quebra de linha só encerra um registro se estiver fora de aspas, ou
+# seja, se o número de caracteres '"' antes dela for par (aspas escapadas '""' não
+# alteram a paridade).
+
+TAMANHO_MINIMO_PARALELO = 1 << 20  # Arquivos menores são lidos sequencialmente
+PARTES_POR_PROCESSO = 4  # Mais partes que processos equilibra a carga entre eles
+
+
+def _proxima_fronteira(mapa, posicao, aspas):
+    """A partir de `posicao` (com `aspas` aspas antes dela), acha o início do próximo registro.
+
+    Retorna (início do próximo registro, total de aspas antes dele) ou (None, aspas) no fim do arquivo.
+    """
+    while True:
+        quebra = mapa.find(b"\n", posicao)
+        if quebra == -1:
+            return None, aspas
+        aspas += mapa[posicao:quebra].count(b'"')
+        posicao = quebra + 1
+        if aspas % 2 == 0:
+            return posicao, aspas
+
+
+def dividir_em_registros(caminho_arquivo, partes):
+    """Divide o CSV em até `partes` faixas de bytes [início, fim) alinhadas a registros.
+
+    Retorna (cabeçalho em bytes, lista de faixas). A primeira faixa começa logo após o cabeçalho.
+    """
+    with open(caminho_arquivo, "rb") as arquivo:
+        tamanho = os.fstat(arquivo.fileno()).st_size
+        if tamanho == 0:
+            return b"", []
+        with mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            inicio_dados, aspas = _proxima_fronteira(mapa, 0, 0)
+            if inicio_dados is None:
+                return mapa[:], []
+            cabecalho = mapa[:inicio_dados]
+            fronteiras = [inicio_dados]
+            posicao = inicio_dados
+            passo = (tamanho - inicio_dados) / partes
+            for i in range(1, partes):
+                alvo = inicio_dados + int(passo * i)
+                if alvo <= posicao:
+                    continue
+                aspas += mapa[posicao:alvo].count(b'"')
+                posicao, aspas = _proxima_fronteira(mapa, alvo, aspas)
+                if posicao is None or posicao >= tamanho:
+                    break
+                fronteiras.append(posicao)
+    fronteiras.append(tamanho)
+    return cabecalho, [(a, b) for a, b in zip(fronteiras, fronteiras[1:]) if b > a]
+
+
+def _converter_faixa(caminho_arquivo, cabecalho, inicio, fim):
+    """Converte uma faixa de bytes do CSV (executado em um processo do pool).
+
+    Retorna (("colunas", arrays, n) no formato do snapshot, ou ("casos", casos) se algum
+    valor não puder ser representado em colunas) e os avisos de conversão da faixa.
+    """
+    with open(caminho_arquivo, "rb") as arquivo:
+        arquivo.seek(inicio)
+        dados = arquivo.read(fim - inicio)
+    # Mesma decodificação (UTF-8 com newlines universais) de um open() em modo texto
+    texto = io.TextIOWrapper(io.BytesIO(cabecalho + dados), encoding="utf-8")
+    avisos = AvisosConversao()
+    casos = converter_bloco(csv.DictReader(texto), avisos=avisos)
+    try:
+        return ("colunas", colunas_para_arrays(casos), len(casos)), avisos
+    except (TypeError, ValueError, OverflowError):
+        return ("casos", casos), avisos
+
+
+def carregar_base_de_casos_csv_paralelo(caminho_arquivo, processos=None, avisos=None):
+    """Carrega o CSV convertendo faixas do arquivo em paralelo.
+
+    O resultado é idêntico ao de `carregar_base_de_casos_csv(..., usar_snapshot=False)`
+    (mesmos casos, na mesma ordem). Erros de arquivo são propagados ao chamador; os
+    avisos de conversão de todas as faixas são juntados em `avisos`, se informado.
+    """
+    processos = processos or os.cpu_count() or 1
+    if processos <= 1 or os.path.getsize(caminho_arquivo) < TAMANHO_MINIMO_PARALELO:
+        with open(caminho_arquivo, mode='r', encoding='utf-8') as arquivo_csv:
+            return converter_bloco(csv.DictReader(arquivo_csv), avisos=avisos)
+
+    cabecalho, faixas = dividir_em_registros(caminho_arquivo, processos * PARTES_POR_PROCESSO)
+    casos = []
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        futuros = [executor.submit(_converter_faixa, caminho_arquivo, cabecalho, inicio, fim)
+                   for inicio, fim in faixas]
+        for futuro in futuros:  # Na ordem das faixas = ordem original das linhas
+            resultado, avisos_faixa = futuro.result()
+            if avisos is not None:
+                avisos.juntar(avisos_faixa)
+            if resultado[0] == "colunas":
+                casos.extend(casos_dos_arrays(resultado[1], resultado[2]))
+            else:
+                casos.extend(resultado[1])
+    return casos
+
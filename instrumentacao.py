@@ -0,0 +1,211 @@
+import contextlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+# --- Instrumentação (Opcional) ---
+# Quando ativada, registra onde o tempo das buscas é gasto:
+#   - fases: tempo de parede de carga, conversão do CSV, snapshot, construção da base
+#     colunar, pontuação, ordenação (seleção do top-k) e exibição/gravação dos resultados;
+#   - atributos: para cada atributo, a métrica local usada (similaridade_jaccard,
+#     similaridade_numerica_normalizada, similaridade_ordinal_mpaa), o número de chamadas,
+#     o número de casos comparados e o tempo acumulado dentro da métrica;
+#   - contadores: acertos/falhas do cache de resultados e da reordenação por mudança de
+#     pesos (similaridades locais reaproveitadas), consultas atendidas por índice
+#     invertido, listas ordenadas (CSR), bitmask ou varredura, casos tocados pelos
+#     índices e candidatos podados.
+#
+# Desativada (o padrão), cada ponto instrumentado custa só a leitura de
+# `INSTRUMENTACAO.ativa`; nada é medido nem guardado.
+#
+# Ativação: `INSTRUMENTACAO.ativar()` ou a variável de ambiente RBC_INSTRUMENTACAO
+# ("1" para ativar; um caminho terminado em ".json" também grava o JSON ao final de
+# `main.main()`). `resumo()` formata os números (ou só os de uma consulta, a partir de
+# uma `marca()`), `como_dicionario()`/`salvar_json()` exportam tudo.
+
+VARIAVEL_AMBIENTE = "RBC_INSTRUMENTACAO"
+
+_SEM_MEDICAO = contextlib.nullcontext()
+
+
+class _Fase:
+    """Mede o tempo de parede de um bloco `with` e o registra como uma fase."""
+
+    __slots__ = ("instrumentacao", "nome", "inicio")
+
+    def __init__(self, instrumentacao, nome):
+        self.instrumentacao = instrumentacao
+        self.nome = nome
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.instrumentacao.registrar_fase(self.nome, time.perf_counter() - self.inicio)
+
+
+class Instrumentacao:
+    """Tempos por fase e contadores por atributo das buscas (desativada por padrão)."""
+
+    def __init__(self):
+        self.ativa = False
+        self._trava = threading.Lock()
+        self.reiniciar()
+
+    def ativar(self):
+        self.ativa = True
+        return self
+
+    def desativar(self):
+        self.ativa = False
+        return self
+
+    def reiniciar(self):
+        """Descarta tudo que foi registrado."""
+        with self._trava:
+            self.fases = {}  # nome -> [chamadas, segundos]
+            self.atributos = {}  # atributo -> [métrica, chamadas, casos, segundos]
+            self.contadores = {}  # nome -> quantidade
+
+    def fase(self, nome):
+        """Contexto que mede uma fase (não mede nada se a instrumentação estiver desativada)."""
+        return _Fase(self, nome) if self.ativa else _SEM_MEDICAO
+
+    def registrar_fase(self, nome, segundos):
+        with self._trava:
+            fase = self.fases.setdefault(nome, [0, 0.0])
+            fase[0] += 1
+            fase[1] += segundos
+
+    def registrar_atributo(self, atributo, metrica, casos, segundos, chamadas=1):
+        with self._trava:
+            registro = self.atributos.setdefault(atributo, [metrica, 0, 0, 0.0])
+            registro[1] += chamadas
+            registro[2] += casos
+            registro[3] += segundos
+
+    def contar(self, nome, quantidade=1):
+        with self._trava:
+            self.contadores[nome] = self.contadores.get(nome, 0) + quantidade
+
+    def marca(self):
+        """Cópia dos números atuais, para depois resumir só o que aconteceu a partir daqui."""
+        with self._trava:
+            return ({nome: list(v) for nome, v in self.fases.items()},
+                    {nome: list(v) for nome, v in self.atributos.items()},
+                    dict(self.contadores))
+
+    def como_dicionario(self, desde=None):
+        """Números registrados (ou a diferença desde uma `marca()`), incluindo as taxas derivadas."""
+        fases, atributos, contadores = self.marca()
+        if desde is not None:
+            fases_antes, atributos_antes, contadores_antes = desde
+            fases = _diferenca(fases, fases_antes)
+            atributos = _diferenca(atributos, atributos_antes)
+            contadores = {nome: quantidade - contadores_antes.get(nome, 0) for nome, quantidade in contadores.items()
+                          if quantidade != contadores_antes.get(nome, 0)}
+        return {
+            "fases": {nome: {"chamadas": chamadas, "segundos": segundos}
+                      for nome, (chamadas, segundos) in fases.items()},
+            "atributos": {nome: {"metrica": metrica, "chamadas": chamadas, "casos": casos, "segundos": segundos}
+                          for nome, (metrica, chamadas, casos, segundos) in atributos.items()},
+            "contadores": contadores,
+            "taxas": _taxas(contadores),
+        }
+
+    def resumo(self, desde=None):
+        """Texto com os números registrados (ou a diferença desde uma `marca()`)."""
+        dados = self.como_dicionario(desde)
+        linhas = ["--- Instrumentação ---"]
+        if dados["fases"]:
+            linhas.append("Fases (tempo de parede):")
+            for nome, fase in sorted(dados["fases"].items(), key=lambda item: -item[1]["segundos"]):
+                linhas.append(f"  {nome:<24} {fase['segundos'] * 1000:>10.2f} ms  ({fase['chamadas']}x)")
+        if dados["atributos"]:
+            linhas.append("Similaridade local por atributo:")
+            for nome, registro in sorted(dados["atributos"].items(), key=lambda item: -item[1]["segundos"]):
+                linhas.append(f"  {nome:<20} {registro['metrica']:<34} {registro['segundos'] * 1000:>10.2f} ms  "
+                              f"{registro['chamadas']} chamadas, {registro['casos']} casos")
+        if dados["taxas"]:
+            linhas.append("Taxas:")
+            for nome, taxa in dados["taxas"].items():
+                linhas.append(f"  {nome:<40} {taxa * 100:>6.1f}%")
+        if dados["contadores"]:
+            linhas.append("Contadores:")
+            for nome, quantidade in sorted(dados["contadores"].items()):
+                linhas.append(f"  {nome:<40} {quantidade}")
+        return "\n".join(linhas)
+
+    def salvar_json(self, caminho_arquivo):
+        """Grava `como_dicionario()` em um arquivo JSON."""
+        with open(caminho_arquivo, "w", encoding="utf-8") as arquivo:
+            json.dump(self.como_dicionario(), arquivo, indent=2, ensure_ascii=False)
+            arquivo.write("\n")
+
+
+def _diferenca(atuais, anteriores):
+    """Registros (listas) atuais menos os anteriores, campo a campo; omite os que não mudaram."""
+    resultado = {}
+    for nome, valores in atuais.items():
+        antes = anteriores.get(nome)
+        if antes is not None:
+            valores = [v - a if isinstance(v, (int, float)) else v for v, a in zip(valores, antes)]
+        if any(v for v in valores if isinstance(v, (int, float))):
+            resultado[nome] = valores
+    return resultado
+
+
+def _razao(parte, total):
+    return parte / total if total else None
+
+
+def _taxas(contadores):
+    """Taxas derivadas dos contadores (só as que têm denominador)."""
+    taxas = {
+        "cache.taxa_acerto": _razao(contadores.get("cache.acertos", 0),
+                                    contadores.get("cache.acertos", 0) + contadores.get("cache.falhas", 0)),
+        "reordenacao.taxa_acerto": _razao(
+            contadores.get("reordenacao.acertos", 0),
+            contadores.get("reordenacao.acertos", 0) + contadores.get("reordenacao.falhas", 0)),
+        "jaccard.fracao_por_indice": _razao(
+            contadores.get("jaccard.indice_invertido", 0) + contadores.get("jaccard.bitmask", 0)
+            + contadores.get("jaccard.listas_ordenadas", 0),
+            contadores.get("jaccard.indice_invertido", 0) + contadores.get("jaccard.bitmask", 0)
+            + contadores.get("jaccard.listas_ordenadas", 0) + contadores.get("jaccard.varredura", 0)),
+        "indice_invertido.fracao_casos_tocados": _razao(contadores.get("indice_invertido.casos_tocados", 0),
+                                                        contadores.get("indice_invertido.casos_consultados", 0)),
+        "poda.fracao_descartada": _razao(
+            contadores.get("poda.candidatos_iniciais", 0) - contadores.get("poda.candidatos_finais", 0),
+            contadores.get("poda.candidatos_iniciais", 0)),
+    }
+    return {nome: taxa for nome, taxa in taxas.items() if taxa is not None}
+
+
+INSTRUMENTACAO = Instrumentacao()
+if os.environ.get(VARIAVEL_AMBIENTE, "0") not in ("", "0"):
+    INSTRUMENTACAO.ativar()
+
+
+def caminho_json_ambiente():
+    """Arquivo JSON indicado em RBC_INSTRUMENTACAO (None se a variável não for um caminho .json)."""
+    valor = os.environ.get(VARIAVEL_AMBIENTE, "")
+    return valor if valor.lower().endswith(".json") else None
+
+
+# --- Percentis de Latência ---
+# Resumo de uma lista de tempos, usado pelos benchmarks e pelo /metrics do serviço.
+
+PERCENTIS = (50, 90, 95, 99)
+
+
+def percentis_ms(tempos_s):
+    """Percentis (PERCENTIS), média e máximo de uma lista de tempos em segundos, em milissegundos."""
+    tempos_ms = np.asarray(tempos_s) * 1000.0
+    resumo = {f"p{p}": round(float(np.percentile(tempos_ms, p)), 4) for p in PERCENTIS}
+    resumo["media"] = round(float(tempos_ms.mean()), 4)
+    resumo["maximo"] = round(float(tempos_ms.max()), 4)
+    return resumo
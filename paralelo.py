@@ -0,0 +1,169 @@
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from base_colunar import BaseColunar
+from recuperacao import selecionar_top_k, recuperar_indices_top_k
+
+# --- Recuperação Paralela com Memória Compartilhada ---
+# As colunas da base (arrays NumPy exportados por `BaseColunar.exportar`) são copiadas
+# uma única vez para um bloco de `multiprocessing.shared_memory`. Cada processo do pool
+# recebe, na inicialização, apenas o nome do bloco, o layout dos arrays e os metadados
+# pequenos (vocabulários), e monta uma BaseColunar cujos arrays são views do bloco
+# compartilhado. Por consulta, só o caso de entrada, os pesos e a faixa de casos de
+# cada tarefa são enviados; cada processo devolve o top-k local da sua faixa e o
+# processo principal junta os resultados.
+#
+# Com um único processo (ou se o pool não puder ser iniciado) a consulta é feita no
+# próprio processo, com o mesmo resultado. Se um processo do pool morrer (ex: falta de
+# memória, sinal), o pool é encerrado e o motor passa a consultar no próprio processo.
+
+ALINHAMENTO = 64
+FAIXAS_POR_PROCESSO = 2  # Faixas por consulta para cada processo (equilibra a carga)
+
+# Base montada sobre a memória compartilhada, dentro de cada processo do pool
+_base_trabalhador = None
+_memoria_trabalhador = None
+
+
+def _abrir_memoria_compartilhada(nome):
+    """Abre um bloco existente sem que o processo filho passe a ser "dono" dele."""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=nome, track=False)
+    # Antes do Python 3.13, abrir um bloco o registra no resource_tracker, que o
+    # removeria quando este processo terminasse; quem remove é o processo principal.
+    registrar = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        return shared_memory.SharedMemory(name=nome)
+    finally:
+        resource_tracker.register = registrar
+
+
+def _arrays_do_bloco(buffer, layout):
+    return {nome: np.ndarray(shape, dtype=np.dtype(dtype), buffer=buffer, offset=offset)
+            for nome, (dtype, shape, offset) in layout.items()}
+
+
+def compartilhar_base(base):
+    """Copia as colunas da base para um novo bloco de memória compartilhada.
+
+    Retorna (memória, argumentos de `abrir_base_compartilhada`); quem cria o bloco deve
+    fechá-lo e removê-lo (`close()` e `unlink()`) ao final.
+    """
+    metadados, arrays = base.exportar()
+    layout = {}
+    tamanho = 0
+    for nome, array in arrays.items():
+        tamanho = (tamanho + ALINHAMENTO - 1) // ALINHAMENTO * ALINHAMENTO
+        layout[nome] = (array.dtype.str, array.shape, tamanho)
+        tamanho += array.nbytes
+    memoria = shared_memory.SharedMemory(create=True, size=max(tamanho, 1))
+    try:
+        for nome, destino in _arrays_do_bloco(memoria.buf, layout).items():
+            destino[...] = arrays[nome]
+        del destino
+    except BaseException:
+        memoria.close()
+        memoria.unlink()
+        raise
+    return memoria, (memoria.name, layout, metadados)
+
+
+def abrir_base_compartilhada(nome_memoria, layout, metadados):
+    """Retorna (memória, base) montada sobre um bloco de `compartilhar_base` (em outro processo)."""
+    memoria = _abrir_memoria_compartilhada(nome_memoria)
+    return memoria, BaseColunar.importar(metadados, _arrays_do_bloco(memoria.buf, layout))
+
+
+def _inicializar_trabalhador(nome_memoria, layout, metadados):
+    global _base_trabalhador, _memoria_trabalhador
+    _memoria_trabalhador, _base_trabalhador = abrir_base_compartilhada(nome_memoria, layout, metadados)
+
+
+def _recuperar_faixa(caso, pesos, k, min_sim, inicio, fim):
+    """Top-k local dos casos [inicio, fim) (executado nos processos do pool)."""
+    return recuperar_indices_top_k(caso, pesos, k, min_sim, _base_trabalhador,
+                                   candidatos=np.arange(inicio, fim))
+
+
+class MotorRecuperacaoParalela:
+    """Recuperação top-k distribuída entre processos, com a base em memória compartilhada.
+
+    Uso:
+        with MotorRecuperacaoParalela(base.colunar) as motor:
+            resultados = motor.recuperar_top_k(caso, pesos, 10)
+    """
+
+    def __init__(self, base, processos=None):
+        self.base = base
+        self.processos = processos or os.cpu_count() or 1
+        self._memoria = None
+        self._executor = None
+        self._versao = None  # Versão da base copiada para a memória compartilhada
+
+    @property
+    def ativo(self):
+        """True se o pool de processos está em uso (False = execução no próprio processo)."""
+        return self._executor is not None
+
+    def iniciar(self):
+        """Copia as colunas para a memória compartilhada e inicia o pool de processos."""
+        if self._executor is not None or self.processos <= 1 or self.base.n == 0:
+            return self
+        self._versao = self.base.versao
+        try:
+            self._memoria, argumentos = compartilhar_base(self.base)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processos, initializer=_inicializar_trabalhador, initargs=argumentos)
+        except (OSError, ValueError) as e:
+            print(f"Aviso: recuperação paralela indisponível ({e}). Usando um único processo.")
+            self.encerrar()
+        return self
+
+    def encerrar(self):
+        """Finaliza o pool e libera a memória compartilhada."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        if self._memoria is not None:
+            self._memoria.close()
+            self._memoria.unlink()
+            self._memoria = None
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.encerrar()
+
+    def recuperar_indices_top_k(self, caso, pesos, k, min_sim=None):
+        """Top-k global como (índices, similaridades), juntando os top-k locais de cada faixa."""
+        if self._executor is not None and self._versao != self.base.versao:
+            # A base foi alterada depois da cópia: recopia antes de consultar
+            self.encerrar()
+            self.iniciar()
+        if self._executor is None:
+            return recuperar_indices_top_k(caso, pesos, k, min_sim, self.base)
+        limites = np.linspace(0, self.base.n, self.processos * FAIXAS_POR_PROCESSO + 1).astype(np.int64)
+        try:
+            futuros = [self._executor.submit(_recuperar_faixa, caso, pesos, k, min_sim, int(inicio), int(fim))
+                       for inicio, fim in zip(limites, limites[1:]) if fim > inicio]
+            parciais = [futuro.result() for futuro in futuros]
+        except BrokenProcessPool as e:
+            print(f"Aviso: um processo da recuperação paralela terminou ({e}). Usando um único processo.")
+            self.encerrar()
+            return recuperar_indices_top_k(caso, pesos, k, min_sim, self.base)
+        indices = np.concatenate([p[0] for p in parciais])
+        similaridades = np.concatenate([p[1] for p in parciais])
+        return selecionar_top_k(indices, similaridades, k)
+
+    def recuperar_top_k(self, caso, pesos, k, min_sim=None):
+        """Mesmo resultado de `recuperacao.recuperar_top_k` sobre a base do motor."""
+        indices, similaridades = self.recuperar_indices_top_k(caso, pesos, k, min_sim)
+        return [{'caso': self.base.casos[i], 'similaridade': float(s)}
+                for i, s in zip(indices, similaridades)]
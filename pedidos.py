@@ -0,0 +1,69 @@
+import json
+import math
+
+from base_colunar import ATRIBUTO_ORDINAL, ATRIBUTOS_NUMERICOS, ORDEM_ATRIBUTOS
+from similaridade import PESOS_PADRAO
+
+# --- Validação de Pedidos de Recomendação ---
+# Formato comum às interfaces sem laço interativo (servico.py e consultas_em_lote.py):
+# {"caso": {...}, "pesos": {...}, "k": 10, "min_sim": 0.5}. "pesos" completa
+# PESOS_PADRAO; "k" (padrão K_PADRAO, até K_MAXIMO) e "min_sim" são opcionais. Os
+# atributos do caso são conferidos pelo tipo (lista de strings, número finito ou, na
+# classificação, string) e os pesos devem ser números finitos não negativos. Um pedido
+# inválido levanta PedidoInvalido; cada interface decide como relatá-lo.
+
+K_PADRAO = 10
+K_MAXIMO = 1000
+
+
+class PedidoInvalido(ValueError):
+    """Pedido de recomendação malformado (a mensagem diz qual campo)."""
+
+
+def decodificar_pedido(texto):
+    """Decodifica o JSON de um pedido (PedidoInvalido se não for JSON válido)."""
+    try:
+        return json.loads(texto)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise PedidoInvalido(f"JSON inválido: {e}")
+
+
+def _numero_finito(valor):
+    # json.loads aceita NaN e Infinity, que contaminariam todas as similaridades
+    return isinstance(valor, (int, float)) and not isinstance(valor, bool) and math.isfinite(valor)
+
+
+def _validar_atributo(atributo, valor):
+    """Confere o tipo do valor de um atributo do caso (None = atributo sem valor)."""
+    if valor is None:
+        return
+    if atributo in ATRIBUTOS_NUMERICOS:
+        if not _numero_finito(valor):
+            raise PedidoInvalido(f"'caso.{atributo}' deve ser um número")
+    elif atributo == ATRIBUTO_ORDINAL:
+        if not isinstance(valor, str):
+            raise PedidoInvalido(f"'caso.{atributo}' deve ser uma string")
+    elif not isinstance(valor, str) and not (isinstance(valor, list)
+                                             and all(isinstance(item, str) for item in valor)):
+        raise PedidoInvalido(f"'caso.{atributo}' deve ser uma lista de strings")
+
+
+def validar_pedido(dados):
+    """Valida um pedido de recomendação (já decodificado do JSON); retorna (caso, pesos, k, min_sim)."""
+    if not isinstance(dados, dict):
+        raise PedidoInvalido("o corpo deve ser um objeto JSON")
+    caso = dados.get("caso")
+    if not isinstance(caso, dict) or not caso:
+        raise PedidoInvalido("'caso' deve ser um objeto com ao menos um atributo")
+    for atributo in ORDEM_ATRIBUTOS:  # Os demais campos (id, titulo...) não entram na similaridade
+        _validar_atributo(atributo, caso.get(atributo))
+    pesos = dados.get("pesos") or {}
+    if not isinstance(pesos, dict) or not all(_numero_finito(p) and p >= 0 for p in pesos.values()):
+        raise PedidoInvalido("'pesos' deve ser um objeto de atributo -> número finito não negativo")
+    k = dados.get("k", K_PADRAO)
+    if not isinstance(k, int) or isinstance(k, bool) or not 1 <= k <= K_MAXIMO:
+        raise PedidoInvalido(f"'k' deve ser um inteiro entre 1 e {K_MAXIMO}")
+    min_sim = dados.get("min_sim")
+    if min_sim is not None and not _numero_finito(min_sim):
+        raise PedidoInvalido("'min_sim' deve ser um número")
+    return caso, dict(PESOS_PADRAO, **pesos), k, min_sim
@@ -0,0 +1,786 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from base_colunar import (
+    ATRIBUTOS_NUMERICOS, ATRIBUTO_ORDINAL, ORDEM_ATRIBUTOS, acumular_soma, atributo_presente_na_consulta,
+    calcular_similaridade_vetorizada, concluir_soma, conjunto_jaccard, nova_compensacao,
+)
+from indices import BANDAS_LSH, PERMUTACOES_MINHASH, SEMENTE_MINHASH, IndiceLSH, IndiceOrdenado
+from instrumentacao import INSTRUMENTACAO
+from similaridade import calcular_similaridades_globais, normalizar_classificacao
+
+# --- Recuperação dos K Casos Mais Similares ---
+# Em vez de calcular a similaridade de todos os filmes e ordenar a base inteira,
+# os atributos são avaliados em ordem decrescente de peso e, a cada passo, os
+# candidatos cuja melhor similaridade possível (limite superior) não alcança o
+# k-ésimo melhor limite inferior são descartados. Os atributos restantes (de menor
+# peso) são calculados apenas para os candidatos que sobreviveram.
+#
+# Limites: após avaliar parte dos atributos, um caso tem soma ponderada `num`, peso
+# usado `den` e peso restante `R` (somente atributos que o caso possui). Como cada
+# similaridade local está entre 0 e 1, a similaridade final fica entre
+# num / (den + R) e (num + R) / (den + R).
+
+# Folga numérica na comparação dos limites (somas acumuladas em ordens diferentes)
+TOLERANCIA_PODA = 1e-9
+
+
+def selecionar_top_k(indices, similaridades, k):
+    """Seleciona os k maiores, desempatando pela posição na base (mesma ordem de um sorted estável)."""
+    if len(similaridades) > k:
+        corte = np.partition(similaridades, len(similaridades) - k)[len(similaridades) - k]
+        acima = np.flatnonzero(similaridades > corte)
+        empatados = np.flatnonzero(similaridades == corte)[:k - len(acima)]
+        selecionados = np.concatenate((acima, empatados))
+        indices = indices[selecionados]
+        similaridades = similaridades[selecionados]
+    ordem = np.lexsort((indices, -similaridades))
+    return indices[ordem], similaridades[ordem]
+
+
+def recuperar_indices_top_k(caso, pesos, k, min_sim=None, base=None, candidatos=None):
+    """Como `recuperar_top_k`, mas retorna (índices na base, similaridades) como arrays NumPy.
+
+    Se `candidatos` (array ordenado de índices) for informado, só esses casos são considerados.
+    """
+    if base is None:
+        from base_de_casos import obter_base_de_casos
+        base = obter_base_de_casos().colunar
+    if candidatos is None:
+        candidatos = base.indices_ativos()
+    elif base.removidos:
+        candidatos = candidatos[base.ativo[candidatos]]
+    if k <= 0 or len(candidatos) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+
+    instrumentar = INSTRUMENTACAO.ativa
+    if instrumentar:
+        inicio = time.perf_counter()
+        INSTRUMENTACAO.contar("consultas")
+        INSTRUMENTACAO.contar("poda.candidatos_iniciais", len(candidatos))
+    atributos = []
+    if caso:
+        atributos = [a for a in ORDEM_ATRIBUTOS
+                     if pesos.get(a, 0) > 0 and atributo_presente_na_consulta(caso, a)]
+    # Ordem de avaliação: pesos maiores primeiro (desempate pela ordem original)
+    atributos.sort(key=lambda a: -pesos[a])
+
+    if atributos:
+        validos = base.caso_valido[candidatos]
+        soma = np.zeros(len(candidatos))
+        peso_usado = np.zeros(len(candidatos))
+        peso_restante = np.zeros(len(candidatos))
+        for atributo in atributos:
+            peso_restante += np.where(base.presente[atributo][candidatos], pesos[atributo], 0.0)
+
+        for atributo in atributos:
+            peso = pesos[atributo]
+            sims, presentes = base.similaridade_local(atributo, caso.get(atributo), candidatos)
+            soma += np.where(presentes, sims * peso, 0.0)
+            peso_usado += np.where(presentes, peso, 0.0)
+            peso_restante -= np.where(presentes, peso, 0.0)
+
+            limiar = min_sim if min_sim is not None else -np.inf
+            total = peso_usado + peso_restante
+            com_peso = validos & (total > 0)
+            limite_superior = np.zeros(len(candidatos))
+            limite_inferior = np.zeros(len(candidatos))
+            np.divide(soma + peso_restante, total, out=limite_superior, where=com_peso)
+            np.divide(soma, total, out=limite_inferior, where=com_peso)
+            if len(candidatos) > k:
+                limiar = max(limiar, np.partition(limite_inferior, len(candidatos) - k)[len(candidatos) - k])
+
+            manter = limite_superior >= limiar - TOLERANCIA_PODA
+            if not manter.all():
+                candidatos = candidatos[manter]
+                soma = soma[manter]
+                peso_usado = peso_usado[manter]
+                peso_restante = peso_restante[manter]
+                validos = validos[manter]
+
+    # Similaridade exata (mesma ordem de soma da função par a par) apenas para os sobreviventes
+    if instrumentar:
+        INSTRUMENTACAO.contar("poda.candidatos_finais", len(candidatos))
+    similaridades = calcular_similaridade_vetorizada(caso, base, pesos, candidatos)
+    if min_sim is not None:
+        filtro = similaridades >= min_sim
+        candidatos = candidatos[filtro]
+        similaridades = similaridades[filtro]
+    if instrumentar:
+        INSTRUMENTACAO.registrar_fase("pontuacao", time.perf_counter() - inicio)
+    with INSTRUMENTACAO.fase("ordenacao"):
+        return selecionar_top_k(candidatos, similaridades, k)
+
+
+def recuperar_top_k(caso, pesos, k, min_sim=None, base=None):
+    """Recupera os k casos mais similares ao caso de entrada, em ordem decrescente de similaridade.
+
+    Retorna uma lista de {'caso', 'similaridade'} com o mesmo conteúdo dos k primeiros
+    itens da ordenação completa da base. Se `min_sim` for informado, apenas casos com
+    similaridade >= min_sim são retornados.
+    """
+    if base is None:
+        from base_de_casos import obter_base_de_casos
+        base = obter_base_de_casos().colunar
+    indices, similaridades = recuperar_indices_top_k(caso, pesos, k, min_sim, base)
+    return [{'caso': base.casos[i], 'similaridade': float(s)}
+            for i, s in zip(indices, similaridades)]
+
+
+# --- Recuperação em Lote ---
+# Para muitas consultas (ex: recomendações noturnas para milhares de filmes semente), as
+# similaridades são calculadas como uma matriz consultas x casos, um atributo por vez,
+# com operações NumPy sobre o bloco inteiro. As consultas são processadas em blocos
+# ("tiles") para limitar a memória: cada tile ocupa cerca de LIMITE_ELEMENTOS_TILE
+# valores por matriz intermediária. Tiles pequenos o bastante para caber no cache do
+# processador foram os mais rápidos nas medições (as operações são limitadas pela
+# largura de banda de memória). Em bases grandes, o tile mantém ao menos
+# MIN_CONSULTAS_POR_TILE consultas e passa do limite (com 1 milhão de casos, 64 MB por
+# matriz) para não virar uma consulta por vez.
+
+LIMITE_ELEMENTOS_TILE = 1 << 17
+MIN_CONSULTAS_POR_TILE = 8
+
+
+def consultas_por_tile(n):
+    """Número de consultas por tile para uma base de n casos."""
+    return max(MIN_CONSULTAS_POR_TILE, LIMITE_ELEMENTOS_TILE // max(n, 1))
+
+
+def _similaridades_do_tile(casos, base, pesos):
+    """Matriz de similaridade global (len(casos) x base.n), idêntica a calcular_similaridade_vetorizada por linha."""
+    soma_ponderada = np.zeros((len(casos), base.n))
+    compensacao = nova_compensacao((len(casos), base.n))
+    pesos_efetivamente_usados = np.zeros((len(casos), base.n))
+    for atributo in ORDEM_ATRIBUTOS:
+        peso = pesos.get(atributo, 0)
+        if not peso > 0:  # Também descarta pesos NaN, como `recuperar_top_k`
+            continue
+        consultas = np.array([bool(caso) and atributo_presente_na_consulta(caso, atributo) for caso in casos])
+        if not consultas.any():
+            continue
+        linhas = np.flatnonzero(consultas)
+        sims, presentes = base.similaridade_local_bloco(atributo, [casos[i].get(atributo) for i in linhas])
+        sims *= peso  # Já é 0 onde o caso não tem o atributo
+        peso_por_caso = np.where(presentes, peso, 0.0)
+        if len(linhas) == len(casos):  # Caso comum: evita cópias por indexação avançada
+            acumular_soma(soma_ponderada, compensacao, sims)
+            pesos_efetivamente_usados += peso_por_caso
+        else:
+            # Consultas sem o atributo recebem termo 0.0, que não altera a soma
+            termos = np.zeros_like(soma_ponderada)
+            termos[linhas] = sims
+            acumular_soma(soma_ponderada, compensacao, termos)
+            pesos_efetivamente_usados[linhas] += peso_por_caso
+    concluir_soma(soma_ponderada, compensacao)
+
+    usados = base.caso_valido[np.newaxis, :] & (pesos_efetivamente_usados != 0)
+    resultado = np.zeros((len(casos), base.n))
+    np.divide(soma_ponderada, pesos_efetivamente_usados, out=resultado, where=usados)
+    return resultado
+
+
+def recuperar_em_lote(casos, pesos, k, min_sim=None, base=None, tamanho_tile=None):
+    """Recupera os k casos mais similares para cada caso de entrada da lista.
+
+    Retorna uma lista (uma posição por consulta, na mesma ordem) de listas de
+    {'caso', 'similaridade'}, com o mesmo conteúdo de `recuperar_top_k` para cada consulta.
+    """
+    if base is None:
+        from base_de_casos import obter_base_de_casos
+        base = obter_base_de_casos().colunar
+    if tamanho_tile is None:
+        tamanho_tile = consultas_por_tile(base.n)
+
+    todos = base.indices_ativos()
+    resultados = []
+    for inicio in range(0, len(casos), tamanho_tile):
+        tile = casos[inicio:inicio + tamanho_tile]
+        with INSTRUMENTACAO.fase("pontuacao_lote"):
+            matriz = _similaridades_do_tile(tile, base, pesos)
+        for similaridades in matriz:
+            candidatos = todos
+            if base.removidos:
+                similaridades = similaridades[todos]
+            if min_sim is not None:
+                filtro = np.flatnonzero(similaridades >= min_sim)
+                candidatos = candidatos[filtro]
+                similaridades = similaridades[filtro]
+            with INSTRUMENTACAO.fase("ordenacao"):
+                indices, valores = selecionar_top_k(candidatos, similaridades, k) if k > 0 else ([], [])
+            resultados.append([{'caso': base.casos[i], 'similaridade': float(s)}
+                               for i, s in zip(indices, valores)])
+    return resultados
+
+
+# --- Cache de Resultados (LRU) ---
+# Buscas repetidas (ou equivalentes) retornam o resultado guardado. A chave é a forma
+# canônica da consulta: só entram os atributos que afetam a similaridade (peso > 0 e
+# presentes no caso), listas viram tuplas ordenadas dos valores válidos (Jaccard
+# ignora ordem e repetições), classificações viram o ordinal MPAA (ou a string, se não
+# mapeada) e números viram float. Os pesos desses atributos, k e min_sim completam a
+# chave. Quando a versão da base muda (casos adicionados, alterados ou removidos), o
+# cache inteiro é invalidado. Os arrays guardados são somente leitura, porque cada
+# acerto devolve os mesmos arrays a quem consultou.
+
+CAPACIDADE_CACHE_PADRAO = 256
+
+
+def _valor_canonico(atributo, valor):
+    if atributo in ATRIBUTOS_NUMERICOS:
+        return float(valor) if isinstance(valor, (int, float)) else ("nao_numerico",)
+    if atributo == ATRIBUTO_ORDINAL:
+        s_val, ordinal = normalizar_classificacao(valor)
+        return ("ordinal", ordinal) if ordinal is not None else ("texto", s_val)
+    return tuple(sorted(conjunto_jaccard(valor), key=repr))
+
+
+def chave_consulta(caso, pesos, k, min_sim=None):
+    """Forma canônica (hashable) de uma consulta: casos e pesos equivalentes geram a mesma chave."""
+    atributos = []
+    if caso:
+        for atributo in ORDEM_ATRIBUTOS:
+            peso = pesos.get(atributo, 0)
+            if peso > 0 and atributo_presente_na_consulta(caso, atributo):
+                atributos.append((atributo, float(peso), _valor_canonico(atributo, caso.get(atributo))))
+    return tuple(atributos), k, min_sim
+
+
+class CacheRecuperacao:
+    """Cache LRU de resultados de `recuperar_top_k` para uma base colunar."""
+
+    def __init__(self, capacidade=CAPACIDADE_CACHE_PADRAO):
+        self.capacidade = capacidade
+        self._entradas = OrderedDict()
+        self._trava = threading.Lock()
+        self._base = None
+        self._versao_base = None
+        self.acertos = 0
+        self.falhas = 0
+        self.remocoes = 0  # Entradas descartadas por falta de espaço
+        self.invalidacoes = 0  # Vezes em que o cache foi limpo porque a base mudou
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def limpar(self):
+        with self._trava:
+            self._entradas.clear()
+
+    def estatisticas(self):
+        """Contadores do cache (inclui a taxa de acerto)."""
+        consultas = self.acertos + self.falhas
+        return {"tamanho": len(self._entradas), "capacidade": self.capacidade,
+                "acertos": self.acertos, "falhas": self.falhas, "remocoes": self.remocoes,
+                "invalidacoes": self.invalidacoes,
+                "taxa_acerto": self.acertos / consultas if consultas else 0.0}
+
+    def _verificar_base(self, base):
+        """Descarta tudo se a consulta é para outra base ou se a base mudou de versão."""
+        if self._base is not base or self._versao_base != base.versao:
+            if self._entradas:
+                self.invalidacoes += 1
+                self._entradas.clear()
+            self._base = base
+            self._versao_base = base.versao
+
+    def recuperar_indices_top_k(self, caso, pesos, k, min_sim=None, base=None, similaridades_locais=None):
+        """Como `recuperar_indices_top_k`, consultando o cache antes de calcular.
+
+        Com `similaridades_locais` (CacheSimilaridadesLocais), as falhas são calculadas por
+        recombinação das similaridades locais guardadas, em vez da busca com poda.
+        """
+        if base is None:
+            from base_de_casos import obter_base_de_casos
+            base = obter_base_de_casos().colunar
+        chave = chave_consulta(caso, pesos, k, min_sim)
+        with self._trava:
+            self._verificar_base(base)
+            resultado = self._entradas.get(chave)
+            if resultado is not None:
+                self._entradas.move_to_end(chave)
+                self.acertos += 1
+                if INSTRUMENTACAO.ativa:
+                    INSTRUMENTACAO.contar("cache.acertos")
+                return resultado
+            self.falhas += 1
+            if INSTRUMENTACAO.ativa:
+                INSTRUMENTACAO.contar("cache.falhas")
+            versao = base.versao
+
+        if similaridades_locais is not None:
+            resultado = similaridades_locais.recuperar_indices_top_k(caso, pesos, k, min_sim, base)
+        else:
+            resultado = recuperar_indices_top_k(caso, pesos, k, min_sim, base)
+        for array in resultado:
+            array.setflags(write=False)
+        with self._trava:
+            # Só guarda se a base não mudou durante o cálculo
+            if self._base is base and self._versao_base == versao == base.versao:
+                self._entradas[chave] = resultado
+                self._entradas.move_to_end(chave)
+                while len(self._entradas) > self.capacidade:
+                    self._entradas.popitem(last=False)
+                    self.remocoes += 1
+        return resultado
+
+    def recuperar_top_k(self, caso, pesos, k, min_sim=None, base=None, similaridades_locais=None):
+        """Como `recuperar_top_k`, consultando o cache antes de calcular.
+
+        Os casos são lidos na mesma versão da base em que os índices valem: se a base mudar
+        entre a consulta e a leitura, a busca é refeita. Uma alteração ainda em andamento
+        não é detectada; quem altera a base deve excluir as buscas (ver BaseDeCasos).
+        """
+        if base is None:
+            from base_de_casos import obter_base_de_casos
+            base = obter_base_de_casos().colunar
+        while True:
+            versao = base.versao
+            indices, similaridades = self.recuperar_indices_top_k(caso, pesos, k, min_sim, base, similaridades_locais)
+            resultado = [{'caso': base.casos[i], 'similaridade': float(s)}
+                         for i, s in zip(indices, similaridades)]
+            if base.versao == versao:
+                return resultado
+
+
+# --- Reordenação por Mudança de Pesos ---
+# No uso interativo, é comum repetir a mesma consulta só mudando os pesos. A similaridade
+# global é uma média ponderada das similaridades locais, que não dependem dos pesos:
+# CacheSimilaridadesLocais guarda, para as últimas consultas (chave: os valores
+# canônicos do caso, sem os pesos), o vetor de similaridades locais de cada atributo
+# contra a base inteira. Com outros pesos, a busca vira só a recombinação ponderada
+# desses vetores (mesma ordem de soma e mesma renormalização por
+# pesos_efetivamente_usados de `calcular_similaridade_vetorizada`, então o resultado é
+# idêntico) e a seleção do top-k, sem recalcular nenhuma métrica.
+#
+# Os vetores são calculados sob demanda: só os atributos com peso > 0 na primeira busca;
+# um atributo cujo peso passa a ser positivo é calculado (uma vez) na busca seguinte.
+# Cada entrada custa 8 bytes por caso e atributo, então o cache guarda poucas consultas
+# (CAPACIDADE_SIMILARIDADES_LOCAIS) e respeita LIMITE_BYTES_SIMILARIDADES_LOCAIS (a
+# consulta mais recente é sempre mantida). Quando a versão da base muda, tudo é descartado.
+
+CAPACIDADE_SIMILARIDADES_LOCAIS = 4
+LIMITE_BYTES_SIMILARIDADES_LOCAIS = 256 << 20
+
+
+def chave_caso(caso):
+    """Forma canônica (hashable) do caso de uma consulta, sem os pesos."""
+    if not caso:
+        return ()
+    return tuple((atributo, _valor_canonico(atributo, caso.get(atributo))) for atributo in ORDEM_ATRIBUTOS
+                 if atributo_presente_na_consulta(caso, atributo))
+
+
+class CacheSimilaridadesLocais:
+    """Similaridades locais (por atributo, contra a base inteira) das últimas consultas."""
+
+    def __init__(self, capacidade=CAPACIDADE_SIMILARIDADES_LOCAIS, limite_bytes=LIMITE_BYTES_SIMILARIDADES_LOCAIS):
+        self.capacidade = capacidade
+        self.limite_bytes = limite_bytes
+        self._entradas = OrderedDict()  # chave do caso -> {atributo: similaridades (0 onde ausente)}
+        self._trava = threading.Lock()
+        self._base = None
+        self._versao_base = None
+        self.acertos = 0  # Buscas atendidas só com recombinação
+        self.falhas = 0
+        self.vetores_calculados = 0
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def limpar(self):
+        with self._trava:
+            self._entradas.clear()
+
+    def estatisticas(self):
+        consultas = self.acertos + self.falhas
+        return {"tamanho": len(self._entradas), "capacidade": self.capacidade, "bytes": self._bytes(),
+                "acertos": self.acertos, "falhas": self.falhas, "vetores_calculados": self.vetores_calculados,
+                "taxa_acerto": self.acertos / consultas if consultas else 0.0}
+
+    def _bytes(self):
+        return sum(sims.nbytes for vetores in self._entradas.values() for sims in vetores.values())
+
+    def _verificar_base(self, base):
+        if self._base is not base or self._versao_base != base.versao:
+            self._entradas.clear()
+            self._base = base
+            self._versao_base = base.versao
+
+    def _vetores(self, caso, atributos, base):
+        """Vetores de similaridade local dos `atributos`, calculando (e guardando) os que faltam."""
+        chave = chave_caso(caso)
+        with self._trava:
+            self._verificar_base(base)
+            vetores = self._entradas.get(chave)
+            if vetores is not None:
+                self._entradas.move_to_end(chave)
+                faltando = [a for a in atributos if a not in vetores]
+                vetores = dict(vetores)
+            else:
+                faltando = list(atributos)
+                vetores = {}
+            if faltando:
+                self.falhas += 1
+            else:
+                self.acertos += 1
+            versao = base.versao
+        if INSTRUMENTACAO.ativa:
+            INSTRUMENTACAO.contar("reordenacao.falhas" if faltando else "reordenacao.acertos")
+        if not faltando:
+            return vetores
+
+        for atributo in faltando:
+            sims, presentes = base.similaridade_local(atributo, caso.get(atributo))
+            vetores[atributo] = np.where(presentes, sims, 0.0)
+        with self._trava:
+            self.vetores_calculados += len(faltando)
+            # Só guarda se a base não mudou durante o cálculo
+            if self._base is base and self._versao_base == versao == base.versao:
+                self._entradas[chave] = dict(self._entradas.get(chave, {}), **vetores)
+                self._entradas.move_to_end(chave)
+                while len(self._entradas) > 1 and (len(self._entradas) > self.capacidade
+                                                   or self._bytes() > self.limite_bytes):
+                    self._entradas.popitem(last=False)
+        return vetores
+
+    def similaridades(self, caso, pesos, base):
+        """Similaridades globais do caso contra a base inteira (igual a `calcular_similaridade_vetorizada`)."""
+        if not caso:
+            return np.zeros(base.n)
+        atributos = [a for a in ORDEM_ATRIBUTOS if pesos.get(a, 0) > 0 and atributo_presente_na_consulta(caso, a)]
+        vetores = self._vetores(caso, atributos, base)
+        soma_ponderada = np.zeros(base.n)
+        compensacao = nova_compensacao(base.n)
+        pesos_efetivamente_usados = np.zeros(base.n)
+        temporario = np.empty(base.n)
+        for atributo in atributos:  # Mesma ordem de soma da busca
+            peso = pesos[atributo]
+            # Fora dos presentes o vetor é 0.0: somar 0.0 não muda o valor
+            acumular_soma(soma_ponderada, compensacao, np.multiply(vetores[atributo], peso, out=temporario))
+            pesos_efetivamente_usados += np.multiply(base.presente[atributo], peso, out=temporario)
+        concluir_soma(soma_ponderada, compensacao)
+        usados = base.caso_valido & (pesos_efetivamente_usados != 0)
+        resultado = np.zeros(base.n)
+        np.divide(soma_ponderada, pesos_efetivamente_usados, out=resultado, where=usados)
+        return resultado
+
+    def recuperar_indices_top_k(self, caso, pesos, k, min_sim=None, base=None):
+        """Como `recuperar_indices_top_k`, recombinando as similaridades locais guardadas."""
+        if base is None:
+            from base_de_casos import obter_base_de_casos
+            base = obter_base_de_casos().colunar
+        candidatos = base.indices_ativos()
+        if k <= 0 or len(candidatos) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        inicio = time.perf_counter()
+        similaridades = self.similaridades(caso, pesos, base)
+        if base.removidos:
+            similaridades = similaridades[candidatos]
+        if min_sim is not None:
+            filtro = similaridades >= min_sim
+            candidatos = candidatos[filtro]
+            similaridades = similaridades[filtro]
+        if INSTRUMENTACAO.ativa:
+            INSTRUMENTACAO.registrar_fase("pontuacao", time.perf_counter() - inicio)
+        with INSTRUMENTACAO.fase("ordenacao"):
+            return selecionar_top_k(candidatos, similaridades, k)
+
+    def recuperar_top_k(self, caso, pesos, k, min_sim=None, base=None):
+        """Como `recuperar_top_k`, recombinando as similaridades locais guardadas."""
+        if base is None:
+            from base_de_casos import obter_base_de_casos
+            base = obter_base_de_casos().colunar
+        indices, similaridades = self.recuperar_indices_top_k(caso, pesos, k, min_sim, base)
+        return [{'caso': base.casos[i], 'similaridade': float(s)}
+                for i, s in zip(indices, similaridades)]
+
+
+# --- Recuperação Aproximada por LSH (Atributos de Pessoas) ---
+# Para buscas do tipo "filmes com elenco parecido", os candidatos podem vir de índices
+# LSH (MinHash em bandas, ver indices.IndiceLSH) de estrelas, roteiristas e diretores,
+# em vez da base inteira: só os filmes que coincidem com a consulta em alguma banda de
+# algum desses atributos são considerados, e cada candidato é re-pontuado com a
+# similaridade global exata (`calcular_similaridade_global`, via
+# `calcular_similaridades_globais`). Filmes relevantes sem pessoas em comum com a
+# consulta (ex: só gênero e ano parecidos) não são encontrados: o resultado é
+# aproximado, e `relatorio_recall_lsh` mede quanto do top-k exato é recuperado.
+#
+# Consultas sem nenhum desses atributos (com peso > 0 e ao menos um nome), ou cujos
+# nomes não coincidem com nenhum filme em nenhuma banda, usam a busca exata. Se a base
+# mudar (retenção), os índices são reconstruídos na próxima consulta.
+
+ATRIBUTOS_LSH = ("estrelas", "roteiristas", "diretores")
+
+
+class RecuperacaoLSH:
+    """Índices LSH dos atributos de pessoas de uma base colunar, com re-pontuação exata dos candidatos."""
+
+    def __init__(self, base, atributos=ATRIBUTOS_LSH, permutacoes=PERMUTACOES_MINHASH, bandas=BANDAS_LSH,
+                 semente=SEMENTE_MINHASH):
+        self.base = base
+        self.atributos = tuple(atributo for atributo in atributos if atributo in base.listas)
+        self.parametros = {"permutacoes": permutacoes, "bandas": bandas, "semente": semente}
+        self._construir()
+
+    def _construir(self):
+        self.versao = self.base.versao
+        self.indices = {atributo: IndiceLSH(self.base.listas[atributo], self.base.vocabulario, **self.parametros)
+                        for atributo in self.atributos}
+
+    def candidatos(self, caso, pesos):
+        """Posições dos candidatos de LSH (None se a consulta não usa nenhum atributo indexado)."""
+        if self.versao != self.base.versao:
+            self._construir()
+        # Conjuntos vazios não geram candidatos no MinHash (e na similaridade exata valem 1.0
+        # para os filmes também sem valores), então não contam como atributo consultado
+        conjuntos = {atributo: conjunto_jaccard(caso.get(atributo)) for atributo in self.atributos
+                     if caso and pesos.get(atributo, 0) > 0 and atributo_presente_na_consulta(caso, atributo)}
+        consultados = [atributo for atributo, conjunto in conjuntos.items() if conjunto]
+        if not consultados:
+            return None
+        listas = [self.indices[atributo].candidatos(conjuntos[atributo]) for atributo in consultados]
+        candidatos = np.unique(np.concatenate(listas))
+        if self.base.removidos:
+            candidatos = candidatos[self.base.ativo[candidatos]]
+        return candidatos
+
+    def recuperar_indices_top_k(self, caso, pesos, k, min_sim=None):
+        """Top-k aproximado como (índices, similaridades exatas dos candidatos)."""
+        candidatos = self.candidatos(caso, pesos)
+        if candidatos is None or len(candidatos) == 0:
+            # Sem atributo indexado na consulta, ou nenhum filme em comum em nenhuma banda
+            return recuperar_indices_top_k(caso, pesos, k, min_sim, self.base)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        casos = self.base.casos
+        similaridades = np.array(calcular_similaridades_globais(caso, [casos[i] for i in candidatos], pesos))
+        if min_sim is not None:
+            filtro = similaridades >= min_sim
+            candidatos = candidatos[filtro]
+            similaridades = similaridades[filtro]
+        return selecionar_top_k(candidatos, similaridades, k)
+
+    def recuperar_top_k(self, caso, pesos, k, min_sim=None):
+        """Como `recuperar_top_k`, mas só entre os candidatos de LSH."""
+        indices, similaridades = self.recuperar_indices_top_k(caso, pesos, k, min_sim)
+        return [{'caso': self.base.casos[i], 'similaridade': float(s)}
+                for i, s in zip(indices, similaridades)]
+
+
+def relatorio_recall_lsh(recuperacao_lsh, consultas, pesos, k):
+    """Compara o top-k de LSH com o top-k exato para cada consulta.
+
+    O recall de uma consulta é a fração das k posições exatas atendidas: resultados de
+    LSH com similaridade >= à k-ésima exata contam (empates com outros filmes valem).
+    """
+    base = recuperacao_lsh.base
+    recalls, candidatos, tempos_exatos, tempos_lsh = [], [], [], []
+    for caso in consultas:
+        inicio = time.perf_counter()
+        _, exatas = recuperar_indices_top_k(caso, pesos, k, base=base)
+        meio = time.perf_counter()
+        _, aproximadas = recuperacao_lsh.recuperar_indices_top_k(caso, pesos, k)
+        fim = time.perf_counter()
+        tempos_exatos.append(meio - inicio)
+        tempos_lsh.append(fim - meio)
+        lista = recuperacao_lsh.candidatos(caso, pesos)
+        candidatos.append(base.n - base.removidos if lista is None or len(lista) == 0 else len(lista))
+        if len(exatas) == 0:
+            recalls.append(1.0)
+        else:
+            recalls.append(min(len(exatas), int(np.sum(aproximadas >= exatas[-1] - TOLERANCIA_PODA))) / len(exatas))
+    casos_ativos = max(1, base.n - base.removidos)
+    return {
+        "consultas": len(recalls),
+        "k": k,
+        "parametros": dict(recuperacao_lsh.parametros, atributos=list(recuperacao_lsh.atributos)),
+        "recall_medio": float(np.mean(recalls)) if recalls else None,
+        "recall_minimo": float(np.min(recalls)) if recalls else None,
+        "fracao_consultas_recall_total": float(np.mean(np.array(recalls) == 1.0)) if recalls else None,
+        "candidatos_medio": float(np.mean(candidatos)) if candidatos else None,
+        "fracao_base_media": float(np.mean(candidatos)) / casos_ativos if candidatos else None,
+        "tempo_exato_ms_medio": float(np.mean(tempos_exatos)) * 1000 if tempos_exatos else None,
+        "tempo_lsh_ms_medio": float(np.mean(tempos_lsh)) * 1000 if tempos_lsh else None,
+    }
+
+
+# --- Recuperação por Faixas (Atributos Numéricos) ---
+# Para consultas dominadas por atributos numéricos (ex: ano, duração e avaliação
+# próximos), os candidatos saem de índices ordenados por valor (ver
+# indices.IndiceOrdenado): a busca parte do valor da consulta e expande, nos dois
+# sentidos, uma janela por atributo numérico "condutor", dobrando o tamanho a cada
+# rodada. Só os casos que entram em alguma janela (mais os que não têm valor comparável
+# em algum condutor) são pontuados, com a similaridade global exata.
+#
+# Limite de parada: um caso ainda não visto tem, em cada condutor a, distância ao valor
+# da consulta >= à da fronteira da janela, logo similaridade local <= f_a. Os demais
+# atributos da consulta valem no máximo 1, e incluí-los no denominador só aumenta a
+# razão, então a similaridade global desse caso é no máximo
+#     (soma dos w_a * f_a dos condutores + peso dos outros atributos) / peso total.
+# Quando esse limite fica abaixo do k-ésimo melhor já pontuado (ou de min_sim), nenhum
+# caso não visto pode entrar no top-k e a busca para: o resultado é exato (empates no
+# limite continuam a expansão, para respeitar o desempate pela posição).
+#
+# Condutores: atributos numéricos da consulta (com peso > 0) com no máximo
+# FRACAO_MAXIMA_FORA_DA_FAIXA dos casos sem valor comparável. Se nenhum atributo se
+# qualifica, a busca com poda (`recuperar_indices_top_k`) é usada direto. A cada rodada,
+# os índices também dizem quanto as janelas ainda precisariam crescer para o limite cair
+# abaixo do k-ésimo melhor: se seriam mais de FRACAO_MAXIMA_VISITADOS da base (consulta
+# pouco seletiva nos atributos numéricos), os casos restantes seguem pela busca com poda,
+# com o k-ésimo melhor já pontuado como similaridade mínima.
+# Os índices são construídos no primeiro uso de cada atributo e reconstruídos se a base
+# mudar (retenção).
+
+FRACAO_MAXIMA_FORA_DA_FAIXA = 0.2
+FRACAO_MAXIMA_VISITADOS = 0.3
+JANELA_INICIAL_FAIXAS = 256
+
+
+class RecuperacaoPorFaixas:
+    """Top-k exato a partir de índices ordenados dos atributos numéricos de uma base colunar."""
+
+    def __init__(self, base, atributos=None):
+        self.base = base
+        self.atributos = tuple(atributo for atributo in ATRIBUTOS_NUMERICOS
+                               if atributo in base.valores and (atributos is None or atributo in atributos))
+        self.versao = base.versao
+        self.indices = {}
+        self.casos_visitados = 0  # Casos pontuados na última consulta
+
+    def indice(self, atributo):
+        """Índice ordenado do atributo (construído no primeiro uso; refeito se a base mudou)."""
+        if self.versao != self.base.versao:
+            self.indices = {}
+            self.versao = self.base.versao
+        indice = self.indices.get(atributo)
+        if indice is None:
+            indice = self.indices[atributo] = IndiceOrdenado(self.base.valores[atributo],
+                                                             self.base.presente[atributo])
+        return indice
+
+    def condutores(self, caso, pesos):
+        """Atributos (e valores de consulta) que conduzem a expansão para esta consulta."""
+        if not caso:
+            return []
+        condutores = []
+        for atributo in self.atributos:
+            valor = caso.get(atributo)
+            min_val, max_val = ATRIBUTOS_NUMERICOS[atributo]
+            if (not pesos.get(atributo, 0) > 0 or not isinstance(valor, (int, float)) or np.isnan(valor)
+                    or max_val <= min_val):
+                continue
+            if len(self.indice(atributo).fora) <= FRACAO_MAXIMA_FORA_DA_FAIXA * self.base.n:
+                condutores.append((atributo, float(valor)))
+        return condutores
+
+    def _limite_nao_vistos(self, condutores, pesos, pesos_consulta, janelas):
+        """Maior similaridade global possível de um caso fora de todas as janelas (-inf se não resta nenhum)."""
+        peso_total, peso_outros = pesos_consulta
+        soma_fronteiras = 0.0
+        for atributo, valor in condutores:
+            distancia = self.indice(atributo).distancia_fronteira(valor, *janelas[atributo])
+            if distancia == np.inf:
+                return -np.inf  # Todos os casos comparáveis neste atributo já foram vistos
+            min_val, max_val = ATRIBUTOS_NUMERICOS[atributo]
+            soma_fronteiras += pesos[atributo] * max(0.0, 1.0 - distancia / (max_val - min_val))
+        return (soma_fronteiras + peso_outros) / peso_total
+
+    def _expansao_viavel(self, condutores, pesos, pesos_consulta, limiar, quantidade):
+        """Estima se janelas dentro de FRACAO_MAXIMA_VISITADOS da base bastam para parar a expansão."""
+        maximo = FRACAO_MAXIMA_VISITADOS * self.base.n
+        while 2 * quantidade * len(condutores) <= maximo:
+            janelas = {}
+            for atributo, valor in condutores:
+                indice = self.indice(atributo)
+                posicao = indice.posicao(valor)
+                janelas[atributo] = (max(0, posicao - quantidade), min(len(indice), posicao + quantidade))
+            if self._limite_nao_vistos(condutores, pesos, pesos_consulta, janelas) < limiar - TOLERANCIA_PODA:
+                return True
+            quantidade *= 2
+        return False
+
+    def recuperar_indices_top_k(self, caso, pesos, k, min_sim=None):
+        """Como `recuperar_indices_top_k`, pontuando só os casos próximos nos atributos numéricos."""
+        base = self.base
+        condutores = self.condutores(caso, pesos)
+        if k <= 0 or not condutores:
+            self.casos_visitados = base.n - base.removidos
+            return recuperar_indices_top_k(caso, pesos, k, min_sim, base)
+
+        peso_total = sum(pesos[a] for a in ORDEM_ATRIBUTOS
+                         if pesos.get(a, 0) > 0 and atributo_presente_na_consulta(caso, a))
+        pesos_consulta = (peso_total, peso_total - sum(pesos[atributo] for atributo, _ in condutores))
+        indices = {atributo: self.indice(atributo) for atributo, _ in condutores}
+        janelas = {atributo: (indices[atributo].posicao(valor),) * 2 for atributo, valor in condutores}
+        visto = np.zeros(base.n, dtype=bool)
+        pontuados, similaridades = [], []
+        melhores = np.empty(0)  # Similaridades dos (até) k melhores já pontuados
+        novos = np.unique(np.concatenate([indice.fora for indice in indices.values()]))
+        quantidade = quantidade_inicial = max(JANELA_INICIAL_FAIXAS, 4 * k)
+        restantes = None
+        while True:
+            novos = novos[~visto[novos]]
+            visto[novos] = True
+            if base.removidos:
+                novos = novos[base.ativo[novos]]
+            if len(novos):
+                sims = calcular_similaridade_vetorizada(caso, base, pesos, novos)
+                pontuados.append(novos)
+                similaridades.append(sims)
+                melhores = np.concatenate((melhores, sims))
+                if len(melhores) > k:
+                    melhores = np.partition(melhores, len(melhores) - k)[len(melhores) - k:]
+
+            limiar = min_sim
+            if len(melhores) == k and (limiar is None or melhores.min() > limiar):
+                limiar = float(melhores.min())
+            limite = self._limite_nao_vistos(condutores, pesos, pesos_consulta, janelas)
+            if limite == -np.inf or (limiar is not None and limite < limiar - TOLERANCIA_PODA):
+                break
+            # (só depois da primeira janela: antes dela o limiar vem apenas dos casos sem valor comparável)
+            if limiar is not None and quantidade > quantidade_inicial:
+                if not self._expansao_viavel(condutores, pesos, pesos_consulta, limiar, quantidade):
+                    # Consulta pouco seletiva nos atributos numéricos: o resto vai pela busca com poda
+                    restantes = np.flatnonzero(~visto)
+                    break
+
+            listas = []
+            for atributo, valor in condutores:
+                indice = indices[atributo]
+                inicio, fim = janelas[atributo]
+                novo_inicio, novo_fim = indice.janela(valor, quantidade, inicio, fim)
+                listas.append(indice.posicoes[novo_inicio:inicio])
+                listas.append(indice.posicoes[fim:novo_fim])
+                janelas[atributo] = (novo_inicio, novo_fim)
+            novos = np.unique(np.concatenate(listas))  # As janelas de atributos diferentes se sobrepõem
+            quantidade *= 2
+
+        candidatos = np.concatenate(pontuados) if pontuados else np.empty(0, dtype=np.int64)
+        similaridades = np.concatenate(similaridades) if similaridades else np.empty(0)
+        self.casos_visitados = len(candidatos)
+        if restantes is not None:
+            self.casos_visitados += len(restantes)
+            # O k-ésimo melhor já pontuado vale como similaridade mínima (empates continuam)
+            indices_resto, sims_resto = recuperar_indices_top_k(caso, pesos, k, limiar, base, restantes)
+            candidatos = np.concatenate((candidatos, indices_resto))
+            similaridades = np.concatenate((similaridades, sims_resto))
+        if INSTRUMENTACAO.ativa:
+            INSTRUMENTACAO.contar("faixas.casos_tocados", self.casos_visitados)
+            INSTRUMENTACAO.contar("faixas.casos_consultados", base.n - base.removidos)
+        if min_sim is not None:
+            filtro = similaridades >= min_sim
+            candidatos = candidatos[filtro]
+            similaridades = similaridades[filtro]
+        # selecionar_top_k desempata pela ordem no array: ordena pela posição na base antes
+        ordem = np.argsort(candidatos, kind="stable")
+        return selecionar_top_k(candidatos[ordem], similaridades[ordem], k)
+
+    def recuperar_top_k(self, caso, pesos, k, min_sim=None):
+        """Como `recuperar_top_k`, usando os índices ordenados."""
+        indices, similaridades = self.recuperar_indices_top_k(caso, pesos, k, min_sim)
+        return [{'caso': self.base.casos[i], 'similaridade': float(s)}
+                for i, s in zip(indices, similaridades)]
@@ -0,0 +1,166 @@
+import hashlib
+import io
+import json
+import os
+
+from filme import como_registro
+from similaridade import canonizar_casos
+from snapshot import EXTENSAO_SNAPSHOT, carregar_snapshot, salvar_snapshot
+
+# --- Log de Retenção (Etapa "Reter" do Ciclo RBC) ---
+# Filmes adicionados, atualizados ou removidos na base em memória (ver
+# `BaseDeCasos.adicionar_caso` e afins) são registrados, um por linha (JSON), em um log
+# somente de acréscimo ao lado do CSV (ex: "filmes_base_novo.csv.retencao.jsonl"). Ao
+# carregar a base, depois do CSV (ou do snapshot), as operações do log são reaplicadas
+# na ordem em que aconteceram. Os casos são identificados pelo campo 'id'.
+#
+# Formato de cada linha: {"operacao": "adicionar" | "atualizar" | "remover", "id": ..., "caso": {...}}
+# ("caso" não existe em "remover"). Linhas inválidas (ex: última linha incompleta após
+# uma queda do programa) são ignoradas com um aviso; a próxima gravação encerra a linha
+# incompleta antes de acrescentar a sua.
+#
+# Compactação: o log nunca é truncado (junto com o CSV, ele é a fonte dos dados), mas a
+# base resultante pode ser gravada em um snapshot próprio ("<log>.snapshot", mesmo
+# formato de snapshot.py) que registra o trecho inicial do log já incorporado (tamanho e
+# hash). Na carga, se o snapshot corresponder ao CSV e ao início do log, só as operações
+# gravadas depois dele são reaplicadas. `BaseDeCasos` grava esse snapshot sozinha quando
+# a carga reaplica mais de TAMANHO_MINIMO_COMPACTACAO bytes do log, ou sob demanda com
+# `compactar_retencao()`. Assim o tempo de carga não cresce com o histórico inteiro,
+# apenas o arquivo do log.
+
+EXTENSAO_LOG_RETENCAO = ".retencao.jsonl"
+OPERACOES_RETENCAO = ("adicionar", "atualizar", "remover")
+TAMANHO_MINIMO_COMPACTACAO = 1 << 20  # Bytes do log reaplicados a partir dos quais a carga compacta
+
+
+def caminho_log_retencao(caminho_csv):
+    """Caminho do log de retenção correspondente a um arquivo CSV."""
+    return caminho_csv + EXTENSAO_LOG_RETENCAO
+
+
+def caminho_snapshot_retencao(caminho_log):
+    """Caminho do snapshot da base com as operações do log já aplicadas."""
+    return caminho_log + EXTENSAO_SNAPSHOT
+
+
+def chave_log(caminho_log, tamanho=None):
+    """Identificação dos primeiros `tamanho` bytes do log (padrão: o arquivo inteiro): tamanho e hash."""
+    hash_conteudo = hashlib.blake2b(digest_size=20)
+    with open(caminho_log, "rb") as arquivo:
+        if tamanho is None:
+            tamanho = os.fstat(arquivo.fileno()).st_size
+        restante = tamanho
+        while restante > 0:
+            bloco = arquivo.read(min(restante, 1 << 20))
+            if not bloco:
+                break
+            hash_conteudo.update(bloco)
+            restante -= len(bloco)
+    return {"tamanho": tamanho, "hash": hash_conteudo.hexdigest()}
+
+
+def linha_log(operacao, id_caso, caso=None):
+    """Serializa uma operação do log (antes de aplicá-la, para falhar cedo se o caso não for JSON)."""
+    registro = {"operacao": operacao, "id": id_caso}
+    if caso is not None:
+        registro["caso"] = caso
+    return json.dumps(registro, ensure_ascii=False) + "\n"
+
+
+def _termina_incompleto(caminho_log):
+    """Indica se o log existe e não termina em quebra de linha (última linha cortada por uma queda)."""
+    try:
+        with open(caminho_log, "rb") as arquivo:
+            arquivo.seek(0, os.SEEK_END)
+            if arquivo.tell() == 0:
+                return False
+            arquivo.seek(-1, os.SEEK_END)
+            return arquivo.read(1) != b"\n"
+    except FileNotFoundError:
+        return False
+
+
+def registrar_no_log(caminho_log, linha):
+    """Acrescenta uma linha ao log e força a gravação em disco.
+
+    Se a última linha do log ficou incompleta, ela é encerrada antes, para que a nova
+    operação não seja grudada nela (e descartada junto na próxima carga).
+    """
+    incompleto = _termina_incompleto(caminho_log)
+    with open(caminho_log, "a", encoding="utf-8") as arquivo:
+        if incompleto:
+            arquivo.write("\n")
+        arquivo.write(linha)
+        arquivo.flush()
+        os.fsync(arquivo.fileno())
+
+
+def reaplicar_log_retencao(casos, caminho_log, inicio=0):
+    """Aplica as operações do log sobre a lista de casos carregada; retorna a nova lista.
+
+    `inicio` é a posição (em bytes) do log a partir da qual as operações ainda não estão nos casos.
+    """
+    casos = list(casos)
+    posicoes = {caso.get("id"): i for i, caso in enumerate(casos)}
+    aplicadas = 0
+    with open(caminho_log, mode="rb") as binario:
+        binario.seek(inicio)
+        arquivo = io.TextIOWrapper(binario, encoding="utf-8")
+        for numero, linha in enumerate(arquivo, 1):
+            if not linha.strip():
+                continue
+            try:
+                registro = json.loads(linha)
+                operacao, id_caso = registro["operacao"], registro["id"]
+                caso = registro.get("caso")
+                if operacao not in OPERACOES_RETENCAO or (operacao != "remover" and not isinstance(caso, dict)):
+                    raise ValueError(f"operação inválida: {operacao!r}")
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"Aviso: linha {numero} do log de retenção '{caminho_log}' ignorada ({e}).")
+                continue
+
+            posicao = posicoes.get(id_caso)
+            if posicao is None and operacao != "adicionar":
+                print(f"Aviso: linha {numero} do log de retenção: filme '{id_caso}' não encontrado.")
+                continue
+            if operacao == "remover":
+                casos[posicao] = None
+                del posicoes[id_caso]
+            elif posicao is None:
+                posicoes[id_caso] = len(casos)
+                casos.append(como_registro(caso))
+            else:
+                casos[posicao] = como_registro(caso)  # "adicionar" de um id que já existe vale como atualização
+            aplicadas += 1
+
+    print(f"{aplicadas} alterações reaplicadas do log de retenção '{caminho_log}'.")
+    return [caso for caso in casos if caso is not None]
+
+
+def salvar_snapshot_retencao(caminho_csv, caminho_log, casos):
+    """Grava os casos (CSV mais todo o log atual) no snapshot da retenção."""
+    salvar_snapshot(caminho_csv, casos, destino=caminho_snapshot_retencao(caminho_log),
+                    extras={"log": chave_log(caminho_log)})
+
+
+def carregar_snapshot_retencao(caminho_csv, caminho_log):
+    """Carrega o snapshot da retenção se ele corresponder ao CSV e ao início do log atual.
+
+    Retorna (casos, posição do log a partir da qual reaplicar) ou None.
+    """
+    incorporado = {}
+
+    def validar(cabecalho):
+        esperado = cabecalho.get("log")
+        if not esperado or os.path.getsize(caminho_log) < esperado["tamanho"]:
+            return False
+        incorporado.update(esperado)
+        return chave_log(caminho_log, esperado["tamanho"]) == esperado
+
+    if not os.path.exists(caminho_log):
+        return None
+    casos = carregar_snapshot(caminho_csv, destino=caminho_snapshot_retencao(caminho_log), validar=validar)
+    if casos is None:
+        return None
+    canonizar_casos(casos)
+    return casos, incorporado["tamanho"]
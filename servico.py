@@ -0,0 +1,248 @@
+import argparse
+import asyncio
+import collections
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from base_de_casos import CAMINHO_BASE_PADRAO, BaseDeCasos
+from instrumentacao import percentis_ms
+from pedidos import PedidoInvalido, decodificar_pedido, validar_pedido
+
+# --- Serviço HTTP de Recomendação ---
+# Servidor HTTP/1.1 mínimo (asyncio, só biblioteca padrão) que carrega a base de casos
+# uma única vez e atende recomendações em JSON, sem o laço interativo de `main()`:
+#
+#   POST /recommend  {"caso": {...}, "pesos": {...}, "k": 10, "min_sim": 0.5}
+#       "pesos" é opcional e completa PESOS_PADRAO; "k" (padrão K_PADRAO) e "min_sim"
+#       também são opcionais. Resposta: {"resultados": [{"id", "titulo", "link",
+#       "similaridade", "caso"}], "tempo_ms"}. Pedidos inválidos (ver pedidos.py)
+#       recebem 400.
+#   GET /health      estado do serviço e da base (número de casos, versão).
+#   GET /metrics     requisições, erros, em andamento, percentis de latência (janela
+#                    das últimas JANELA_LATENCIAS recomendações) e o cache da base.
+#
+# A pontuação roda em um pool de threads (o laço de eventos nunca bloqueia); as
+# operações NumPy liberam o GIL durante boa parte do cálculo. Buscas repetidas são
+# atendidas pelo cache LRU da base (ver recuperacao.CacheRecuperacao).
+#
+# Uso: python servico.py [--host 127.0.0.1] [--porta 8000] [--csv filmes_base_novo.csv]
+
+HOST_PADRAO = "127.0.0.1"
+PORTA_PADRAO = 8000
+TAMANHO_MAXIMO_CORPO = 1 << 20  # 1 MB
+TAMANHO_MAXIMO_CABECALHO = 16 * 1024
+TEMPO_OCIOSO_S = 30  # Conexões keep-alive sem requisição por mais tempo são fechadas
+JANELA_LATENCIAS = 1024
+
+MENSAGENS_STATUS = {200: "OK", 204: "No Content", 400: "Bad Request", 404: "Not Found",
+                    405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error",
+                    503: "Service Unavailable"}
+
+
+class ErroRequisicao(Exception):
+    """Erro do cliente: vira uma resposta JSON {"erro": ...} com o status informado."""
+
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def _caso_como_json(caso):
+    return {chave: list(valor) if isinstance(valor, tuple) else valor for chave, valor in caso.items()}
+
+
+class ServicoRecomendacao:
+    """Serviço HTTP de recomendação sobre uma BaseDeCasos mantida em memória."""
+
+    def __init__(self, base, trabalhadores=None):
+        self.base = base
+        self.executor = ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix="pontuacao")
+        self.inicio = time.time()
+        self.pronto = False
+        self.requisicoes = 0
+        self.erros = 0
+        self.em_andamento = 0
+        self.recomendacoes = 0
+        self.latencias = collections.deque(maxlen=JANELA_LATENCIAS)  # segundos por /recommend
+
+    async def preparar(self):
+        """Carrega a base (CSV/snapshot e representação colunar) antes de aceitar consultas."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, lambda: self.base.colunar)
+        self.pronto = True
+
+    # --- Rotas ---
+
+    async def recomendar(self, corpo):
+        try:
+            caso, pesos, k, min_sim = validar_pedido(decodificar_pedido(corpo or b"null"))
+        except PedidoInvalido as e:
+            raise ErroRequisicao(400, str(e))
+        inicio = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        resultados = await loop.run_in_executor(self.executor, self.base.recuperar_top_k, caso, pesos, k, min_sim)
+        segundos = time.perf_counter() - inicio
+        self.latencias.append(segundos)
+        self.recomendacoes += 1
+        return 200, {
+            "resultados": [{"id": item["caso"].get("id"), "titulo": item["caso"].get("titulo"),
+                            "link": item["caso"].get("link"), "similaridade": item["similaridade"],
+                            "caso": _caso_como_json(item["caso"])} for item in resultados],
+            "tempo_ms": round(segundos * 1000, 3),
+        }
+
+    def saude(self):
+        estado = {"status": "ok" if self.pronto else "carregando", "tempo_ativo_s": round(time.time() - self.inicio, 1)}
+        if self.pronto:
+            estado["casos"] = len(self.base)
+            estado["versao_base"] = self.base.colunar.versao
+        return (200 if self.pronto else 503), estado
+
+    def metricas(self):
+        return 200, {
+            "requisicoes": self.requisicoes,
+            "erros": self.erros,
+            "em_andamento": self.em_andamento,
+            "recomendacoes": self.recomendacoes,
+            "latencia_ms": percentis_ms(list(self.latencias)) if self.latencias else None,
+            "janela_latencia": len(self.latencias),
+            "cache": self.base.cache.estatisticas() if self.pronto else None,
+        }
+
+    async def despachar(self, metodo, caminho, corpo):
+        """Retorna (status, objeto JSON ou None) da rota pedida."""
+        caminho = caminho.split("?", 1)[0].rstrip("/") or "/"
+        if metodo == "OPTIONS":
+            return 204, None
+        rotas = {"/recommend": ("POST",), "/health": ("GET",), "/metrics": ("GET",)}
+        if caminho not in rotas:
+            raise ErroRequisicao(404, f"rota desconhecida: {caminho}")
+        if metodo not in rotas[caminho]:
+            raise ErroRequisicao(405, f"use {', '.join(rotas[caminho])} em {caminho}")
+        if caminho == "/health":
+            return self.saude()
+        if caminho == "/metrics":
+            return self.metricas()
+        if not self.pronto:
+            raise ErroRequisicao(503, "a base de casos ainda está carregando")
+        return await self.recomendar(corpo)
+
+    # --- HTTP ---
+
+    async def atender_conexao(self, leitor, escritor):
+        """Atende as requisições de uma conexão (keep-alive) até o cliente fechá-la."""
+        try:
+            while True:
+                try:
+                    cabecalho = await asyncio.wait_for(leitor.readuntil(b"\r\n\r\n"), TEMPO_OCIOSO_S)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    return
+                except asyncio.LimitOverrunError:
+                    await self._responder(escritor, 413, {"erro": "cabeçalho muito grande"}, manter=False)
+                    return
+                manter = await self._atender_requisicao(cabecalho, leitor, escritor)
+                if not manter:
+                    return
+        finally:
+            escritor.close()
+
+    async def _atender_requisicao(self, cabecalho, leitor, escritor):
+        """Lê o corpo, despacha e responde; retorna se a conexão deve continuar aberta."""
+        self.requisicoes += 1
+        self.em_andamento += 1
+        try:
+            linhas = cabecalho.decode("latin-1").split("\r\n")
+            partes = linhas[0].split(" ")
+            if len(partes) != 3:
+                self.erros += 1
+                await self._responder(escritor, 400, {"erro": "linha de requisição inválida"}, manter=False)
+                return False
+            metodo, caminho, versao = partes
+            campos = {}
+            for linha in linhas[1:]:
+                if ":" in linha:
+                    nome, valor = linha.split(":", 1)
+                    campos[nome.strip().lower()] = valor.strip()
+            conexao = campos.get("connection", "").lower()
+            manter = conexao == "keep-alive" if versao == "HTTP/1.0" else conexao != "close"
+
+            try:
+                tamanho = int(campos.get("content-length", 0))
+            except ValueError:
+                tamanho = -1
+            if tamanho < 0 or tamanho > TAMANHO_MAXIMO_CORPO:
+                self.erros += 1
+                await self._responder(escritor, 413 if tamanho > 0 else 400,
+                                      {"erro": "Content-Length inválido ou grande demais"}, manter=False)
+                return False
+            try:
+                corpo = await leitor.readexactly(tamanho) if tamanho else b""
+            except asyncio.IncompleteReadError:
+                return False
+
+            try:
+                status, resposta = await self.despachar(metodo.upper(), caminho, corpo)
+            except ErroRequisicao as e:
+                status, resposta = e.status, {"erro": str(e)}
+            except Exception as e:  # Erro inesperado: responde 500 e mantém o serviço no ar
+                status, resposta = 500, {"erro": f"erro interno: {e}"}
+            if status >= 400:
+                self.erros += 1
+            await self._responder(escritor, status, resposta, manter)
+            return manter
+        finally:
+            self.em_andamento -= 1
+
+    @staticmethod
+    async def _responder(escritor, status, objeto, manter):
+        corpo = b"" if objeto is None else json.dumps(objeto, ensure_ascii=False).encode("utf-8")
+        cabecalhos = [
+            f"HTTP/1.1 {status} {MENSAGENS_STATUS.get(status, '')}",
+            "Content-Type: application/json; charset=utf-8",
+            f"Content-Length: {len(corpo)}",
+            f"Connection: {'keep-alive' if manter else 'close'}",
+            # Permite que a página index.html (aberta de outro endereço) consulte o serviço
+            "Access-Control-Allow-Origin: *",
+            "Access-Control-Allow-Methods: GET, POST, OPTIONS",
+            "Access-Control-Allow-Headers: Content-Type",
+        ]
+        escritor.write(("\r\n".join(cabecalhos) + "\r\n\r\n").encode("latin-1") + corpo)
+        try:
+            await escritor.drain()
+        except ConnectionError:
+            pass
+
+    async def servir(self, host=HOST_PADRAO, porta=PORTA_PADRAO):
+        """Carrega a base e atende conexões até o processo ser interrompido."""
+        servidor = await asyncio.start_server(self.atender_conexao, host, porta, limit=TAMANHO_MAXIMO_CABECALHO)
+        print("Carregando a base de casos...")
+        await self.preparar()
+        print(f"Serviço de recomendação em http://{host}:{porta} ({len(self.base)} filmes).")
+        async with servidor:
+            await servidor.serve_forever()
+
+    def encerrar(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Serviço HTTP de recomendação de filmes (RBC).")
+    parser.add_argument("--host", default=HOST_PADRAO)
+    parser.add_argument("--porta", type=int, default=PORTA_PADRAO)
+    parser.add_argument("--csv", default=CAMINHO_BASE_PADRAO, help="Arquivo CSV da base de casos")
+    parser.add_argument("--processos", type=int, default=1, help="Processos para converter o CSV (0 = todos os núcleos)")
+    parser.add_argument("--trabalhadores", type=int, default=None, help="Threads de pontuação")
+    args = parser.parse_args(argumentos)
+
+    servico = ServicoRecomendacao(BaseDeCasos(args.csv, processos=args.processos or None), args.trabalhadores)
+    try:
+        asyncio.run(servico.servir(args.host, args.porta))
+    except KeyboardInterrupt:
+        print("\nServiço encerrado.")
+    finally:
+        servico.encerrar()
+
+
+if __name__ == "__main__":
+    main()
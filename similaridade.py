@@ -0,0 +1,473 @@
+import datetime
+import time
+
+from filme import Filme
+from instrumentacao import INSTRUMENTACAO
+
+# Representação dos casos, métricas de similaridade local e similaridade global do RBC,
+# compartilhadas pela interface interativa (main.py) e pelos demais módulos.
+
+# --- Mapeamento de Atributos para o CBR (Original Comment) ---
+# titulo (title), generos (genre), ano_lancamento (year),
+# classificacao_etaria (rating_mpa), duracao_minutos (duration),
+# avaliacao_critica (rating_imdb), votos (vote), orcamento (budget),
+# bilheteria_mundial (gross_world_wide), diretores (director),
+# roteiristas (writer), estrelas (star), pais_origem (country_origin),
+# idioma (language), vitorias (win), indicacoes (nomination), oscars_indicados (oscar)
+
+# --- Visão Geral dos Atributos, Pesos e Métricas de Similaridade ---
+# Esta seção é inspirada na estrutura tabular para clareza, conforme solicitado.
+#
+# Colunas:
+#   1. Atributo (Chave no Dicionário do Caso): O nome do campo do filme usado no sistema.
+#   2. Peso Padrão: A importância padrão do atributo no cálculo da similaridade global (definido em PESOS_PADRAO).
+#   3. Métrica de Similaridade Local: A função Python específica usada para calcular a similaridade para este atributo.
+#   4. Parâmetros da Métrica: Constantes ou estruturas de dados relevantes usadas pela métrica (e.g., ranges Min/Max
+#      para normalização, mapas para valores ordinais, ou indicação de que listas de strings são usadas diretamente).
+#
+# ------------------------------------------------------------------------------------------------------------------------------------
+# | Atributo              | Peso Padrão | Métrica de Similaridade Local        | Parâmetros da Métrica (Constantes/Estruturas)       |
+# |-----------------------|-------------|--------------------------------------|-----------------------------------------------------|
+# | generos               | 0.20        | similaridade_jaccard                 | (Usa diretamente as listas de gêneros)              |
+# | ano_lancamento        | 0.10        | similaridade_numerica_normalizada    | MIN_ANO, MAX_ANO                                    |
+# | classificacao_etaria  | 0.10        | similaridade_ordinal_mpaa            | CLASSIFICACAO_MPAA_MAPA_ORDINAL,                    |
+# |                       |             |                                      | MAX_DIFF_CLASSIFICACAO_MPAA                         |
+# | duracao_minutos       | 0.05        | similaridade_numerica_normalizada    | MIN_DURACAO, MAX_DURACAO                            |
+# | avaliacao_critica     | 0.15        | similaridade_numerica_normalizada    | MIN_AVALIACAO_IMDB, MAX_AVALIACAO_IMDB              |
+# | votos                 | 0.05        | similaridade_numerica_normalizada    | MIN_VOTOS, MAX_VOTOS                                |
+# | orcamento             | 0.05        | similaridade_numerica_normalizada    | MIN_ORCAMENTO, MAX_ORCAMENTO                        |
+# | bilheteria_mundial    | 0.05        | similaridade_numerica_normalizada    | MIN_BILHETERIA_MUNDIAL, MAX_BILHETERIA_MUNDIAL      |
+# | diretores             | 0.05        | similaridade_jaccard                 | (Usa diretamente as listas de diretores)            |
+# | roteiristas           | 0.05        | similaridade_jaccard                 | (Usa diretamente as listas de roteiristas)          |
+# | estrelas              | 0.10        | similaridade_jaccard                 | (Usa diretamente as listas de estrelas)             |
+# | pais_origem           | 0.02        | similaridade_jaccard                 | (Usa diretamente as listas de países)               |
+# | idioma                | 0.02        | similaridade_jaccard                 | (Usa diretamente as listas de idiomas)              |
+# | vitorias              | 0.03        | similaridade_numerica_normalizada    | MIN_VITORIAS, MAX_VITORIAS                          |
+# | indicacoes            | 0.02        | similaridade_numerica_normalizada    | MIN_INDICACOES, MAX_INDICACOES                      |
+# | oscars_indicados      | 0.01        | similaridade_numerica_normalizada    | MIN_OSCARS_INDICADOS, MAX_OSCARS_INDICADOS          |
+# ------------------------------------------------------------------------------------------------------------------------------------
+#
+# Similaridade Jaccard: Usada para atributos categóricos com múltiplos valores (listas), como gêneros, diretores, estrelas, etc.
+# Como funciona:
+#   1. Converte as duas listas de itens (ex: listas de gêneros de dois filmes) em conjuntos (sets) para remover duplicatas e facilitar a comparação.
+#   2. Calcula o número de itens em comum entre os dois conjuntos (interseção).
+#   3. Calcula o número total de itens únicos presentes em ambos os conjuntos combinados (união).
+#   4. A similaridade é a razão entre o tamanho da interseção e o tamanho da união ($S_{Jaccard}(A, B) = \frac{|A \cap B|}{|A \cup B|}$).
+#   5. Se ambas as listas forem vazias ou contiverem apenas itens inválidos, a similaridade é 1.0 (considerados totalmente similares por falta de informação).
+#   6. Se uma lista for vazia/inválida e a outra não, a similaridade é 0.0.
+#
+# Similaridade Numérica Normalizada: Usada para atributos numéricos, como ano de lançamento, duração, avaliação, orçamento, etc.
+# Como funciona:
+#   1. Recebe dois valores numéricos ($val1$, $val2$) e os valores mínimo ($min\_val$) e máximo ($max\_val$) possíveis para aquele atributo na base de dados.
+#   2. Calcula a diferença absoluta entre os dois valores: $diff = |val1 - val2|$.
+#   3. Calcula o intervalo total (range) dos valores possíveis para o atributo: $max\_diff = max\_val - min\_val$.
+#   4. A similaridade é calculada como $1 - \frac{diff}{max\_diff}$. Isso resulta em um valor entre 0 e 1.
+#      - Se $val1$ e $val2$ são iguais, $diff = 0$, e a similaridade é 1.0 (máxima).
+#      - Se a diferença entre $val1$ e $val2$ é igual ao $max\_diff$, a similaridade é 0.0 (mínima).
+#   5. Se um dos valores for `None` (ausente), a similaridade é 0.0.
+#   6. Se $max\_diff$ for 0 (todos os valores na base para esse atributo são iguais), a similaridade é 1.0 se $val1 = val2$, e 0.0 caso contrário.
+#
+# Similaridade Ordinal MPAA: Usada para classificações etárias (MPAA e outras), que possuem uma ordem intrínseca (ex: G é menos restritivo que PG-13, que é menos restritivo que R).
+# Como funciona:
+#   1. Utiliza um mapa pré-definido (`CLASSIFICACAO_MPAA_MAPA_ORDINAL`) que atribui um valor numérico (índice) a cada classificação etária, refletindo sua ordem de restrição.
+#      Por exemplo, "G" pode ser 0, "PG" pode ser 1, "PG-13" pode ser 2, etc.
+#   2. Obtém os valores numéricos ordinais para as duas classificações etárias sendo comparadas ($val1_{num}$, $val2_{num}$).
+#   3. Calcula a diferença absoluta entre esses dois valores numéricos ordinais: $diff_{ordinal} = |val1_{num} - val2_{num}|$.
+#   4. Normaliza essa diferença dividindo-a pela máxima diferença possível na escala ordinal (`MAX_DIFF_CLASSIFICACAO_MPAA`), que é o número total de classificações menos 1.
+#   5. A similaridade é calculada como $1 - \frac{diff_{ordinal}}{MAX\_DIFF\_CLASSIFICACAO\_MPAA}$.
+#   6. Se uma ou ambas as classificações não estiverem no mapa ordinal, a função realiza uma comparação direta de strings: 1.0 se forem idênticas, 0.0 caso contrário.
+#   7. Valores `None` ou vazios são tratados como "Unrated" para fins de mapeamento.
+
+
+# --- 1. Representação do Caso e Base de Casos ---
+
+# Valores possíveis para atributos categóricos (para geração e validação)
+GENEROS_POSSIVEIS_EXEMPLO = ["Action", "Comedy", "Drama", "Sci-Fi", "Thriller", "Romance",
+                             "Animation", "Horror", "Adventure", "Crime", "Fantasy", "War", "Western", "Mystery", "Musical", "Biography", "History", "Family", "Sport"]
+
+# Classificações MPAA e outras encontradas, com uma tentativa de ordenação ordinal
+# Do menos restritivo para o mais restritivo. Esta ordem é uma interpretação.
+CLASSIFICACOES_MPAA_POSSIVEIS = [
+    "Unrated", "Not Rated", "Unknown",  # Não classificado ou desconhecido
+    "Approved", "Passed",  # Sistemas antigos, geralmente para todos os públicos
+    "K-A",  # Kids to Adults (similar a G) - Antigo
+    "TV-Y",  # All Children (TV)
+    "G", "TV-G",  # Geral
+    "GP",  # Antigo, precursor do PG
+    "M",  # Antigo, precursor do PG/PG-13
+    "PG", "TV-PG",  # Orientação parental sugerida
+    "M/PG",  # Intermediário (Antigo)
+    "TV-Y7", "TV-Y7-FV",  # Crianças mais velhas (TV)
+    "13+",  # Restrição de idade, similar a PG-13/TV-14
+    "PG-13",  # Orientação parental fortemente aconselhada para menores de 13
+    "TV-13",  # Similar a TV-14 (Antigo TV)
+    # Orientação parental fortemente aconselhada para menores de 14 (TV)
+    "TV-14",
+    "16+",  # Restrição de idade
+    "R",  # Restrito, menores de 17 acompanhados
+    "MA-17",  # Mature Audience, 17 and over (similar a NC-17 ou R forte)
+    "TV-MA",  # Público Adulto (TV)
+    "NC-17",  # Adultos apenas (substituiu o X em muitos casos)
+    # Adultos apenas (sistema antigo ou filmes não classificados pela MPAA)
+    "X",
+    "18+"  # Restrição de idade para adultos
+]
+CLASSIFICACAO_MPAA_MAPA_ORDINAL = {
+    val: i for i, val in enumerate(CLASSIFICACOES_MPAA_POSSIVEIS)}
+MAX_DIFF_CLASSIFICACAO_MPAA = len(CLASSIFICACOES_MPAA_POSSIVEIS) - 1
+
+# Ranges para normalização
+MIN_ANO = 1920
+MAX_ANO = datetime.datetime.now().year
+MAX_DIFF_ANOS = MAX_ANO - MIN_ANO
+
+MIN_DURACAO = 30
+MAX_DURACAO = 300  # Ajustar se houver filmes mais longos
+MAX_DIFF_DURACAO = MAX_DURACAO - MIN_DURACAO
+
+MIN_AVALIACAO_IMDB = 0.0
+MAX_AVALIACAO_IMDB = 10.0
+MAX_DIFF_AVALIACAO_IMDB = MAX_AVALIACAO_IMDB - MIN_AVALIACAO_IMDB
+
+MIN_VOTOS = 0
+MAX_VOTOS = 3000000  # Ajustar conforme o máximo observado no dataset
+MAX_DIFF_VOTOS = MAX_VOTOS - MIN_VOTOS
+
+MIN_ORCAMENTO = 1000
+MAX_ORCAMENTO = 500000000  # Ajustar
+MAX_DIFF_ORCAMENTO = MAX_ORCAMENTO - MIN_ORCAMENTO
+
+MIN_BILHETERIA_MUNDIAL = 0
+MAX_BILHETERIA_MUNDIAL = 3000000000  # Ajustar
+MAX_DIFF_BILHETERIA_MUNDIAL = MAX_BILHETERIA_MUNDIAL - MIN_BILHETERIA_MUNDIAL
+
+MIN_VITORIAS = 0
+MAX_VITORIAS = 200  # Ajustar
+MAX_DIFF_VITORIAS = MAX_VITORIAS - MIN_VITORIAS
+
+MIN_INDICACOES = 0
+MAX_INDICACOES = 300  # Ajustar
+MAX_DIFF_INDICACOES = MAX_INDICACOES - MIN_INDICACOES
+
+MIN_OSCARS_INDICADOS = 0
+MAX_OSCARS_INDICADOS = 50  # Ajustar
+MAX_DIFF_OSCARS_INDICADOS = MAX_OSCARS_INDICADOS - MIN_OSCARS_INDICADOS
+
+
+# --- 2. Métricas de Similaridade ---
+
+
+def similaridade_categorica_simples(val1, val2):
+    """Similaridade para atributos categóricos de valor único."""
+    return 1.0 if val1 == val2 else 0.0
+
+def conjunto_jaccard(valor):
+    """Converte o valor de um atributo multivalorado no conjunto usado pela similaridade de Jaccard."""
+    # Garante que o valor seja uma lista (ou tupla/conjunto), mesmo que vazia ou com um único item
+    if not isinstance(valor, (list, tuple, set, frozenset)):
+        valor = [valor] if valor is not None else []
+    # Remove Nones ou strings vazias antes de converter para set para evitar erros
+    return frozenset(item for item in valor if item and str(item).strip())
+
+
+def normalizar_classificacao(valor):
+    """Retorna (string_original, ordinal) de uma classificação etária; ordinal é None se não mapeada."""
+    # Trata Nones (e strings vazias) como "Unrated"
+    s_val = str(valor if valor is not None and str(valor).strip() else "Unrated")
+    # Tenta normalizar o valor para corresponder às chaves do mapa (ex: "PG 13" -> "PG-13")
+    val_norm = s_val if s_val in CLASSIFICACAO_MPAA_MAPA_ORDINAL else s_val.upper().replace(" ", "-")
+    return s_val, CLASSIFICACAO_MPAA_MAPA_ORDINAL.get(val_norm)
+
+
+# Similaridade entre duas classificações mapeadas, pré-calculada para todos os pares de
+# ordinais: TABELA_SIMILARIDADE_MPAA[ordinal1][ordinal2] (mesma fórmula de similaridade_ordinal_mpaa)
+TABELA_SIMILARIDADE_MPAA = [
+    [(1.0 if ordinal1 == ordinal2 else 0.0) if MAX_DIFF_CLASSIFICACAO_MPAA == 0
+     else 1.0 - (abs(ordinal1 - ordinal2) / MAX_DIFF_CLASSIFICACAO_MPAA)
+     for ordinal2 in range(len(CLASSIFICACOES_MPAA_POSSIVEIS))]
+    for ordinal1 in range(len(CLASSIFICACOES_MPAA_POSSIVEIS))]
+
+
+def classificacao_canonica(valor):
+    """Forma canônica de uma classificação: o ordinal (int) se mapeada, senão a string normalizada."""
+    s_val, ordinal = normalizar_classificacao(valor)
+    return ordinal if ordinal is not None else s_val
+
+
+def similaridade_classificacoes_canonicas(classificacao1, classificacao2):
+    """Similaridade ordinal MPAA entre duas classificações já na forma canônica (consulta à tabela)."""
+    if type(classificacao1) is int and type(classificacao2) is int:
+        return TABELA_SIMILARIDADE_MPAA[classificacao1][classificacao2]
+    # Não mapeadas: só a mesma string é similar (uma mapeada nunca tem a string de uma não mapeada)
+    return 1.0 if classificacao1 == classificacao2 else 0.0
+
+
+def conjunto_canonico(valor):
+    """Conjunto de Jaccard em forma compacta: tupla com os itens válidos, sem repetições.
+
+    Se o valor já é uma tupla limpa (o caso comum em um Filme), a própria tupla é usada.
+    """
+    conjunto = conjunto_jaccard(valor)
+    if type(valor) is tuple and len(valor) == len(conjunto):
+        return valor
+    return tuple(conjunto)
+
+
+def similaridade_jaccard(lista1, lista2):
+    """Similaridade de Jaccard para atributos com múltiplos valores (listas)."""
+    set1 = conjunto_jaccard(lista1)
+    set2 = conjunto_jaccard(lista2)
+
+    if not set1 and not set2:  # Ambas as listas estão vazias ou contêm apenas itens inválidos
+        return 1.0 # Considera-se similaridade total se ambos não têm informação válida
+    if not set1 or not set2:  # Uma está vazia/inválida e a outra não
+        return 0.0 # Nenhuma similaridade se um tem informação e o outro não
+
+    intersection = len(set1.intersection(set2))
+    union = len(set1.union(set2))
+    return intersection / union if union != 0 else 0.0
+
+def similaridade_numerica_normalizada(val1, val2, min_val, max_val):
+    """Similaridade para atributos numéricos normalizada."""
+    if val1 is None or val2 is None:
+        return 0.0  # Se um dos valores for None, similaridade é 0
+    # Adiciona verificação para min_val e max_val não serem None
+    if min_val is None or max_val is None:
+        # Se min/max não definidos, só há similaridade se os valores forem iguais
+        return 0.0 if val1 != val2 else 1.0 
+
+    max_diff = max_val - min_val
+    if max_diff == 0: # Evita divisão por zero se todos os valores na base forem iguais
+        return 1.0 if val1 == val2 else 0.0
+    
+    # Garante que os valores são numéricos antes de calcular a diferença
+    if not (isinstance(val1, (int, float)) and isinstance(val2, (int, float))):
+        return 0.0 # Não numérico, não comparável desta forma
+        
+    diff = abs(val1 - val2)
+    sim = 1.0 - (diff / max_diff)
+    return max(0.0, sim) # Garante que a similaridade não seja negativa
+
+
+def similaridade_ordinal_mpaa(val1_str, val2_str):
+    """Similaridade para classificação etária MPAA e outras (ordinal)."""
+    # Se um ou ambos não estão no mapa ordinal, faz comparação direta de strings
+    # (ex: ambos "Not Available" não mapeado -> 1; diferentes -> 0). Se ambos estão
+    # mapeados, usa a tabela pré-calculada de similaridade entre ordinais.
+    return similaridade_classificacoes_canonicas(classificacao_canonica(val1_str), classificacao_canonica(val2_str))
+
+# --- Formas Canônicas dos Casos ---
+# O que as métricas locais precisam de um caso da base não depende do caso de entrada:
+# o conjunto limpo de cada atributo multivalorado e a classificação normalizada. Essas
+# formas são calculadas uma vez por filme (no carregamento da base) e guardadas no
+# próprio Filme; as métricas passam a ser consultas à tabela / interseções de conjuntos.
+
+# Atributos com forma canônica, na ordem da tupla retornada por `forma_canonica`
+ATRIBUTO_CLASSIFICACAO = "classificacao_etaria"
+ATRIBUTOS_JACCARD = ("generos", "diretores", "roteiristas",
+                     "estrelas", "pais_origem", "idioma")
+POSICAO_CANONICA = {atributo: i for i, atributo in enumerate((ATRIBUTO_CLASSIFICACAO,) + ATRIBUTOS_JACCARD)}
+
+
+def forma_canonica(caso):
+    """Tupla (classificação canônica, conjuntos canônicos...) do caso; None onde o atributo não existe.
+
+    Em um Filme, é calculada uma única vez e guardada no registro.
+    """
+    canonico = getattr(caso, "_canonico", None)
+    if canonico is None:
+        classificacao = caso.get(ATRIBUTO_CLASSIFICACAO)
+        canonico = (classificacao_canonica(classificacao) if ATRIBUTO_CLASSIFICACAO in caso else None,) + tuple(
+            conjunto_canonico(caso.get(atributo)) if atributo in caso else None for atributo in ATRIBUTOS_JACCARD)
+        if isinstance(caso, Filme):
+            caso._canonico = canonico
+    return canonico
+
+
+def canonizar_casos(casos):
+    """Calcula (e guarda) as formas canônicas de todos os casos."""
+    for caso in casos:
+        forma_canonica(caso)
+
+
+# --- 3. Função de Similaridade Global ---
+
+# Pesos padrão para cada atributo. Podem ser ajustados pelo usuário.
+PESOS_PADRAO = {
+    "generos": 0.20,
+    "ano_lancamento": 0.10,
+    "classificacao_etaria": 0.10,
+    "duracao_minutos": 0.05,
+    "avaliacao_critica": 0.15,
+    "votos": 0.05,
+    "orcamento": 0.05,
+    "bilheteria_mundial": 0.05,
+    "diretores": 0.05,
+    "roteiristas": 0.05,
+    "estrelas": 0.10,
+    "pais_origem": 0.02,
+    "idioma": 0.02,
+    "vitorias": 0.03,
+    "indicacoes": 0.02,
+    "oscars_indicados": 0.01
+    # Outros campos como 'gross_us_canada' não são usados por padrão, mas poderiam ser adicionados.
+}
+
+
+# Atributos da similaridade global, na ordem em que as similaridades ponderadas são somadas:
+# (chave, métrica local, (Min, Max) para os numéricos)
+ATRIBUTOS_SIMILARIDADE_GLOBAL = (
+    ("generos", "jaccard", None),
+    ("ano_lancamento", "numerica", (MIN_ANO, MAX_ANO)),
+    ("classificacao_etaria", "ordinal_mpaa", None),
+    ("duracao_minutos", "numerica", (MIN_DURACAO, MAX_DURACAO)),
+    ("avaliacao_critica", "numerica", (MIN_AVALIACAO_IMDB, MAX_AVALIACAO_IMDB)),
+    ("votos", "numerica", (MIN_VOTOS, MAX_VOTOS)),
+    ("orcamento", "numerica", (MIN_ORCAMENTO, MAX_ORCAMENTO)),
+    ("bilheteria_mundial", "numerica", (MIN_BILHETERIA_MUNDIAL, MAX_BILHETERIA_MUNDIAL)),
+    ("diretores", "jaccard", None),
+    ("roteiristas", "jaccard", None),
+    ("estrelas", "jaccard", None),
+    ("pais_origem", "jaccard", None),
+    ("idioma", "jaccard", None),
+    ("vitorias", "numerica", (MIN_VITORIAS, MAX_VITORIAS)),
+    ("indicacoes", "numerica", (MIN_INDICACOES, MAX_INDICACOES)),
+    ("oscars_indicados", "numerica", (MIN_OSCARS_INDICADOS, MAX_OSCARS_INDICADOS)),
+)
+
+# Função de similaridade local de cada atributo (nome usado pela instrumentação)
+FUNCOES_METRICAS_LOCAIS = {"jaccard": "similaridade_jaccard", "numerica": "similaridade_numerica_normalizada",
+                           "ordinal_mpaa": "similaridade_ordinal_mpaa"}
+METRICA_DO_ATRIBUTO = {chave: FUNCOES_METRICAS_LOCAIS[metrica] for chave, metrica, _ in ATRIBUTOS_SIMILARIDADE_GLOBAL}
+
+# --- Plano de Similaridade (preparado uma vez por consulta) ---
+# Tudo que depende apenas do caso de entrada e dos pesos é resolvido antes de percorrer
+# a base: quais atributos participam (peso > 0 e informados na entrada), o peso de cada
+# um, o conjunto já limpo dos atributos multivalorados, o ordinal da classificação e o
+# intervalo (Max - Min) dos numéricos. Para cada filme da base resta só verificar se ele
+# tem o atributo e calcular a similaridade local contra o valor já preparado (usando a
+# forma canônica do filme para classificação e atributos multivalorados).
+#
+# O resultado é idêntico ao das funções de similaridade local: as mesmas operações são
+# feitas na mesma ordem (inclusive a divisão pelo intervalo, em vez da multiplicação
+# pelo inverso, que arredondaria diferente).
+
+
+def _preparar_jaccard(valor_novo):
+    conjunto_novo = conjunto_jaccard(valor_novo)
+    if not conjunto_novo:
+        return lambda conjunto_base: 0.0 if conjunto_base else 1.0
+    tamanho_novo = len(conjunto_novo)
+
+    def calcular(conjunto_base):
+        if not conjunto_base:
+            return 0.0
+        intersecao = len(conjunto_novo.intersection(conjunto_base))
+        return intersecao / (tamanho_novo + len(conjunto_base) - intersecao)
+    return calcular
+
+
+def _preparar_numerica(valor_novo, min_val, max_val):
+    max_diff = max_val - min_val
+    if max_diff == 0:
+        return lambda valor_base: 1.0 if valor_novo == valor_base else 0.0
+    if not isinstance(valor_novo, (int, float)):
+        return lambda valor_base: 0.0
+
+    def calcular(valor_base):
+        if not isinstance(valor_base, (int, float)):
+            return 0.0
+        return max(0.0, 1.0 - (abs(valor_novo - valor_base) / max_diff))
+    return calcular
+
+
+def _preparar_ordinal_mpaa(valor_novo):
+    classificacao_nova = classificacao_canonica(valor_novo)
+    if type(classificacao_nova) is not int:
+        return lambda classificacao_base: 1.0 if classificacao_base == classificacao_nova else 0.0
+    linha = TABELA_SIMILARIDADE_MPAA[classificacao_nova]
+    return lambda classificacao_base: linha[classificacao_base] if type(classificacao_base) is int else 0.0
+
+
+def _medir_metrica_local(chave, calcular):
+    """Envolve a função local de um atributo para registrar chamadas e tempo na instrumentação."""
+    metrica = METRICA_DO_ATRIBUTO[chave]
+    relogio = time.perf_counter
+
+    def medir(valor_base):
+        inicio = relogio()
+        similaridade = calcular(valor_base)
+        INSTRUMENTACAO.registrar_atributo(chave, metrica, 1, relogio() - inicio)
+        return similaridade
+    return medir
+
+
+def preparar_plano_similaridade(caso_novo, pesos):
+    """Prepara o plano de similaridade de um caso de entrada.
+
+    Lista de (chave, peso, posição na forma canônica (None para numéricos), função local).
+    Com a instrumentação ativa, as funções locais registram suas chamadas e seu tempo.
+    """
+    plano = []
+    if not caso_novo:
+        return plano
+    for chave, metrica, intervalo in ATRIBUTOS_SIMILARIDADE_GLOBAL:
+        peso = pesos.get(chave, 0)
+        if not peso > 0:
+            # Também descarta pesos NaN, como a comparação `> 0` da versão original
+            continue
+        if metrica == "numerica":
+            valor_novo = caso_novo.get(chave)
+            if valor_novo is not None:
+                plano.append((chave, peso, None, _preparar_numerica(valor_novo, *intervalo)))
+        elif chave in caso_novo:
+            preparar = _preparar_jaccard if metrica == "jaccard" else _preparar_ordinal_mpaa
+            plano.append((chave, peso, POSICAO_CANONICA[chave], preparar(caso_novo.get(chave))))
+    if INSTRUMENTACAO.ativa:
+        plano = [(chave, peso, posicao, _medir_metrica_local(chave, calcular))
+                 for chave, peso, posicao, calcular in plano]
+    return plano
+
+
+def aplicar_plano_similaridade(plano, caso_base):
+    """Similaridade global de um caso da base segundo um plano preparado (média ponderada)."""
+    if not plano or not caso_base:
+        return 0.0
+    # `sum()` sobre a lista, como a versão original: a partir do Python 3.12 a soma é
+    # compensada, e os caminhos vetorizados reproduzem a regra (`base_colunar.acumular_soma`)
+    similaridades_ponderadas = []
+    pesos_efetivamente_usados = 0.0
+    canonico = None
+    for chave, peso, posicao, calcular in plano:
+        # Numéricos exigem valor não nulo; os demais, apenas a presença do atributo no caso
+        # (a forma canônica é None só quando o atributo não existe)
+        if posicao is None:
+            valor_base = caso_base.get(chave)
+        else:
+            if canonico is None:
+                canonico = forma_canonica(caso_base)
+            valor_base = canonico[posicao]
+        if valor_base is None:
+            continue
+        similaridades_ponderadas.append(calcular(valor_base) * peso)
+        pesos_efetivamente_usados += peso
+
+    if pesos_efetivamente_usados == 0:
+        # Nenhum atributo com peso > 0 do caso de entrada existe no caso da base
+        return 0.0
+    return sum(similaridades_ponderadas) / pesos_efetivamente_usados
+
+
+def calcular_similaridade_global(caso_novo, caso_base, pesos):
+    """Calcula a similaridade global entre dois casos usando média ponderada.
+
+    Para comparar o mesmo caso de entrada com vários casos, use
+    `calcular_similaridades_globais` (o plano é preparado uma única vez).
+    """
+    return aplicar_plano_similaridade(preparar_plano_similaridade(caso_novo, pesos), caso_base)
+
+
+def calcular_similaridades_globais(caso_novo, casos_base, pesos):
+    """Similaridade global do caso de entrada com cada caso de `casos_base` (mesma ordem)."""
+    plano = preparar_plano_similaridade(caso_novo, pesos)
+    return [aplicar_plano_similaridade(plano, caso_base) for caso_base in casos_base]
@@ -0,0 +1,259 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from filme import Filme
+
+# --- Snapshot Binário da Base de Casos ---
+# Depois de um carregamento bem-sucedido do CSV, a base já convertida é gravada ao lado
+# do arquivo (ex: "filmes_base_novo.csv.snapshot"). Nas próximas execuções, se o CSV
+# não mudou (mesmo tamanho, mtime e hash do conteúdo), os casos são reconstruídos a
+# partir do snapshot (mapeado em memória), sem passar pelo csv.DictReader nem pelas
+# funções de conversão. Snapshot desatualizado, de outra versão ou corrompido (o
+# cabeçalho guarda o hash dos blocos de dados) é simplesmente ignorado e o CSV é lido
+# normalmente.
+#
+# Formato (little-endian):
+#   MAGIC (8 bytes) | versão (uint32) | tamanho do cabeçalho (uint32) | cabeçalho JSON
+#   | blocos de dados alinhados em 64 bytes (arrays NumPy descritos no cabeçalho)
+#
+# Strings ficam em uma única tabela (bytes UTF-8 + offsets); colunas de texto guardam
+# o id da string (-1 para None) e colunas de lista usam o formato CSR (offsets + ids).
+
+MAGIC_SNAPSHOT = b"RBCSNAP\0"
+VERSAO_SNAPSHOT = 5  # Incrementar sempre que o formato ou a conversão do CSV mudar
+# Versões: 1 = casos como dicionários com listas; 2 = registros Filme com tuplas de nomes;
+#   3 = valores canonicalizados na conversão;
+#   4 = novos conversores de duração e de valores brutos;
+#   5 = hash dos blocos de dados no cabeçalho
+EXTENSAO_SNAPSHOT = ".snapshot"
+_AUSENTE = object()
+ALINHAMENTO = 64
+TAMANHO_LEITURA_HASH = 1 << 20
+
+# Colunas do caso (na ordem de `carregar_base_de_casos_csv`) e seu tipo de armazenamento
+COLUNAS_SNAPSHOT = (
+    ("id", "texto"), ("titulo", "texto"), ("link", "texto"),
+    ("ano_lancamento", "int"), ("duracao_minutos", "int"),
+    ("classificacao_etaria", "texto"), ("avaliacao_critica", "float"),
+    ("votos", "int"), ("orcamento", "float"), ("bilheteria_mundial", "float"),
+    ("diretores", "lista"), ("roteiristas", "lista"), ("estrelas", "lista"),
+    ("generos", "lista"), ("pais_origem", "lista"), ("idioma", "lista"),
+    ("vitorias", "int"), ("indicacoes", "int"), ("oscars_indicados", "int"),
+    ("gross_us_canada", "texto"), ("gross_opening_weekend", "texto"),
+    ("filming_location", "lista"), ("production_company", "lista"),
+)
+
+
+def caminho_snapshot(caminho_csv):
+    """Caminho do snapshot correspondente a um arquivo CSV."""
+    return caminho_csv + EXTENSAO_SNAPSHOT
+
+
+def chave_arquivo(caminho_csv):
+    """Identificação do conteúdo do CSV: tamanho, mtime e hash (BLAKE2b) dos bytes."""
+    info = os.stat(caminho_csv)
+    hash_conteudo = _novo_hash()
+    with open(caminho_csv, "rb") as arquivo:
+        for bloco in iter(lambda: arquivo.read(TAMANHO_LEITURA_HASH), b""):
+            hash_conteudo.update(bloco)
+    return {"tamanho": info.st_size, "mtime_ns": info.st_mtime_ns, "hash": hash_conteudo.hexdigest()}
+
+
+def _novo_hash():
+    return hashlib.blake2b(digest_size=20)
+
+
+class _TabelaStrings:
+    """Tabela de strings distintas usada na serialização."""
+
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+
+    def id(self, valor):
+        if valor is None:
+            return -1
+        if not isinstance(valor, str):
+            raise TypeError(f"valor de texto inesperado: {valor!r}")
+        id_string = self.ids.get(valor)
+        if id_string is None:
+            id_string = self.ids[valor] = len(self.strings)
+            self.strings.append(valor)
+        return id_string
+
+
+def colunas_para_arrays(casos):
+    """Converte a lista de casos em arrays NumPy (um dicionário nome -> array)."""
+    n = len(casos)
+    tabela = _TabelaStrings()
+    arrays = {}
+    for nome, tipo in COLUNAS_SNAPSHOT:
+        valores = [caso.get(nome, _AUSENTE) for caso in casos]
+        if any(valor is _AUSENTE for valor in valores):
+            # O snapshot não distingue campo ausente de None (ex: 'classificacao_etaria')
+            raise TypeError(f"caso sem o campo '{nome}'")
+        if tipo in ("int", "float"):
+            python_tipo, dtype = (int, np.int64) if tipo == "int" else (float, np.float64)
+            for valor in valores:
+                if valor is not None and type(valor) is not python_tipo:
+                    raise TypeError(f"valor inesperado em '{nome}': {valor!r}")
+            arrays[nome + ".presente"] = np.fromiter((v is not None for v in valores), dtype=np.bool_, count=n)
+            arrays[nome + ".valores"] = np.array([v if v is not None else 0 for v in valores], dtype=dtype)
+        elif tipo == "texto":
+            arrays[nome + ".ids"] = np.fromiter((tabela.id(v) for v in valores), dtype=np.int32, count=n)
+        else:
+            offsets = np.zeros(n + 1, dtype=np.int64)
+            ids = []
+            for i, lista in enumerate(valores):
+                if not isinstance(lista, (list, tuple)):
+                    raise TypeError(f"lista inesperada em '{nome}': {lista!r}")
+                ids.extend(tabela.id(v) for v in lista)
+                offsets[i + 1] = len(ids)
+            arrays[nome + ".offsets"] = offsets
+            arrays[nome + ".ids"] = np.array(ids, dtype=np.int32)
+
+    codificadas = [s.encode("utf-8") for s in tabela.strings]
+    offsets_strings = np.zeros(len(codificadas) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in codificadas], out=offsets_strings[1:])
+    arrays["strings.bytes"] = np.frombuffer(b"".join(codificadas), dtype=np.uint8)
+    arrays["strings.offsets"] = offsets_strings
+    return arrays
+
+
+def salvar_snapshot(caminho_csv, casos, destino=None, extras=None):
+    """Grava o snapshot binário da base de casos ao lado do CSV (escrita atômica).
+
+    `destino` troca o arquivo gravado (padrão: `caminho_snapshot(caminho_csv)`) e `extras`
+    acrescenta campos ao cabeçalho (ex: o trecho do log de retenção já incorporado).
+    """
+    arrays = colunas_para_arrays(casos)
+    descricao = {}
+    offset = 0
+    hash_dados = _novo_hash()
+    for nome, array in arrays.items():
+        inicio = (offset + ALINHAMENTO - 1) // ALINHAMENTO * ALINHAMENTO
+        hash_dados.update(bytes(inicio - offset))  # Preenchimento do alinhamento (zeros no arquivo)
+        hash_dados.update(array.tobytes())
+        descricao[nome] = {"dtype": array.dtype.str, "offset": inicio, "count": len(array)}
+        offset = inicio + array.nbytes
+    cabecalho = json.dumps({"csv": chave_arquivo(caminho_csv), "n": len(casos),
+                            "arrays": descricao, "tamanho_dados": offset, "hash_dados": hash_dados.hexdigest(),
+                            **(extras or {})}).encode("utf-8")
+    inicio_dados = len(MAGIC_SNAPSHOT) + 8 + len(cabecalho)
+    inicio_dados = (inicio_dados + ALINHAMENTO - 1) // ALINHAMENTO * ALINHAMENTO
+
+    destino = destino or caminho_snapshot(caminho_csv)
+    temporario = destino + ".tmp"
+    with open(temporario, "wb") as arquivo:
+        arquivo.write(MAGIC_SNAPSHOT)
+        arquivo.write(struct.pack("<II", VERSAO_SNAPSHOT, len(cabecalho)))
+        arquivo.write(cabecalho)
+        for nome, array in arrays.items():
+            arquivo.seek(inicio_dados + descricao[nome]["offset"])
+            arquivo.write(array.tobytes())
+        arquivo.truncate(inicio_dados + offset)
+    os.replace(temporario, destino)
+
+
+def _ler_cabecalho(mapa):
+    """Valida o início do snapshot e retorna (cabeçalho, início dos dados); None se inválido."""
+    tamanho_fixo = len(MAGIC_SNAPSHOT) + 8
+    if len(mapa) < tamanho_fixo or mapa[:len(MAGIC_SNAPSHOT)] != MAGIC_SNAPSHOT:
+        return None
+    versao, tamanho_cabecalho = struct.unpack_from("<II", mapa, len(MAGIC_SNAPSHOT))
+    if versao != VERSAO_SNAPSHOT or tamanho_fixo + tamanho_cabecalho > len(mapa):
+        return None
+    cabecalho = json.loads(bytes(mapa[tamanho_fixo:tamanho_fixo + tamanho_cabecalho]).decode("utf-8"))
+    inicio_dados = (tamanho_fixo + tamanho_cabecalho + ALINHAMENTO - 1) // ALINHAMENTO * ALINHAMENTO
+    if inicio_dados + cabecalho["tamanho_dados"] > len(mapa):
+        return None
+    return cabecalho, inicio_dados
+
+
+def _dados_integros(mapa, cabecalho, inicio_dados):
+    """Confere o hash dos blocos de dados com o gravado no cabeçalho."""
+    hash_dados = _novo_hash()
+    fim = inicio_dados + cabecalho["tamanho_dados"]
+    for inicio in range(inicio_dados, fim, TAMANHO_LEITURA_HASH):
+        hash_dados.update(mapa[inicio:min(fim, inicio + TAMANHO_LEITURA_HASH)])
+    return hash_dados.hexdigest() == cabecalho["hash_dados"]
+
+
+def _arrays_do_mapa(mapa, cabecalho, inicio_dados):
+    """Cria views NumPy (sem cópia) sobre o snapshot mapeado em memória."""
+    return {nome: np.frombuffer(mapa, dtype=np.dtype(d["dtype"]), count=d["count"],
+                                offset=inicio_dados + d["offset"])
+            for nome, d in cabecalho["arrays"].items()}
+
+
+def casos_dos_arrays(arrays, n):
+    """Reconstrói a lista de casos (Filme) a partir das colunas do snapshot.
+
+    Cada string distinta é decodificada uma única vez e compartilhada entre os filmes.
+    """
+    dados_strings = arrays["strings.bytes"].tobytes()
+    offsets_strings = arrays["strings.offsets"].tolist()
+    strings = [dados_strings[offsets_strings[i]:offsets_strings[i + 1]].decode("utf-8")
+               for i in range(len(offsets_strings) - 1)]
+
+    colunas = []
+    for nome, tipo in COLUNAS_SNAPSHOT:
+        if tipo in ("int", "float"):
+            presentes = arrays[nome + ".presente"].tolist()
+            valores = arrays[nome + ".valores"].tolist()
+            colunas.append([v if p else None for v, p in zip(valores, presentes)])
+        elif tipo == "texto":
+            colunas.append([strings[i] if i >= 0 else None for i in arrays[nome + ".ids"].tolist()])
+        else:
+            offsets = arrays[nome + ".offsets"].tolist()
+            ids = arrays[nome + ".ids"].tolist()
+            itens = [strings[i] for i in ids]
+            colunas.append([tuple(itens[offsets[i]:offsets[i + 1]]) for i in range(n)])
+
+    # COLUNAS_SNAPSHOT segue a mesma ordem de CAMPOS_FILME
+    return [Filme(*valores) for valores in zip(*colunas)]
+
+
+def carregar_snapshot(caminho_csv, destino=None, validar=None):
+    """Carrega os casos do snapshot se ele corresponder ao CSV atual; caso contrário retorna None.
+
+    `destino` troca o arquivo lido (padrão: `caminho_snapshot(caminho_csv)`); `validar`, se
+    informado, recebe o cabeçalho e pode recusar o snapshot retornando False.
+    """
+    destino = destino or caminho_snapshot(caminho_csv)
+    if not os.path.exists(destino):
+        return None
+    try:
+        with open(destino, "rb") as arquivo:
+            with mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+                lido = _ler_cabecalho(mapa)
+                if lido is None:
+                    return None
+                cabecalho, inicio_dados = lido
+                # Verificação rápida (tamanho/mtime) antes de calcular o hash do CSV
+                info = os.stat(caminho_csv)
+                esperado = cabecalho["csv"]
+                if info.st_size != esperado["tamanho"] or info.st_mtime_ns != esperado["mtime_ns"]:
+                    return None
+                if chave_arquivo(caminho_csv) != esperado:
+                    return None
+                if validar is not None and not validar(cabecalho):
+                    return None
+                if not _dados_integros(mapa, cabecalho, inicio_dados):
+                    return None
+                arrays = _arrays_do_mapa(mapa, cabecalho, inicio_dados)
+                try:
+                    return casos_dos_arrays(arrays, cabecalho["n"])
+                finally:
+                    # Libera as views antes de fechar o mapa, inclusive se a decodificação falhar:
+                    # o traceback ainda referencia o dicionário, e views exportadas fariam o
+                    # fechamento levantar BufferError
+                    arrays.clear()
+    except (OSError, ValueError, KeyError, TypeError, IndexError, BufferError, struct.error,
+            UnicodeDecodeError):
+        return None  # Snapshot corrompido: volta para o CSV
@@ -0,0 +1,116 @@
+import json
+
+import numpy as np
+import pytest
+
+from avaliacao_pesos import BlocosSimilaridade, main, sortear_consultas
+from base_colunar import BaseColunar, ORDEM_ATRIBUTOS
+from catalogo_sintetico import gerar_catalogo_csv
+from conftest import SEMENTE
+from recuperacao import recuperar_indices_top_k
+from similaridade import PESOS_PADRAO, calcular_similaridade_global
+
+# --- Ajuste de Pesos por Leave-One-Out ---
+# Em float64, as similaridades recombinadas dos blocos são as mesmas da busca. A nota de
+# `avaliar` é conferida contra uma versão direta (vizinhos sem a própria consulta e sem
+# os casos removidos, empates pela posição na base como na busca, similaridade no alvo
+# por `calcular_similaridade_global`).
+
+CONSULTAS = 50
+K = 5  # Vizinhos da nota leave-one-out
+ALVO = "avaliacao_critica"
+
+
+def test_similaridades_iguais_a_busca(casos):
+    base = BaseColunar(list(casos))
+    consultas = sortear_consultas(base, CONSULTAS, ALVO, SEMENTE)
+    blocos = BlocosSimilaridade.calcular(base, consultas, dtype=np.float64)
+    for pesos in (PESOS_PADRAO, {"estrelas": 0.6, "diretores": 0.2, "duracao_minutos": 0.2}):
+        similaridades = blocos.similaridades(pesos)
+        for linha, posicao in enumerate(consultas):
+            indices, esperadas = recuperar_indices_top_k(base.casos[posicao], pesos, K, base=base)
+            assert similaridades[linha, indices].tolist() == esperadas.tolist()
+            assert np.sort(similaridades[linha])[::-1][:K].tolist() == esperadas.tolist()
+
+
+def _nota_direta(base, consultas, similaridades, k):
+    """Nota por força bruta: (nota, consultas avaliadas, consultas com empate na fronteira dos k vizinhos).
+
+    O sorted é estável: empates ficam na ordem da posição na base, como na busca.
+    """
+    notas = []
+    empates = 0
+    for linha, posicao in enumerate(consultas):
+        candidatos = [i for i in base.indices_ativos() if base.casos[i] and i != posicao]
+        ordenados = sorted(candidatos, key=lambda i: -similaridades[linha, i])
+        empates += similaridades[linha, ordenados[k - 1]] == similaridades[linha, ordenados[k]]
+        consulta = {ALVO: base.casos[posicao][ALVO]}
+        vizinhos = [i for i in ordenados[:k] if base.casos[i].get(ALVO) is not None]
+        if vizinhos:
+            notas.append(sum(calcular_similaridade_global(consulta, base.casos[i], {ALVO: 1.0})
+                             for i in vizinhos) / len(vizinhos))
+    return sum(notas) / len(notas), len(notas), empates
+
+
+def test_avaliar_ignora_a_consulta_e_os_removidos(casos):
+    base = BaseColunar(list(casos))  # `remover` altera a lista da base
+    pesos = {"generos": 0.5, "estrelas": 0.3, "ano_lancamento": 0.2}
+    consultas = sortear_consultas(base, CONSULTAS, ALVO, SEMENTE)
+    antes = BlocosSimilaridade.calcular(base, consultas, dtype=np.float64).similaridades(pesos)
+    # Remove o vizinho mais próximo (fora a própria consulta) das primeiras consultas
+    removidos = set()
+    for linha, posicao in enumerate(consultas[:10]):
+        sims = antes[linha].copy()
+        sims[posicao] = -np.inf
+        removidos.add(int(np.argmax(sims)))
+    for indice in sorted(removidos - set(consultas.tolist())):
+        base.remover(indice)
+    assert not base.ativo.all()
+
+    blocos = BlocosSimilaridade.calcular(base, sortear_consultas(base, CONSULTAS, ALVO, SEMENTE), dtype=np.float64)
+    # Atributos com poucos valores distintos: muitas consultas empatam na fronteira dos k vizinhos
+    com_empates = {"classificacao_etaria": 0.6, "ano_lancamento": 0.4}
+    for pesos_avaliados in (pesos, com_empates):
+        nota, consultas_avaliadas, empates = _nota_direta(base, blocos.consultas,
+                                                          blocos.similaridades(pesos_avaliados), K)
+        avaliacao = blocos.avaliar(dict(pesos_avaliados, **{ALVO: 0.4}), ALVO, K)  # O peso do alvo é ignorado
+        assert avaliacao["consultas"] == consultas_avaliadas
+        assert avaliacao["nota"] == pytest.approx(nota, rel=1e-12)
+    assert empates > CONSULTAS // 2
+
+
+def test_sem_atributos_usados_nao_tem_nota(casos):
+    base = BaseColunar(list(casos))
+    blocos = BlocosSimilaridade.calcular(base, sortear_consultas(base, CONSULTAS, ALVO, SEMENTE))
+    assert blocos.avaliar({atributo: 0.0 for atributo in ORDEM_ATRIBUTOS}, ALVO, K) == {"nota": None, "consultas": 0}
+    assert blocos.avaliar({ALVO: 1.0}, ALVO, K) == {"nota": None, "consultas": 0}
+    assert blocos.avaliar(PESOS_PADRAO, ALVO, K)["nota"] is not None
+
+
+def test_linha_de_comando_recalcula_blocos_de_outra_origem(tmp_path, capsys):
+    caminho_csv = str(tmp_path / "catalogo.csv")
+    gerar_catalogo_csv(caminho_csv, 120, SEMENTE)
+
+    def executar(pasta, *extras):
+        saida = str(tmp_path / "resultado.json")
+        main(["--csv", caminho_csv, "--pasta", str(tmp_path / pasta), "--saida", saida,
+              "--consultas", "20", "--candidatos", "2", "--float64", *extras])
+        with open(saida, encoding="utf-8") as arquivo:
+            resultados = json.load(arquivo)["resultados"]
+        return capsys.readouterr().err, resultados
+
+    _, resultados = executar("blocos")
+    mensagens, reabertos = executar("blocos")
+    assert "reabertos" in mensagens and reabertos == resultados
+
+    # Outra semente (consultas e candidatos diferentes): os blocos da pasta não servem
+    mensagens, recalculados = executar("blocos", "--semente", "5")
+    assert "recalculando" in mensagens
+    assert recalculados == executar("nova_semente", "--semente", "5")[1]
+
+    # CSV editado com os mesmos parâmetros
+    gerar_catalogo_csv(caminho_csv, 130, SEMENTE)
+    mensagens, recalculados = executar("blocos", "--semente", "5")
+    assert "recalculando" in mensagens
+    assert recalculados == executar("novo_csv", "--semente", "5")[1]
+    assert "reabertos" in executar("blocos", "--semente", "5")[0]
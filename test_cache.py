@@ -0,0 +1,129 @@
+import pytest
+
+from base_colunar import BaseColunar
+from base_de_casos import BaseDeCasos
+from catalogo_sintetico import gerar_linhas
+from conftest import K, SEMENTE, top_k
+from ingestao import converter_linha_csv
+from recuperacao import CacheRecuperacao, recuperar_top_k
+from similaridade import PESOS_PADRAO, calcular_similaridade_global
+
+# --- Cache LRU de Resultados ---
+# Contadores de acertos, falhas e remoções, e invalidação quando a base muda de versão
+# (retenção): um resultado guardado nunca pode ser devolvido para uma base alterada.
+
+
+@pytest.fixture
+def base(casos):
+    return BaseColunar(list(casos))
+
+
+def test_acertos_falhas_e_remocoes(base):
+    cache = CacheRecuperacao(capacidade=2)
+    a, b, c = (dict(base.casos[i]) for i in (0, 1, 2))
+
+    primeiro = cache.recuperar_top_k(a, PESOS_PADRAO, K, base=base)
+    assert top_k(primeiro) == top_k(recuperar_top_k(a, PESOS_PADRAO, K, base=base))
+    # Mesma consulta com listas em outra ordem e pesos em outro dicionário: mesma chave
+    equivalente = dict(a, generos=list(reversed(a["generos"])))
+    assert top_k(cache.recuperar_top_k(equivalente, dict(PESOS_PADRAO), K, base=base)) == top_k(primeiro)
+    assert (cache.acertos, cache.falhas, cache.remocoes) == (1, 1, 0)
+
+    cache.recuperar_top_k(b, PESOS_PADRAO, K, base=base)
+    cache.recuperar_top_k(a, PESOS_PADRAO, K, base=base)  # 'a' passa a ser a mais recente
+    cache.recuperar_top_k(c, PESOS_PADRAO, K, base=base)  # Descarta 'b'
+    assert (cache.acertos, cache.falhas, cache.remocoes, len(cache)) == (2, 3, 1, 2)
+    cache.recuperar_top_k(a, PESOS_PADRAO, K, base=base)
+    cache.recuperar_top_k(b, PESOS_PADRAO, K, base=base)
+    assert (cache.acertos, cache.falhas, cache.remocoes) == (3, 4, 2)
+
+    # k e min_sim fazem parte da chave
+    cache.recuperar_top_k(a, PESOS_PADRAO, K + 1, base=base)
+    cache.recuperar_top_k(a, PESOS_PADRAO, K, min_sim=0.5, base=base)
+    assert cache.falhas == 6
+    estatisticas = cache.estatisticas()
+    assert estatisticas["taxa_acerto"] == 3 / 9
+    assert estatisticas["invalidacoes"] == 0
+
+
+def test_invalidado_quando_a_base_muda(casos, base):
+    cache = CacheRecuperacao()
+    consulta = dict(base.casos[3])
+
+    def conferir():
+        obtido = top_k(cache.recuperar_top_k(consulta, PESOS_PADRAO, K, base=base))
+        assert obtido == top_k(recuperar_top_k(consulta, PESOS_PADRAO, K, base=base))
+        return obtido
+
+    antes = conferir()
+    # Remover o caso mais similar
+    base.remover(3)
+    depois = conferir()
+    assert depois != antes and cache.invalidacoes == 1
+    # Adicionar um filme idêntico à consulta
+    consulta = converter_linha_csv(dict(next(gerar_linhas(1, SEMENTE + 1)), id="novo"))
+    conferir()
+    base.adicionar(consulta)
+    # 1.0 a menos do arredondamento (no Python 3.12+, o `sum()` compensado dá 0.9999999999999998)
+    assert conferir()[0] == ("novo", calcular_similaridade_global(consulta, base.casos[-1], PESOS_PADRAO))
+    # Atualizar o filme: ele deixa de ser idêntico
+    base.atualizar(base.n - 1, converter_linha_csv(dict(next(gerar_linhas(1, SEMENTE + 2)), id="novo")))
+    assert conferir()[0] != ("novo", 1.0)
+    assert cache.invalidacoes == 3
+
+    # Outra base (mesmo conteúdo) também não reaproveita as entradas
+    outra = BaseColunar(list(casos))
+    cache.recuperar_top_k(consulta, PESOS_PADRAO, K, base=outra)
+    assert cache.invalidacoes == 4
+
+
+def test_cache_da_base_de_casos_apos_retencao(casos):
+    base = BaseDeCasos.a_partir_de_casos(list(casos))
+    consulta = dict(casos[10])
+    antes = top_k(base.recuperar_top_k(consulta, PESOS_PADRAO, K))
+    base.remover_caso(consulta["id"])
+    depois = top_k(base.recuperar_top_k(consulta, PESOS_PADRAO, K))
+    assert consulta["id"] not in [id_caso for id_caso, _ in depois]
+    assert depois != antes
+    assert depois == top_k(recuperar_top_k(consulta, PESOS_PADRAO, K, base=base.colunar))
+
+
+def test_acertos_nao_podem_ser_alterados(base):
+    cache = CacheRecuperacao()
+    consulta = base.casos[3]
+    calculados = cache.recuperar_indices_top_k(consulta, PESOS_PADRAO, K, base=base)
+    guardados = cache.recuperar_indices_top_k(consulta, PESOS_PADRAO, K, base=base)
+    assert cache.acertos == 1
+    for array in calculados + guardados:
+        with pytest.raises(ValueError):
+            array[0] = 0
+
+
+class CacheComRemocaoConcorrente(CacheRecuperacao):
+    """Remove o primeiro caso do resultado logo depois da busca (como outra thread faria)."""
+
+    def __init__(self, base):
+        super().__init__()
+        self.base_alterada = base
+        self.remover = True
+
+    def recuperar_indices_top_k(self, *argumentos, **opcoes):
+        indices, similaridades = super().recuperar_indices_top_k(*argumentos, **opcoes)
+        if self.remover:
+            self.remover = False
+            self.base_alterada.remover(int(indices[0]))
+        return indices, similaridades
+
+
+def test_casos_lidos_na_versao_dos_indices(base):
+    cache = CacheComRemocaoConcorrente(base)
+    consulta = dict(base.casos[3])
+    # Remoção depois de uma falha (índices recém-calculados) e depois de um acerto (o segundo
+    # acerto: o primeiro é o da consulta no fim da volta anterior)
+    for acertos in (0, 2):
+        cache.remover = True
+        resultado = cache.recuperar_top_k(consulta, PESOS_PADRAO, K, base=base)
+        assert cache.acertos == acertos and not cache.remover
+        assert all(item["caso"] is not None for item in resultado)
+        assert top_k(resultado) == top_k(recuperar_top_k(consulta, PESOS_PADRAO, K, base=base))
+        cache.recuperar_top_k(consulta, PESOS_PADRAO, K, base=base)
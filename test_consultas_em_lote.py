@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+import consultas_em_lote
+from base_de_casos import BaseDeCasos
+from catalogo_sintetico import gerar_catalogo_csv
+from conftest import top_k
+from similaridade import PESOS_PADRAO
+
+# --- Consultas em Lote ---
+# JSONL de entrada com consultas válidas, inválidas e linhas em branco: a saída tem uma
+# linha por consulta, na ordem de entrada (também com --paralelo), e uma linha inválida
+# vira um registro de erro sem interromper o lote.
+
+TAMANHO_CATALOGO = 300
+SEMENTE = 23
+CONSULTAS_VALIDAS = 40
+
+
+@pytest.fixture(scope="module")
+def arquivos(tmp_path_factory):
+    pasta = tmp_path_factory.mktemp("lote")
+    caminho_csv = gerar_catalogo_csv(str(pasta / "filmes.csv"), TAMANHO_CATALOGO, SEMENTE)
+    base = BaseDeCasos(caminho_csv, usar_exemplos=False)
+    linhas = []
+    for i in range(CONSULTAS_VALIDAS):
+        caso = base[i * 7 % TAMANHO_CATALOGO]
+        consulta = {"generos": list(caso["generos"]), "estrelas": list(caso["estrelas"])}
+        if i % 2:
+            linhas.append(json.dumps(consulta))  # Só o caso, com o k padrão
+        else:
+            linhas.append(json.dumps({"caso": consulta, "pesos": {"estrelas": 0.5}, "k": 3, "id": f"c{i}"}))
+        if i == 5:
+            linhas.append("{nao e json")
+        elif i == 10:
+            linhas.append(json.dumps({"caso": consulta, "k": 0, "id": "k-invalido"}))
+        elif i == 20:
+            linhas.append("")
+            linhas.append(json.dumps({"caso": consulta, "pesos": {"generos": -1}}))
+    caminho_consultas = pasta / "consultas.jsonl"
+    caminho_consultas.write_text("\n".join(linhas) + "\n", encoding="utf-8")
+    return caminho_csv, str(caminho_consultas), linhas
+
+
+def _esperado(caminho_csv, linhas, k_padrao):
+    base = BaseDeCasos(caminho_csv, usar_exemplos=False)
+    esperado = []
+    for numero, linha in enumerate(linhas, 1):
+        if not linha:
+            continue
+        try:
+            dados = json.loads(linha)
+        except ValueError:
+            esperado.append((numero, None, None))
+            continue
+        if "caso" not in dados:
+            dados = {"caso": dados}
+        if dados.get("k", k_padrao) < 1 or any(p < 0 for p in dados.get("pesos", {}).values()):
+            esperado.append((numero, dados.get("id"), None))
+            continue
+        resultados = base.recuperar_top_k(dados["caso"], dict(PESOS_PADRAO, **dados.get("pesos", {})),
+                                          dados.get("k", k_padrao))
+        esperado.append((numero, dados.get("id"), top_k(resultados)))
+    return esperado
+
+
+@pytest.mark.parametrize("paralelo", [1, 4])
+def test_ordem_mantida_e_erros_nao_interrompem(arquivos, capsys, paralelo):
+    caminho_csv, caminho_consultas, linhas = arquivos
+    consultas_em_lote.main([caminho_consultas, "--csv", caminho_csv, "-k", "4", "--paralelo", str(paralelo)])
+    saida = capsys.readouterr().out.splitlines()
+    registros = [json.loads(linha) for linha in saida]
+
+    obtido = [(r["linha"], r.get("id"),
+               None if "erro" in r else [(item["id"], item["similaridade"]) for item in r["resultados"]])
+              for r in registros]
+    assert obtido == _esperado(caminho_csv, linhas, 4)
+    erros = [r for r in registros if "erro" in r]
+    assert len(erros) == 3
+    assert erros[1]["id"] == "k-invalido" and "'k'" in erros[1]["erro"]
+    assert len(registros) == CONSULTAS_VALIDAS + 3
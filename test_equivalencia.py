@@ -0,0 +1,324 @@
+import math
+import random
+import sys
+
+import pytest
+
+import base_colunar
+import recuperacao
+import similaridade
+from base_colunar import BaseColunar, ORDEM_ATRIBUTOS, calcular_similaridade_vetorizada
+from base_de_casos import CASOS_DE_EXEMPLO
+from catalogo_sintetico import gerar_linhas
+from conftest import K
+from filme import como_registro
+from indices import MAX_BITS_BITMASK
+from ingestao import converter_linha_csv
+from recuperacao import (
+    CacheSimilaridadesLocais, RecuperacaoLSH, RecuperacaoPorFaixas, recuperar_em_lote, recuperar_top_k,
+)
+from similaridade import PESOS_PADRAO, calcular_similaridade_global, canonizar_casos
+
+# --- Equivalência com a Similaridade Par a Par ---
+# Todos os caminhos de recuperação (poda, lote em tiles, faixas ordenadas, reordenação
+# por pesos) prometem o mesmo resultado da ordenação completa da base por
+# `calcular_similaridade_global`: os mesmos casos, na mesma ordem (empates pela posição
+# na base) e com similaridades idênticas, não só próximas. Base: CASOS_DE_EXEMPLO mais
+# um catálogo sintético com semente fixa.
+
+TAMANHO_CATALOGO = 1500
+SEMENTE = 7
+
+
+def _consultas(casos):
+    rng = random.Random(SEMENTE)
+    consultas = [dict(casos[i]) for i in rng.sample(range(len(casos)), 6)]
+    consultas += [
+        {"generos": ["Drama", "Crime"], "ano_lancamento": 1975},
+        {"estrelas": ["Al Pacino", "Nome Que Não Existe"], "classificacao_etaria": "pg 13"},
+        {"classificacao_etaria": "Sem Classificação Conhecida", "duracao_minutos": 95, "votos": 10 ** 9},
+        {"avaliacao_critica": 7.5, "orcamento": 2e7, "idioma": []},
+        {"generos": "Comedy", "diretores": [casos[5].get("diretores")[0]] if casos[5].get("diretores") else []},
+    ]
+    return consultas
+
+
+def _vetores_de_pesos():
+    rng = random.Random(SEMENTE)
+    vetores = [dict(PESOS_PADRAO), {"estrelas": 0.6, "diretores": 0.2, "roteiristas": 0.2},
+               {"avaliacao_critica": 1.0, "ano_lancamento": 0.5}]
+    vetores += [{atributo: rng.choice((0.0, 0.0, 0.05, 0.1, 0.3, 1.0)) for atributo in ORDEM_ATRIBUTOS}
+                for _ in range(3)]
+    # Peso NaN: fica de fora, como na comparação `> 0` da função par a par
+    vetores.append(dict(PESOS_PADRAO, estrelas=float("nan"), ano_lancamento=float("nan")))
+    return vetores
+
+
+def _esperado(caso, casos, pesos, k, min_sim=None):
+    """Top-k da ordenação completa por `calcular_similaridade_global` (casos removidos são None)."""
+    pontuados = [(calcular_similaridade_global(caso, c, pesos), i) for i, c in enumerate(casos) if c is not None]
+    if min_sim is not None:
+        pontuados = [(s, i) for s, i in pontuados if s >= min_sim]
+    pontuados.sort(key=lambda item: (-item[0], item[1]))
+    return [(i, s) for s, i in pontuados[:k]]
+
+
+def _obtido(resultado, casos):
+    posicoes = {id(c): i for i, c in enumerate(casos) if c is not None}
+    return [(posicoes[id(item["caso"])], item["similaridade"]) for item in resultado]
+
+
+# Similaridades da versão original de `calcular_similaridade_global` (main.py do commit
+# inicial) para CASOS_DE_EXEMPLO, na ordem da lista. O ano fica de fora dos pesos porque
+# MAX_ANO depende do ano corrente. Protege contra regressões comuns a todos os caminhos.
+PESOS_REFERENCIA = (
+    {atributo: peso for atributo, peso in PESOS_PADRAO.items() if atributo != "ano_lancamento"},
+    {"estrelas": 0.6, "diretores": 0.2, "roteiristas": 0.2, "classificacao_etaria": 0.3, "generos": 0.1},
+)
+CONSULTAS_REFERENCIA = (
+    {"generos": ["Drama", "Crime"], "classificacao_etaria": "PG-13", "avaliacao_critica": 8.0,
+     "duracao_minutos": 150},
+    {"estrelas": ["Al Pacino", "Tom Hanks"], "roteiristas": ["Francis Ford Coppola"],
+     "classificacao_etaria": "pg 13", "votos": 10 ** 6},
+    {"generos": ["Action"], "idioma": [], "orcamento": 5e7, "bilheteria_mundial": 4e8, "vitorias": 35,
+     "indicacoes": 45, "oscars_indicados": 2, "pais_origem": ["USA", "UK"]},
+)
+SIMILARIDADES_REFERENCIA = (
+    ((0.5430455840455841, 0.92397150997151, 0.48852136752136754),
+     (0.4042735042735043, 0.5764957264957263, 0.48012820512820503),
+     (0.6653951025416536, 0.40438001858328926, 0.4121480747083132)),
+    ((0.6346153846153846, 0.8846153846153845, 0.46153846153846156),
+     (0.23076923076923073, 0.458041958041958, 0.3496503496503496),
+     (0.5, 0.0, 0.0)),
+)
+# A mesma versão original no Python 3.12+, onde o `sum()` das similaridades ponderadas é
+# compensado: três valores mudam no último dígito
+SIMILARIDADES_REFERENCIA_PYTHON_312 = (
+    ((0.5430455840455841, 0.92397150997151, 0.48852136752136754),
+     (0.4042735042735043, 0.5764957264957264, 0.48012820512820503),
+     (0.6653951025416536, 0.40438001858328937, 0.4121480747083133)),
+    SIMILARIDADES_REFERENCIA[1],
+)
+
+
+@pytest.fixture(scope="module")
+def casos(catalogo_sintetico):
+    exemplos = [como_registro(dict(caso)) for caso in CASOS_DE_EXEMPLO]
+    canonizar_casos(exemplos)
+    return exemplos + catalogo_sintetico(TAMANHO_CATALOGO, SEMENTE)
+
+
+@pytest.fixture(scope="module")
+def base(casos):
+    return BaseColunar(list(casos))
+
+
+PARAMETROS = [(k, min_sim) for k in (1, K) for min_sim in (None, 0.5)]
+
+
+@pytest.mark.parametrize("k,min_sim", PARAMETROS)
+def test_recuperar_top_k_com_poda(casos, base, k, min_sim):
+    for pesos in _vetores_de_pesos():
+        for caso in _consultas(casos):
+            obtido = _obtido(recuperar_top_k(caso, pesos, k, min_sim, base=base), base.casos)
+            assert obtido == _esperado(caso, casos, pesos, k, min_sim)
+
+
+@pytest.mark.parametrize("k,min_sim", PARAMETROS)
+def test_recuperar_em_lote(casos, base, k, min_sim):
+    consultas = _consultas(casos)
+    for pesos in _vetores_de_pesos():
+        # Tiles pequenos para cobrir várias matrizes consultas x casos
+        for caso, resultado in zip(consultas, recuperar_em_lote(consultas, pesos, k, min_sim, base=base,
+                                                                tamanho_tile=4)):
+            assert _obtido(resultado, base.casos) == _esperado(caso, casos, pesos, k, min_sim)
+
+
+def test_lote_em_base_grande_mantem_consultas_por_tile(casos, base, monkeypatch):
+    # Base maior que o limite de elementos do tile: o tile padrão ainda junta várias consultas
+    monkeypatch.setattr(recuperacao, "LIMITE_ELEMENTOS_TILE", base.n // 2)
+    tamanhos = []
+    similaridades_do_tile = recuperacao._similaridades_do_tile
+
+    def registrar(tile, *args):
+        tamanhos.append(len(tile))
+        return similaridades_do_tile(tile, *args)
+
+    monkeypatch.setattr(recuperacao, "_similaridades_do_tile", registrar)
+    consultas = _consultas(casos)
+    for caso, resultado in zip(consultas, recuperar_em_lote(consultas, PESOS_PADRAO, K, base=base)):
+        assert _obtido(resultado, base.casos) == _esperado(caso, casos, PESOS_PADRAO, K)
+    assert tamanhos[0] == recuperacao.MIN_CONSULTAS_POR_TILE and sum(tamanhos) == len(consultas)
+
+
+@pytest.mark.parametrize("k,min_sim", PARAMETROS)
+def test_recuperacao_por_faixas(casos, base, k, min_sim):
+    faixas = RecuperacaoPorFaixas(base)
+    for pesos in _vetores_de_pesos():
+        for caso in _consultas(casos):
+            obtido = _obtido(faixas.recuperar_top_k(caso, pesos, k, min_sim), base.casos)
+            assert obtido == _esperado(caso, casos, pesos, k, min_sim)
+
+
+def test_faixas_ignoram_atributo_com_peso_nan(casos, base):
+    # Um atributo com peso NaN não conduz a expansão: o limite dos não vistos ficaria NaN
+    # e a busca nunca pararia antes de pontuar a base inteira
+    faixas = RecuperacaoPorFaixas(base)
+    consulta = {"ano_lancamento": 1994, "avaliacao_critica": 7.5, "generos": ["Drama"]}
+    pesos = {"ano_lancamento": float("nan"), "avaliacao_critica": 1.0, "generos": 0.1}
+    assert faixas.condutores(consulta, pesos) == [("avaliacao_critica", 7.5)]
+    assert _obtido(faixas.recuperar_top_k(consulta, pesos, K), base.casos) == _esperado(consulta, casos, pesos, K)
+    assert faixas.casos_visitados < base.n // 2
+
+
+@pytest.mark.parametrize("k,min_sim", PARAMETROS)
+def test_reordenacao_por_pesos(casos, base, k, min_sim):
+    similaridades_locais = CacheSimilaridadesLocais()
+    for caso in _consultas(casos):
+        # A mesma consulta com vários pesos: a partir da segunda, só recombinação
+        for pesos in _vetores_de_pesos():
+            obtido = _obtido(similaridades_locais.recuperar_top_k(caso, pesos, k, min_sim, base=base), base.casos)
+            assert obtido == _esperado(caso, casos, pesos, k, min_sim)
+    assert similaridades_locais.acertos > 0
+
+
+def test_casos_removidos_ficam_fora(casos):
+    base = BaseColunar(list(casos))
+    consultas = _consultas(casos)
+    pesos = dict(PESOS_PADRAO)
+    similaridades_locais = CacheSimilaridadesLocais()
+    for caso in consultas:
+        similaridades_locais.recuperar_top_k(caso, pesos, K, base=base)
+    for caso in consultas[:3]:
+        base.remover(_esperado(caso, base.casos, pesos, 1)[0][0])
+    for caso in consultas:
+        esperado = _esperado(caso, base.casos, pesos, K)
+        assert _obtido(recuperar_top_k(caso, pesos, K, base=base), base.casos) == esperado
+        assert _obtido(RecuperacaoPorFaixas(base).recuperar_top_k(caso, pesos, K), base.casos) == esperado
+        assert _obtido(similaridades_locais.recuperar_top_k(caso, pesos, K, base=base), base.casos) == esperado
+
+
+def test_peso_nan_e_ignorado(casos):
+    # Como na versão original (`pesos.get(k, 0) > 0`), um peso NaN não entra na média
+    pesos = {"generos": float("nan"), "ano_lancamento": 0.1}
+    consulta = {"generos": ["Drama"], "ano_lancamento": casos[0]["ano_lancamento"]}
+    assert calcular_similaridade_global(consulta, casos[0], pesos) == 1.0
+    assert calcular_similaridade_global({"generos": ["Drama"]}, casos[0], {"generos": float("nan")}) == 0.0
+
+
+def _conferir_valores_da_versao_original(referencia):
+    exemplos = [como_registro(dict(caso)) for caso in CASOS_DE_EXEMPLO]
+    canonizar_casos(exemplos)
+    base = BaseColunar(list(exemplos))
+    for pesos, esperadas_por_consulta in zip(PESOS_REFERENCIA, referencia):
+        for consulta, esperadas in zip(CONSULTAS_REFERENCIA, esperadas_por_consulta):
+            assert tuple(calcular_similaridade_global(consulta, caso, pesos) for caso in exemplos) == esperadas
+            assert tuple(calcular_similaridade_vetorizada(consulta, base, pesos).tolist()) == esperadas
+
+
+def test_valores_da_versao_original():
+    _conferir_valores_da_versao_original(
+        SIMILARIDADES_REFERENCIA_PYTHON_312 if sys.version_info >= (3, 12) else SIMILARIDADES_REFERENCIA)
+
+
+def test_lsh_sem_candidatos_usa_busca_exata(casos, base):
+    # Listas de pessoas vazias (ou sem nenhum nome em comum com a base) não geram
+    # candidatos de LSH; o resultado é o da busca exata, e não uma lista vazia
+    lsh = RecuperacaoLSH(base)
+    pesos = {"estrelas": 0.6, "diretores": 0.2, "generos": 0.2}
+    for caso in ({"estrelas": [], "generos": ["Drama"]}, {"estrelas": [], "diretores": []},
+                 {"estrelas": ["Nome Que Não Existe"], "generos": ["Comedy"]}):
+        assert _obtido(lsh.recuperar_top_k(caso, pesos, K), base.casos) == _esperado(caso, casos, pesos, K)
+
+
+@pytest.mark.parametrize("distintos", [70, 3 * MAX_BITS_BITMASK // 2])
+def test_generos_alem_das_bitmasks(distintos):
+    # Com mais gêneros que bits (excedentes) ou com bits livres nas palavras atuais
+    # (`definir` cria bits na retenção), e com valores da consulta fora do vocabulário,
+    # o resultado continua o da similaridade par a par
+    rng = random.Random(distintos)
+    vocabulario = [f"Gênero {i}" for i in range(distintos)]
+
+    def com_generos(linha, generos=None):
+        generos = rng.sample(vocabulario, rng.randint(1, 6)) if generos is None else generos
+        caso = como_registro(dict(converter_linha_csv(linha), generos=generos))
+        canonizar_casos([caso])
+        return caso
+
+    casos = [com_generos(linha) for linha in gerar_linhas(400, SEMENTE)]
+    base = BaseColunar(list(casos))
+    codificacao = base.bitmasks["generos"]
+    assert len(codificacao.bits) == min(distintos, MAX_BITS_BITMASK)
+    assert bool(codificacao.excedentes) == (distintos > MAX_BITS_BITMASK)
+
+    pesos = {"generos": 0.7, "ano_lancamento": 0.3}
+    consultas = [dict(casos[i]) for i in (0, 1, 2)]
+    consultas += [{"generos": ["Gênero Que Não Existe", vocabulario[-1]], "ano_lancamento": 1990},
+                  {"generos": ["Drama", vocabulario[0], f"Gênero {distintos}"]}]
+
+    def conferir():
+        for caso in consultas:
+            esperado = _esperado(caso, base.casos, pesos, K)
+            assert _obtido(recuperar_top_k(caso, pesos, K, base=base), base.casos) == esperado
+            assert calcular_similaridade_vetorizada(caso, base, pesos).tolist() == \
+                [calcular_similaridade_global(caso, c, pesos) if c is not None else 0.0 for c in base.casos]
+
+    conferir()
+    # Retenção com valores novos: bits livres, se houver, e depois excedentes
+    novos = [f"Gênero {i}" for i in range(distintos, distintos + 80)]
+    for j, linha in enumerate(gerar_linhas(40, SEMENTE + 1)):
+        base.adicionar(com_generos(linha, novos[2 * j:2 * j + 2] + ["Drama"]))
+    vocabulario += novos
+    for i in range(0, 60, 3):
+        base.atualizar(i, com_generos(next(gerar_linhas(1, SEMENTE + 2 + i))))
+    assert len(codificacao.bits) == min(distintos + 80, codificacao.palavras * 64, MAX_BITS_BITMASK)
+    assert codificacao.excedentes
+    consultas.append({"generos": vocabulario[-3:], "ano_lancamento": 2001})
+    conferir()
+
+
+def _soma_python_312(valores):
+    """`sum()` de floats do Python 3.12+ (soma compensada de Neumaier), em qualquer versão."""
+    soma = compensacao = 0.0
+    for valor in valores:
+        total = soma + valor
+        if abs(soma) >= abs(valor):
+            compensacao += (soma - total) + valor
+        else:
+            compensacao += (valor - total) + soma
+        soma = total
+    if compensacao and math.isfinite(compensacao):
+        soma += compensacao
+    return soma
+
+
+@pytest.mark.skipif(sys.version_info < (3, 12), reason="soma compensada só a partir do Python 3.12")
+def test_referencia_da_soma_compensada_igual_ao_sum():
+    rng = random.Random(SEMENTE)
+    for _ in range(2000):
+        valores = [rng.random() * rng.choice((1e-3, 0.1, 1.0, 7.0)) for _ in range(rng.randint(1, 16))]
+        assert _soma_python_312(valores) == sum(valores)
+
+
+@pytest.fixture
+def soma_compensada(monkeypatch):
+    """Força a soma do Python 3.12+: `sum()` na função par a par e `acumular_soma` nos caminhos vetorizados."""
+    monkeypatch.setattr(base_colunar, "SOMA_COMPENSADA", True)
+    monkeypatch.setattr(similaridade, "sum", _soma_python_312, raising=False)
+
+
+def test_valores_da_versao_original_com_soma_compensada(soma_compensada):
+    _conferir_valores_da_versao_original(SIMILARIDADES_REFERENCIA_PYTHON_312)
+
+
+def test_caminhos_vetorizados_com_soma_compensada(casos, base, soma_compensada):
+    consultas = _consultas(casos)
+    similaridades_locais = CacheSimilaridadesLocais()
+    for pesos in _vetores_de_pesos():
+        esperado = [[calcular_similaridade_global(caso, c, pesos) for c in casos] for caso in consultas]
+        assert [calcular_similaridade_vetorizada(caso, base, pesos).tolist() for caso in consultas] == esperado
+        assert recuperacao._similaridades_do_tile(consultas, base, pesos).tolist() == esperado
+        assert [similaridades_locais.similaridades(caso, pesos, base).tolist() for caso in consultas] == esperado
+        for caso, resultado in zip(consultas, recuperar_em_lote(consultas, pesos, K, base=base, tamanho_tile=4)):
+            assert _obtido(resultado, base.casos) == _esperado(caso, casos, pesos, K)
+            assert _obtido(recuperar_top_k(caso, pesos, K, base=base), base.casos) == _esperado(caso, casos, pesos, K)
@@ -0,0 +1,180 @@
+import csv
+import io
+
+import pytest
+
+import ingestao
+from base_colunar import BaseColunar
+from catalogo_sintetico import COLUNAS_CSV, gerar_catalogo_csv, gerar_linhas
+from conftest import K, top_k
+from filme import como_registro
+from ingestao import (
+    AMOSTRAS_AVISOS_POR_COLUNA, AvisosConversao, atributos_com_peso, carregar_base_colunar_em_blocos,
+    carregar_base_de_casos_csv, carregar_base_de_casos_csv_paralelo, converter_bloco, dividir_em_registros,
+    converter_linha_csv, iterar_blocos_colunares, parse_duration_to_minutes, recuperar_top_k_em_fluxo,
+)
+from recuperacao import recuperar_top_k
+from similaridade import PESOS_PADRAO, POSICAO_CANONICA, canonizar_casos, forma_canonica
+
+# --- Ingestão do CSV ---
+# Leitura paralela: a divisão do CSV em faixas de bytes só pode cortar entre registros. O
+# arquivo de teste tem, em todas as linhas, campos entre aspas com quebras de linha,
+# vírgulas e aspas escapadas, para que muitas das posições de corte caiam dentro de aspas.
+#
+# Conversão: as durações seguem a função original e as falhas de conversão saem em um
+# único resumo por carga (AvisosConversao). Os filmes convertidos (Filme) se comportam
+# como os dicionários que substituem.
+#
+# Leitura em blocos: a busca em fluxo e a base montada bloco a bloco (com projeção)
+# devem dar o mesmo top-k da base completa. Cada bloco tem o seu vocabulário de nomes,
+# então a junção recodifica as listas CSR e as classificações na base final.
+
+TAMANHO_CATALOGO = 600
+SEMENTE = 13
+TAMANHO_BLOCO = 37
+
+# Duração bruta -> minutos, como na `parse_duration_to_minutes` original (main.py do
+# commit inicial), inclusive nas respostas estranhas ("2h 30m" -> 2: o primeiro padrão
+# aceita o número inicial)
+DURACOES = {
+    "120 min": 120, "120min": 120, "120 mins": 120, "90 minutes": 90, "95": 95, "  95": 95,
+    "150.0": 150, "0": 0, "-5": -5, "2h 30m": 2, "2h": 2, "1h05m": 1, "3 h 10 m": 3, "1,5h": 1,
+    "45m": 45, "PT2H30M": 150, "PT2H": 120, "PT45M": 45, "pt1h5m": 65,
+    "PT0H0M": None, "PT": None, "PTxH": None, "h": None, "abc": None, "": None, None: None, 120: None,
+}
+
+
+def _linha_dificil(linha, i):
+    linha = dict(linha)
+    linha["title"] = f'Movie {i},\n"Part"\n{i % 7},'
+    linha["star"] = f'"Quoted, Star" {i}\n, Other Star' if i % 3 else linha["star"]
+    linha["production_company"] = "\n" * (i % 4) + linha["production_company"]
+    return linha
+
+
+@pytest.fixture(scope="module")
+def csv_dificil(tmp_path_factory):
+    """Grava o CSV e retorna (caminho, posições em bytes do início de cada registro de dados)."""
+    caminho = str(tmp_path_factory.mktemp("ingestao") / "filmes.csv")
+    inicios = []
+    posicao = 0
+    with open(caminho, "wb") as arquivo:
+        for i, linha in enumerate([None] + list(gerar_linhas(TAMANHO_CATALOGO, SEMENTE))):
+            texto = io.StringIO()
+            escritor = csv.DictWriter(texto, fieldnames=COLUNAS_CSV)
+            if linha is None:
+                escritor.writeheader()
+            else:
+                inicios.append(posicao)
+                escritor.writerow(_linha_dificil(linha, i))
+            dados = texto.getvalue().encode("utf-8")
+            arquivo.write(dados)
+            posicao += len(dados)
+    return caminho, inicios
+
+
+def test_faixas_comecam_em_registros(csv_dificil):
+    caminho, inicios = csv_dificil
+    inicios_validos = set(inicios)
+    for partes in range(1, 60):
+        _, faixas = dividir_em_registros(caminho, partes)
+        assert faixas[0][0] == inicios[0]
+        assert all(inicio in inicios_validos for inicio, _ in faixas)
+        assert all(fim == proximo for (_, fim), (proximo, _) in zip(faixas, faixas[1:]))
+
+
+def test_paralelo_igual_ao_sequencial(csv_dificil, monkeypatch):
+    caminho, _ = csv_dificil
+    monkeypatch.setattr(ingestao, "TAMANHO_MINIMO_PARALELO", 0)
+    sequencial = carregar_base_de_casos_csv(caminho, usar_snapshot=False, processos=1)
+    assert len(sequencial) == TAMANHO_CATALOGO
+    assert sequencial[0]["titulo"] == 'Movie 1,\n"Part"\n1,'
+    assert carregar_base_de_casos_csv_paralelo(caminho, processos=3) == sequencial
+    assert carregar_base_de_casos_csv(caminho, usar_snapshot=False, processos=2) == sequencial
+
+
+def test_duracoes_iguais_a_versao_original():
+    for _ in range(2):  # A segunda volta sai da memorização
+        for bruta, minutos in DURACOES.items():
+            assert parse_duration_to_minutes(bruta) == minutos, bruta
+
+
+def test_filme_se_comporta_como_dicionario():
+    filme = converter_linha_csv(next(iter(gerar_linhas(1))))
+    canonizar_casos([filme])
+    dicionario = filme.como_dicionario()
+    assert bool(filme) and len(filme) == len(dicionario) and list(filme) == list(dicionario)
+    assert all(filme[chave] == filme.get(chave) for chave in dicionario)
+    # Sem campos informados, é falso como um dicionário vazio
+    assert not como_registro({}) and len(como_registro({})) == 0
+    parcial = como_registro({"titulo": "Sem id"})
+    assert parcial and "id" not in parcial
+    # Atributos internos e métodos não são chaves
+    for chave in ("_canonico", "get", "keys", "__slots__", "inexistente"):
+        assert chave not in filme and filme.get(chave) is None
+        with pytest.raises(KeyError):
+            filme[chave]
+    with pytest.raises(KeyError):
+        parcial["id"]
+
+
+def test_avisos_agregados_por_coluna(tmp_path, capsys):
+    linhas = [dict(linha) for linha in gerar_linhas(30, SEMENTE)]
+    for i, linha in enumerate(linhas):
+        linha["duration"] = f"duração {i}" if i < 8 else "120 min"
+        linha["rating_mpa"] = "Classificação Inventada" if i % 10 == 0 else "R"
+        linha["vote"] = "muitos" if i == 3 else linha["vote"]
+    caminho = str(tmp_path / "filmes.csv")
+    with open(caminho, "w", encoding="utf-8", newline="") as arquivo:
+        escritor = csv.DictWriter(arquivo, fieldnames=COLUNAS_CSV)
+        escritor.writeheader()
+        escritor.writerows(linhas)
+
+    casos = carregar_base_de_casos_csv(caminho, usar_snapshot=False)
+    saida = capsys.readouterr().out
+    assert len(casos) == 30
+    # Um único resumo, e não um aviso por linha
+    assert saida.count("Aviso:") == 1
+    assert "Aviso: 12 valores não convertidos" in saida
+    assert "duration: 8 -" in saida and "rating_mpa: 3 -" in saida and "vote: 1 -" in saida
+    assert "'duração 0'" in saida and "'duração 7'" not in saida  # Só as primeiras amostras
+
+    # Os avisos de blocos (ou processos) diferentes se somam, com as amostras limitadas
+    avisos = AvisosConversao()
+    for inicio in range(0, 30, 4):
+        parcial = AvisosConversao()
+        converter_bloco(linhas[inicio:inicio + 4], avisos=parcial)
+        avisos.juntar(parcial)
+    assert avisos.contadores == {"duration": 8, "rating_mpa": 3, "vote": 1}
+    assert len(avisos.amostras["duration"]) == AMOSTRAS_AVISOS_POR_COLUNA
+
+
+def test_blocos_iguais_a_base_completa(tmp_path):
+    caminho = gerar_catalogo_csv(str(tmp_path / "filmes.csv"), TAMANHO_CATALOGO, SEMENTE)
+    completa = BaseColunar(carregar_base_de_casos_csv(caminho, usar_snapshot=False))
+    consultas = [dict(completa.casos[i]) for i in (0, 99, 598)]
+    consultas.append({"estrelas": list(completa.casos[5]["estrelas"]), "classificacao_etaria": "PG-13"})
+    for pesos in (PESOS_PADRAO, {"diretores": 0.5, "estrelas": 0.3, "classificacao_etaria": 0.2}):
+        for consulta in consultas:
+            esperado = top_k(recuperar_top_k(consulta, pesos, K, base=completa))
+            assert top_k(recuperar_top_k_em_fluxo(consulta, pesos, K, caminho, tamanho_bloco=TAMANHO_BLOCO)) == esperado
+            projetada = carregar_base_colunar_em_blocos(caminho, atributos_com_peso(pesos), TAMANHO_BLOCO)
+            assert top_k(recuperar_top_k(consulta, pesos, K, base=projetada)) == esperado
+
+
+def test_juncao_recodifica_vocabularios_dos_blocos(tmp_path):
+    caminho = gerar_catalogo_csv(str(tmp_path / "filmes.csv"), TAMANHO_CATALOGO, SEMENTE)
+    blocos = list(iterar_blocos_colunares(caminho, tamanho_bloco=TAMANHO_BLOCO))
+    # Os ids de um mesmo nome mudam de um bloco para outro
+    assert blocos[1].vocabulario.valores[:10] != blocos[0].vocabulario.valores[:10]
+    base = BaseColunar.concatenar(iter(blocos))
+    assert base.n == TAMANHO_CATALOGO
+    codigos = {codigo: classificacao for classificacao, codigo in base.tabela_classificacoes.items()}
+    for i, caso in enumerate(base.casos):
+        canonico = forma_canonica(caso)
+        for atributo, listas in base.listas.items():
+            nomes = {base.vocabulario.valores[id_nome] for id_nome in listas.linha(i)}
+            assert nomes == set(canonico[POSICAO_CANONICA[atributo]] or ())
+        assert codigos[base.codigos_classificacao[i]] == canonico[POSICAO_CANONICA["classificacao_etaria"]]
+    assert base.indices_invertidos["estrelas"].exportar()["casos"].tolist() == \
+        BaseColunar(base.casos).indices_invertidos["estrelas"].exportar()["casos"].tolist()
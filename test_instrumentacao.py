@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+from base_colunar import BaseColunar
+from conftest import K, TAMANHO_CATALOGO
+from instrumentacao import INSTRUMENTACAO
+from recuperacao import CacheRecuperacao, recuperar_top_k
+from similaridade import PESOS_PADRAO, calcular_similaridade_global
+
+# --- Instrumentação ---
+# Ativada, cada consulta deixa fases, atributos e contadores que podem ser resumidos só
+# para ela (a partir de uma `marca()`); desativada, nada é registrado.
+
+
+@pytest.fixture
+def instrumentacao():
+    ativa = INSTRUMENTACAO.ativa
+    INSTRUMENTACAO.reiniciar()
+    yield INSTRUMENTACAO
+    INSTRUMENTACAO.ativa = ativa
+    INSTRUMENTACAO.reiniciar()
+
+
+@pytest.fixture(scope="module")
+def base(casos):
+    return BaseColunar(list(casos))
+
+
+def test_resumo_por_consulta(instrumentacao, base, tmp_path):
+    instrumentacao.ativar()
+    cache = CacheRecuperacao()
+    consulta = {"generos": list(base.casos[0]["generos"]), "ano_lancamento": base.casos[0]["ano_lancamento"]}
+
+    # Primeira consulta: falha no cache, busca com poda
+    marca = instrumentacao.marca()
+    cache.recuperar_top_k(consulta, PESOS_PADRAO, K, base=base)
+    primeira = instrumentacao.como_dicionario(desde=marca)
+    contadores = primeira["contadores"]
+    assert contadores["consultas"] == 1 and contadores["cache.falhas"] == 1
+    assert "cache.acertos" not in contadores
+    assert contadores["poda.candidatos_iniciais"] == TAMANHO_CATALOGO
+    assert primeira["taxas"]["cache.taxa_acerto"] == 0.0
+    assert primeira["taxas"]["poda.fracao_descartada"] == \
+        1 - contadores["poda.candidatos_finais"] / contadores["poda.candidatos_iniciais"]
+    assert primeira["fases"]["pontuacao"]["chamadas"] == 1 and primeira["fases"]["ordenacao"]["chamadas"] == 1
+    assert primeira["atributos"]["generos"]["metrica"] == "similaridade_jaccard"
+    assert primeira["atributos"]["ano_lancamento"]["casos"] >= contadores["poda.candidatos_finais"]
+
+    # Segunda consulta (a mesma): só o acerto do cache aparece na diferença
+    marca = instrumentacao.marca()
+    cache.recuperar_top_k(consulta, PESOS_PADRAO, K, base=base)
+    segunda = instrumentacao.como_dicionario(desde=marca)
+    assert segunda["contadores"] == {"cache.acertos": 1}
+    assert segunda["fases"] == {} and segunda["atributos"] == {}
+    assert segunda["taxas"] == {"cache.taxa_acerto": 1.0}
+    assert "cache.acertos" in instrumentacao.resumo(desde=marca) and "100.0%" in instrumentacao.resumo(desde=marca)
+
+    # Sem marca: o acumulado das duas
+    total = instrumentacao.como_dicionario()
+    assert total["contadores"]["cache.acertos"] == 1 and total["contadores"]["cache.falhas"] == 1
+    assert total["taxas"]["cache.taxa_acerto"] == 0.5
+
+    # Similaridade par a par: uma chamada da métrica por atributo comparado
+    marca = instrumentacao.marca()
+    calcular_similaridade_global(consulta, base.casos[1], PESOS_PADRAO)
+    assert {nome: registro["chamadas"] for nome, registro in
+            instrumentacao.como_dicionario(desde=marca)["atributos"].items()} == {"generos": 1, "ano_lancamento": 1}
+
+    caminho = tmp_path / "instrumentacao.json"
+    instrumentacao.salvar_json(str(caminho))
+    assert json.loads(caminho.read_text(encoding="utf-8")) == instrumentacao.como_dicionario()
+
+
+def test_desativada_nao_registra(instrumentacao, base):
+    instrumentacao.desativar()
+    cache = CacheRecuperacao()
+    consulta = dict(base.casos[2])
+    for _ in range(2):
+        cache.recuperar_top_k(consulta, PESOS_PADRAO, K, base=base)
+    recuperar_top_k(consulta, PESOS_PADRAO, K, base=base)
+    calcular_similaridade_global(consulta, base.casos[3], PESOS_PADRAO)
+    with instrumentacao.fase("carga"):
+        pass
+    assert instrumentacao.fases == {} and instrumentacao.atributos == {} and instrumentacao.contadores == {}
+    assert instrumentacao.como_dicionario() == {"fases": {}, "atributos": {}, "contadores": {}, "taxas": {}}
@@ -0,0 +1,57 @@
+import os
+import signal
+
+import pytest
+
+from base_colunar import BaseColunar
+from conftest import K, top_k
+from paralelo import MotorRecuperacaoParalela
+from recuperacao import recuperar_top_k
+from similaridade import PESOS_PADRAO
+
+# --- Recuperação Paralela ---
+# O motor com memória compartilhada deve devolver o mesmo top-k da recuperação em um
+# único processo (mesmos casos, mesma ordem nos empates, similaridades idênticas),
+# inclusive depois que um processo do pool morre.
+
+
+@pytest.fixture(scope="module")
+def base(casos):
+    return BaseColunar(list(casos))
+
+
+def test_igual_a_recuperacao_em_um_processo(base):
+    consultas = [dict(base.casos[i]) for i in (0, 17, 234)]
+    consultas += [
+        {"classificacao_etaria": "PG-13"},  # Muitos empates: desempate pela posição na base
+        {"generos": ["Drama"], "ano_lancamento": 1990},
+        {"estrelas": list(base.casos[42]["estrelas"]), "avaliacao_critica": 7.0},
+    ]
+    vetores_de_pesos = [PESOS_PADRAO, {"classificacao_etaria": 1.0, "generos": 0.5},
+                        {"estrelas": 0.6, "diretores": 0.2, "avaliacao_critica": 0.2}]
+    with MotorRecuperacaoParalela(base, processos=3) as motor:
+        if not motor.ativo:
+            pytest.skip("pool de processos indisponível")
+        for pesos in vetores_de_pesos:
+            for consulta in consultas:
+                for k, min_sim in ((K, None), (K, 0.5), (1, None), (len(base.casos) + 5, 0.3)):
+                    esperado = top_k(recuperar_top_k(consulta, pesos, k, min_sim, base=base))
+                    assert top_k(motor.recuperar_top_k(consulta, pesos, k, min_sim)) == esperado
+        assert motor.ativo
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGKILL"), reason="requer SIGKILL")
+def test_processo_morto_volta_para_um_processo(base):
+    consultas = [dict(base.casos[i]) for i in (0, 17, 234)]
+    with MotorRecuperacaoParalela(base, processos=2) as motor:
+        if not motor.ativo:
+            pytest.skip("pool de processos indisponível")
+        esperado = top_k(recuperar_top_k(consultas[0], PESOS_PADRAO, K, base=base))
+        assert top_k(motor.recuperar_top_k(consultas[0], PESOS_PADRAO, K)) == esperado
+
+        for processo in list(motor._executor._processes.values()):
+            os.kill(processo.pid, signal.SIGKILL)
+        for consulta in consultas:
+            esperado = top_k(recuperar_top_k(consulta, PESOS_PADRAO, K, base=base))
+            assert top_k(motor.recuperar_top_k(consulta, PESOS_PADRAO, K)) == esperado
+        assert not motor.ativo
@@ -0,0 +1,231 @@
+import random
+import threading
+
+import pytest
+
+from base_colunar import FRACAO_MAXIMA_ALTERADOS_INDICE, BaseColunar
+from base_de_casos import BaseDeCasos
+from catalogo_sintetico import gerar_catalogo_csv, gerar_linhas
+from conftest import K, SEMENTE, TAMANHO_CATALOGO, top_k
+from filme import como_registro
+from ingestao import converter_linha_csv
+from recuperacao import recuperar_top_k
+from retencao import linha_log, reaplicar_log_retencao, registrar_no_log
+from similaridade import PESOS_PADRAO, calcular_similaridade_global
+
+# --- Retenção Incremental ---
+# Operações aleatórias de adicionar/atualizar/remover sobre uma BaseDeCasos lida de um
+# CSV sintético: a base alterada em memória, a base recarregada pelo log e a base
+# recarregada depois da compactação devem ser iguais a uma base montada do zero com o
+# resultado esperado das operações (mesmos casos, na mesma ordem).
+
+OPERACOES = 1500
+
+
+def _dicionario(caso, id_caso):
+    return dict(caso.como_dicionario(), id=id_caso)
+
+
+def _aplicar_operacoes(base, esperado, novos, rng, quantidade):
+    """Aplica operações aleatórias em `base` e no dicionário `esperado` (id -> caso, em ordem)."""
+    for _ in range(quantidade):
+        sorteio = rng.random()
+        if sorteio < 0.4 or not esperado:
+            id_caso = f"novo{len(novos)}"
+            caso = _dicionario(converter_linha_csv(novos.pop()), id_caso)
+            base.adicionar_caso(caso)
+            esperado[id_caso] = caso
+        elif sorteio < 0.7:
+            id_caso = rng.choice(list(esperado))
+            caso = _dicionario(converter_linha_csv(novos.pop()), id_caso)
+            base.atualizar_caso(id_caso, caso)
+            esperado[id_caso] = caso
+        else:
+            id_caso = rng.choice(list(esperado))
+            base.remover_caso(id_caso)
+            del esperado[id_caso]
+
+
+def _conferir_indices_invertidos(colunar):
+    # As alterações guardadas fora do CSR (filtradas a cada consulta) não crescem com o
+    # número de operações desde a carga
+    for indice in colunar.indices_invertidos.values():
+        assert len(indice.alterados) <= FRACAO_MAXIMA_ALTERADOS_INDICE * colunar.n
+
+
+def _conferir(base, esperado, consultas):
+    _conferir_indices_invertidos(base.colunar)
+    assert [caso["id"] for caso in base.casos] == list(esperado)
+    assert all(caso == esperado[caso["id"]] for caso in base.casos)
+    # Base montada do zero com o resultado esperado das operações
+    referencia = BaseColunar([como_registro(dict(caso)) for caso in esperado.values()])
+    for consulta in consultas:
+        assert top_k(base.recuperar_top_k(consulta, PESOS_PADRAO, K)) == \
+            top_k(recuperar_top_k(consulta, PESOS_PADRAO, K, base=referencia))
+
+
+def test_indices_invertidos_incorporam_alteracoes(casos):
+    base = BaseColunar(list(casos))
+    rng = random.Random(SEMENTE)
+    novos = [converter_linha_csv(linha) for linha in gerar_linhas(OPERACOES, SEMENTE + 3)]
+    for caso in novos:
+        base.atualizar(rng.randrange(base.n), caso)
+        _conferir_indices_invertidos(base)
+    referencia = BaseColunar(list(base.casos))
+    for atributo, indice in base.indices_invertidos.items():
+        for caso in novos[:20]:
+            consulta = base.vocabulario.consultar(caso[atributo])
+            ids, contagens = indice.contar_intersecoes(consulta)
+            esperado_ids, esperado_contagens = referencia.indices_invertidos[atributo].contar_intersecoes(
+                referencia.vocabulario.consultar(caso[atributo]))
+            assert ids.tolist() == esperado_ids.tolist() and contagens.tolist() == esperado_contagens.tolist()
+
+
+def _base_com_catalogo(tmp_path):
+    caminho = str(tmp_path / "filmes.csv")
+    gerar_catalogo_csv(caminho, TAMANHO_CATALOGO, SEMENTE)
+    base = BaseDeCasos(caminho, usar_exemplos=False)
+    esperado = {caso["id"]: caso.como_dicionario() for caso in base.casos}
+    return caminho, base, esperado
+
+
+def test_operacoes_aleatorias_e_recarga(tmp_path, capsys):
+    caminho, base, esperado = _base_com_catalogo(tmp_path)
+    rng = random.Random(SEMENTE)
+    novos = list(gerar_linhas(2 * OPERACOES, SEMENTE + 1))
+    consultas = [converter_linha_csv(linha) for linha in gerar_linhas(5, SEMENTE + 2)]
+
+    _aplicar_operacoes(base, esperado, novos, rng, OPERACOES)
+    _conferir(base, esperado, consultas)
+
+    # Recarga: CSV (snapshot) + log inteiro
+    recarregada = BaseDeCasos(caminho, usar_exemplos=False)
+    _conferir(recarregada, esperado, consultas)
+
+    # Compactação: a próxima carga parte do snapshot da retenção e só reaplica o final do log
+    assert recarregada.compactar_retencao()
+    _aplicar_operacoes(recarregada, esperado, novos, rng, 20)
+    capsys.readouterr()
+    compactada = BaseDeCasos(caminho, usar_exemplos=False)
+    _conferir(compactada, esperado, consultas)
+    saida = capsys.readouterr().out
+    assert "(snapshot da retenção)" in saida
+    assert "20 alterações reaplicadas" in saida
+
+
+def test_snapshot_da_retencao_desatualizado_e_ignorado(tmp_path, capsys):
+    caminho, base, esperado = _base_com_catalogo(tmp_path)
+    _aplicar_operacoes(base, esperado, list(gerar_linhas(50, SEMENTE + 1)), random.Random(SEMENTE), 30)
+    assert base.compactar_retencao()
+
+    # Log reescrito (não é mais continuação do trecho incorporado): o snapshot não vale
+    with open(base.caminho_log, "r+b") as arquivo:
+        arquivo.write(b" ")
+    capsys.readouterr()
+    recarregada = BaseDeCasos(caminho, usar_exemplos=False)
+    assert [caso["id"] for caso in recarregada.casos] == list(esperado)
+    assert "(snapshot da retenção)" not in capsys.readouterr().out
+
+    # Sem o log, o snapshot da retenção também não é usado
+    (tmp_path / "filmes.csv.retencao.jsonl").unlink()
+    sem_log = BaseDeCasos(caminho, usar_exemplos=False)
+    assert len(sem_log) == TAMANHO_CATALOGO
+
+
+def test_linha_incompleta_no_fim_do_log(tmp_path):
+    caminho_log = str(tmp_path / "log.jsonl")
+    registrar_no_log(caminho_log, linha_log("adicionar", "a", {"id": "a", "titulo": "A"}))
+    with open(caminho_log, "a", encoding="utf-8") as arquivo:
+        arquivo.write('{"operacao": "adicionar", "id": "b", "ca')  # Queda no meio da gravação
+    registrar_no_log(caminho_log, linha_log("adicionar", "c", {"id": "c", "titulo": "C"}))
+    registrar_no_log(caminho_log, linha_log("remover", "a"))
+    assert [caso["id"] for caso in reaplicar_log_retencao([], caminho_log)] == ["c"]
+
+
+def test_carga_compacta_log_grande(tmp_path, monkeypatch, capsys):
+    import base_de_casos
+
+    caminho, base, esperado = _base_com_catalogo(tmp_path)
+    _aplicar_operacoes(base, esperado, list(gerar_linhas(50, SEMENTE + 1)), random.Random(SEMENTE), 30)
+    monkeypatch.setattr(base_de_casos, "TAMANHO_MINIMO_COMPACTACAO", 1)
+    assert [caso["id"] for caso in BaseDeCasos(caminho, usar_exemplos=False).casos] == list(esperado)
+    capsys.readouterr()
+    assert [caso["id"] for caso in BaseDeCasos(caminho, usar_exemplos=False).casos] == list(esperado)
+    saida = capsys.readouterr().out
+    assert "(snapshot da retenção)" in saida
+    assert "0 alterações reaplicadas" in saida
+
+
+def test_falha_no_log_nao_altera_a_base(tmp_path, monkeypatch):
+    import base_de_casos
+
+    caminho, base, esperado = _base_com_catalogo(tmp_path)
+    consultas = [converter_linha_csv(linha) for linha in gerar_linhas(5, SEMENTE + 2)]
+    novo = _dicionario(converter_linha_csv(next(iter(gerar_linhas(1, SEMENTE + 1)))), "novo")
+    ids = list(esperado)
+
+    def sem_espaco(caminho_log, linha):
+        raise OSError("disco cheio")
+
+    monkeypatch.setattr(base_de_casos, "registrar_no_log", sem_espaco)
+    for operacao in (lambda: base.adicionar_caso(novo), lambda: base.atualizar_caso(ids[0], novo),
+                     lambda: base.remover_caso(ids[1])):
+        with pytest.raises(OSError):
+            operacao()
+        _conferir(base, esperado, consultas)
+
+    # Remoção que compactaria a base: a compactação também não acontece
+    monkeypatch.undo()
+    for id_caso in ids[2:2 + TAMANHO_CATALOGO // 2 - 2]:
+        base.remover_caso(id_caso)
+        del esperado[id_caso]
+    monkeypatch.setattr(base_de_casos, "registrar_no_log", sem_espaco)
+    colunar = base.colunar
+    assert not colunar.precisa_compactar
+    with pytest.raises(OSError):
+        base.remover_caso(ids[-1])
+    assert base.colunar is colunar and colunar.removidos == TAMANHO_CATALOGO // 2 - 2
+    _conferir(base, esperado, consultas)
+    monkeypatch.undo()
+    _conferir(BaseDeCasos(caminho, usar_exemplos=False), esperado, consultas)
+
+
+def test_buscas_concorrentes_com_retencao(tmp_path):
+    _, base, esperado = _base_com_catalogo(tmp_path)
+    consultas = [converter_linha_csv(linha) for linha in gerar_linhas(5, SEMENTE + 2)]
+    novos = list(gerar_linhas(TAMANHO_CATALOGO, SEMENTE + 1))
+    terminou = threading.Event()
+    erros = []
+
+    def buscar():
+        # Cada resultado tem que ser coerente: casos existentes com a própria similaridade
+        try:
+            while not terminou.is_set():
+                for consulta in consultas:
+                    for resultado in base.recuperar_top_k(consulta, PESOS_PADRAO, K):
+                        caso = resultado["caso"]
+                        assert caso is not None
+                        assert resultado["similaridade"] == pytest.approx(
+                            calcular_similaridade_global(consulta, caso, PESOS_PADRAO), abs=1e-9)
+        except AssertionError as e:
+            erros.append(e)
+
+    threads = [threading.Thread(target=buscar) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    try:
+        # Remoções suficientes para compactar a base, intercaladas com adições (arrays realocados)
+        for numero, id_caso in enumerate(list(esperado)[:TAMANHO_CATALOGO * 3 // 4]):
+            base.remover_caso(id_caso)
+            del esperado[id_caso]
+            if numero % 4 == 0:
+                caso = _dicionario(converter_linha_csv(novos.pop()), f"novo{numero}")
+                base.adicionar_caso(caso)
+                esperado[caso["id"]] = caso
+    finally:
+        terminou.set()
+        for thread in threads:
+            thread.join()
+    assert not erros
+    assert base.colunar.n < TAMANHO_CATALOGO  # Houve compactação
+    _conferir(base, esperado, consultas)
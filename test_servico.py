@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+import pytest
+
+from base_de_casos import BaseDeCasos
+from conftest import TAMANHO_CATALOGO, top_k
+from recuperacao import recuperar_top_k
+from servico import ServicoRecomendacao
+from similaridade import PESOS_PADRAO
+
+# --- Serviço HTTP ---
+# Cada rota é exercitada por uma conexão HTTP real (servidor asyncio em uma porta livre).
+
+
+async def _requisicao(porta, metodo, caminho, corpo=None):
+    """Envia uma requisição HTTP/1.1 e retorna (status, objeto JSON ou None)."""
+    leitor, escritor = await asyncio.open_connection("127.0.0.1", porta)
+    dados = b"" if corpo is None else (corpo if isinstance(corpo, bytes) else json.dumps(corpo).encode("utf-8"))
+    escritor.write(f"{metodo} {caminho} HTTP/1.1\r\nHost: teste\r\nConnection: close\r\n"
+                   f"Content-Length: {len(dados)}\r\n\r\n".encode("latin-1") + dados)
+    await escritor.drain()
+    resposta = await leitor.read()
+    escritor.close()
+    cabecalho, corpo_resposta = resposta.split(b"\r\n\r\n", 1)
+    status = int(cabecalho.split(b" ", 2)[1])
+    return status, json.loads(corpo_resposta) if corpo_resposta else None
+
+
+def _executar(casos, cenario):
+    """Sobe o serviço sobre os casos, roda `cenario(servico, porta)` e encerra tudo."""
+    async def principal():
+        servico = ServicoRecomendacao(BaseDeCasos.a_partir_de_casos(list(casos)), trabalhadores=2)
+        servidor = await asyncio.start_server(servico.atender_conexao, "127.0.0.1", 0)
+        try:
+            await servico.preparar()
+            await cenario(servico, servidor.sockets[0].getsockname()[1])
+        finally:
+            servidor.close()
+            await servidor.wait_closed()
+            servico.encerrar()
+    asyncio.run(principal())
+
+
+def test_recommend(casos):
+    consulta = {"generos": list(casos[0]["generos"]), "ano_lancamento": casos[0]["ano_lancamento"]}
+    pesos = {"estrelas": 0.0}
+
+    async def cenario(servico, porta):
+        status, resposta = await _requisicao(porta, "POST", "/recommend", {"caso": consulta, "pesos": pesos, "k": 3})
+        assert status == 200
+        esperado = recuperar_top_k(consulta, dict(PESOS_PADRAO, **pesos), 3, base=servico.base.colunar)
+        assert [(item["id"], item["similaridade"]) for item in resposta["resultados"]] == top_k(esperado)
+        assert resposta["resultados"][0]["caso"]["generos"] == list(esperado[0]["caso"]["generos"])
+    _executar(casos, cenario)
+
+
+def test_health_e_metrics(casos):
+    async def cenario(servico, porta):
+        status, saude = await _requisicao(porta, "GET", "/health")
+        assert status == 200
+        assert saude["status"] == "ok" and saude["casos"] == TAMANHO_CATALOGO
+
+        for _ in range(2):
+            await _requisicao(porta, "POST", "/recommend", {"caso": {"generos": ["Drama"]}})
+        await _requisicao(porta, "POST", "/recommend", {"caso": {}})
+        status, metricas = await _requisicao(porta, "GET", "/metrics")
+        assert status == 200
+        assert metricas["recomendacoes"] == 2
+        assert metricas["erros"] == 1
+        assert metricas["requisicoes"] == 5
+        assert metricas["janela_latencia"] == 2
+        assert metricas["cache"]["acertos"] == 1 and metricas["cache"]["falhas"] == 1
+    _executar(casos, cenario)
+
+
+@pytest.mark.parametrize("corpo", [
+    {"caso": {"generos": ["Drama"]}, "pesos": {"generos": -1}},
+    {"caso": {"generos": ["Drama"]}, "pesos": {"generos": "alto"}},
+    {"caso": {"generos": ["Drama"]}, "pesos": [0.5]},
+    {"caso": {"generos": ["Drama"]}, "k": 0},
+    {"caso": {"generos": ["Drama"]}, "k": 2.5},
+    {"caso": {"generos": ["Drama"]}, "k": True},
+    {"caso": {"ano_lancamento": "1999"}},
+    {"caso": {}},
+    b'{"caso": {"generos": ["Drama"]}, "pesos": {"generos": NaN}}',
+    b"{nao e json",
+])
+def test_pedidos_invalidos_recebem_400(casos, corpo):
+    async def cenario(servico, porta):
+        status, resposta = await _requisicao(porta, "POST", "/recommend", corpo)
+        assert status == 400
+        assert resposta["erro"]
+    _executar(casos, cenario)
+
+
+def test_rota_e_metodo_errados(casos):
+    async def cenario(servico, porta):
+        assert (await _requisicao(porta, "GET", "/nada"))[0] == 404
+        assert (await _requisicao(porta, "GET", "/recommend"))[0] == 405
+    _executar(casos, cenario)
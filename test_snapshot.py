@@ -0,0 +1,107 @@
+import os
+
+import pytest
+
+import snapshot
+from catalogo_sintetico import gerar_catalogo_csv
+from ingestao import carregar_base_de_casos_csv
+from snapshot import caminho_snapshot, carregar_snapshot, salvar_snapshot
+
+# --- Snapshot Binário ---
+# O snapshot deve reconstruir exatamente os casos lidos do CSV e ser recusado (com volta
+# para o CSV) quando o CSV mudou, quando é de outra VERSAO_SNAPSHOT ou quando está corrompido.
+
+TAMANHO_CATALOGO = 400
+SEMENTE = 3
+
+
+@pytest.fixture
+def csv_e_casos(tmp_path):
+    caminho = str(tmp_path / "filmes.csv")
+    gerar_catalogo_csv(caminho, TAMANHO_CATALOGO, SEMENTE)
+    casos = carregar_base_de_casos_csv(caminho, usar_snapshot=False)
+    salvar_snapshot(caminho, casos)
+    return caminho, casos
+
+
+def test_ida_e_volta_igual_ao_csv(csv_e_casos):
+    caminho, casos = csv_e_casos
+    lidos = carregar_snapshot(caminho)
+    assert lidos == casos
+    assert [list(caso.keys()) for caso in lidos] == [list(caso.keys()) for caso in casos]
+    # E pela carga normal, que usa o snapshot gravado
+    assert carregar_base_de_casos_csv(caminho) == casos
+
+
+def test_outra_versao_e_recusada(csv_e_casos, monkeypatch):
+    caminho, _ = csv_e_casos
+    monkeypatch.setattr(snapshot, "VERSAO_SNAPSHOT", snapshot.VERSAO_SNAPSHOT + 1)
+    assert carregar_snapshot(caminho) is None
+
+
+def test_csv_alterado_e_recusado(csv_e_casos):
+    caminho, casos = csv_e_casos
+    info = os.stat(caminho)
+
+    # Só o mtime
+    os.utime(caminho, ns=(info.st_atime_ns, info.st_mtime_ns + 10 ** 9))
+    assert carregar_snapshot(caminho) is None
+    os.utime(caminho, ns=(info.st_atime_ns, info.st_mtime_ns))
+    assert carregar_snapshot(caminho) == casos
+
+    # Mesmo tamanho e mtime, conteúdo diferente: só o hash percebe
+    with open(caminho, "r+b") as arquivo:
+        arquivo.seek(-2, os.SEEK_END)
+        ultimo = arquivo.read(1)
+        arquivo.seek(-2, os.SEEK_END)
+        arquivo.write(b"X" if ultimo != b"X" else b"Y")
+    os.utime(caminho, ns=(info.st_atime_ns, info.st_mtime_ns))
+    assert os.path.getsize(caminho) == info.st_size
+    assert carregar_snapshot(caminho) is None
+
+    # Tamanho diferente
+    with open(caminho, "a", encoding="utf-8") as arquivo:
+        arquivo.write("\n")
+    assert carregar_snapshot(caminho) is None
+
+
+def test_snapshot_truncado_volta_para_o_csv(csv_e_casos):
+    caminho, casos = csv_e_casos
+    destino = caminho_snapshot(caminho)
+    for tamanho in (os.path.getsize(destino) // 2, 10, 0):
+        with open(destino, "r+b") as arquivo:
+            arquivo.truncate(tamanho)
+        assert carregar_snapshot(caminho) is None
+        assert carregar_base_de_casos_csv(caminho) == casos
+        salvar_snapshot(caminho, casos)
+
+
+def test_dados_corrompidos_voltam_para_o_csv(csv_e_casos):
+    caminho, casos = csv_e_casos
+    destino = caminho_snapshot(caminho)
+    with open(destino, "rb") as arquivo:
+        cabecalho, inicio_dados = snapshot._ler_cabecalho(arquivo.read())
+    with open(destino, "r+b") as arquivo:
+        arquivo.seek(inicio_dados + cabecalho["tamanho_dados"] // 2)
+        arquivo.write(b"\xff\xff\xff\x7f")
+    assert carregar_snapshot(caminho) is None
+    assert carregar_base_de_casos_csv(caminho) == casos
+    assert carregar_snapshot(caminho) == casos  # Regravado pela carga do CSV
+
+
+def test_falha_ao_decodificar_volta_para_o_csv(csv_e_casos, monkeypatch):
+    # Hash dos dados correto, mas um id de string fora da tabela: a decodificação falha
+    # com as views do mapa ainda abertas
+    caminho, casos = csv_e_casos
+    colunas_para_arrays = snapshot.colunas_para_arrays
+
+    def com_id_invalido(casos):
+        arrays = colunas_para_arrays(casos)
+        arrays["titulo.ids"][0] = len(arrays["strings.offsets"]) + 1000
+        return arrays
+
+    with monkeypatch.context() as m:
+        m.setattr(snapshot, "colunas_para_arrays", com_id_invalido)
+        salvar_snapshot(caminho, casos)
+    assert carregar_snapshot(caminho) is None
+    assert carregar_base_de_casos_csv(caminho) == casos